@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Access Control Impact Analyzer
+
+Estimates how much real traffic the delivery policy's access control rules
+block, for the current template and for proposed variants side by side:
+    - AreaAccessRule: allow/deny list of country codes
+    - MethodDeniedRule: denied HTTP methods
+    - UaAccessRule: allow/deny list of User-Agent patterns (* wildcards)
+
+Rules are compiled into frozensets and one combined UA regex whose
+verdicts are memoized per distinct User-Agent. The log is split into byte
+ranges that a multiprocessing Pool replays in streaming chunks
+(access_log), and the per-worker counters are summed at the end.
+
+Requests without a country code cannot be judged by AreaAccessRule; they
+are counted as UnknownCountry and not blocked.
+
+Usage:
+    python access_impact.py access.log --proposed tighter.json [--workers 8]
+"""
+import os
+import re
+import sys
+import json
+import fnmatch
+import argparse
+from multiprocessing import Pool
+
+from access_log import iter_chunks, split_ranges
+from hsbc_demo_json import delivery_policy_template, overlay
+
+RULES = ("AreaAccessRule", "MethodDeniedRule", "UaAccessRule")
+
+
+def _split(value) -> list:
+    if isinstance(value, str):
+        value = value.replace(";", ",").split(",")
+    return [v.strip() for v in value or [] if v.strip()]
+
+
+class AccessRules:
+    def __init__(self, policy):
+        """Compile the access control rules of a delivery policy"""
+        area = policy.get("AreaAccessRule") or {}
+        self.area = frozenset(a.upper() for a in _split(area.get("Area"))) if area.get("Switch") else None
+        self.area_allow = area.get("RuleType", "allow") == "allow"
+
+        methods = policy.get("MethodDeniedRule") or {}
+        self.denied_methods = frozenset(m.upper() for m in _split(methods.get("Methods"))) \
+            if methods.get("Switch") else frozenset()
+
+        ua = policy.get("UaAccessRule") or {}
+        self.ua_switch = bool(ua.get("Switch"))
+        self.ua_allow = ua.get("RuleType", "deny") == "allow"
+        self.ua_allow_empty = ua.get("AllowEmpty", True)
+        patterns = _split(ua.get("UaList"))
+        flags = re.IGNORECASE if ua.get("IgnoreCase", True) else 0
+        self._ua_re = re.compile("|".join(fnmatch.translate(p) for p in patterns), flags) if patterns else None
+        self._ua_verdicts = {}
+
+    def area_blocks(self, country: str) -> bool:
+        if self.area is None or not country:
+            return False
+        return (country.upper() in self.area) != self.area_allow
+
+    def method_blocks(self, method: str) -> bool:
+        return method in self.denied_methods
+
+    def ua_blocks(self, ua: str) -> bool:
+        if not self.ua_switch:
+            return False
+        verdict = self._ua_verdicts.get(ua)
+        if verdict is None:
+            if not ua or ua == "-":
+                verdict = not self.ua_allow_empty
+            else:
+                listed = self._ua_re is not None and self._ua_re.match(ua) is not None
+                verdict = listed != self.ua_allow
+            if len(self._ua_verdicts) < 100_000:
+                self._ua_verdicts[ua] = verdict
+        return verdict
+
+
+def _new_counts() -> dict:
+    counts = {"Requests": 0, "Bytes": 0, "Blocked": 0, "BlockedBytes": 0, "UnknownCountry": 0}
+    for rule in RULES:
+        counts[rule] = {"Requests": 0, "Bytes": 0}
+    return counts
+
+
+def analyze_chunk(rules: AccessRules, chunk: dict, counts: dict) -> None:
+    """Add one access_log chunk's requests to counts"""
+    area, method, ua = counts["AreaAccessRule"], counts["MethodDeniedRule"], counts["UaAccessRule"]
+    for m, country, agent, size in zip(chunk["method"], chunk["country"], chunk["ua"], chunk["bytes"]):
+        counts["Requests"] += 1
+        counts["Bytes"] += size
+        if not country:
+            counts["UnknownCountry"] += 1
+        blocked = False
+        if rules.area_blocks(country):
+            area["Requests"] += 1
+            area["Bytes"] += size
+            blocked = True
+        if rules.method_blocks(m):
+            method["Requests"] += 1
+            method["Bytes"] += size
+            blocked = True
+        if rules.ua_blocks(agent):
+            ua["Requests"] += 1
+            ua["Bytes"] += size
+            blocked = True
+        if blocked:
+            counts["Blocked"] += 1
+            counts["BlockedBytes"] += size
+
+
+def _analyze_range(task) -> dict:
+    """Pool worker: counts per policy for one byte range of the log"""
+    path, fmt, start, end, policies, chunk_lines = task
+    compiled = {name: AccessRules(policy) for name, policy in policies.items()}
+    counts = {name: _new_counts() for name in policies}
+    for chunk in iter_chunks(path, fmt, chunk_lines, start, end):
+        for name, rules in compiled.items():
+            analyze_chunk(rules, chunk, counts[name])
+    return counts
+
+
+def _merge(total: dict, part: dict) -> dict:
+    for key, value in part.items():
+        if isinstance(value, dict):
+            _merge(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def analyze(log_path: str, policies: dict, fmt: str = "auto", workers: int = None,
+            chunk_lines: int = 50_000) -> dict:
+    """Replay an access log against several policies
+
+    Input:
+        - log_path: Access log (plain files are split across workers)
+        - policies: {name: delivery policy}, e.g. {"current": ..., "proposed": ...}
+        - workers: Processes to use (default: all cores)
+
+    Output:
+        - {name: {Requests, Bytes, Blocked, BlockedBytes, UnknownCountry,
+          <rule>: {Requests, Bytes}}}, blocked counts per rule overlap when
+          several rules block the same request
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(log_path, fmt, start, end, dict(policies), chunk_lines)
+             for start, end in split_ranges(log_path, workers)]
+    if len(tasks) == 1:
+        return _analyze_range(tasks[0])
+    with Pool(min(workers, len(tasks))) as pool:
+        results = pool.map(_analyze_range, tasks)
+    total = {}
+    for part in results:
+        _merge(total, part)
+    return total
+
+
+def print_report(report: dict) -> None:
+    for name, counts in report.items():
+        requests = counts["Requests"] or 1
+        print(f"{name}: {counts['Blocked']}/{counts['Requests']} requests blocked "
+              f"({counts['Blocked'] / requests:.2%}), {counts['BlockedBytes']} bytes; "
+              f"{counts['UnknownCountry']} without country")
+        for rule in RULES:
+            print(f"  {rule:<18} {counts[rule]['Requests']:>12} req {counts[rule]['Bytes']:>16} bytes")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate traffic blocked by delivery policy access rules")
+    parser.add_argument("log", help="Access log (combined or jsonl)")
+    parser.add_argument("--proposed", action="append", default=[],
+                        help="JSON file of changes overlaid on the delivery template (repeatable)")
+    parser.add_argument("--format", default="auto", choices=["auto", "combined", "jsonl"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    candidates = {"current": delivery_policy_template}
+    for proposed in args.proposed:
+        with open(proposed) as f:
+            candidates[os.path.basename(proposed)] = overlay(delivery_policy_template, json.load(f))
+
+    result = analyze(args.log, candidates, args.format, args.workers)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    sys.exit(0)
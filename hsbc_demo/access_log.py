@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Access Log Reader
+
+Streams CDN access logs in fixed-size chunks of columns, so the log
+analyzers (cache rule simulation, access control impact, cache key
+cardinality) run in bounded memory on multi-GB files. Each chunk is a dict
+of equally long lists, one per field in FIELDS.
+
+Supported formats:
+    - combined: nginx/Apache combined log, optionally followed by a quoted
+      host and a quoted country code
+    - jsonl: one JSON object per line with keys time, client_ip, method,
+      host, url (or path + query), status, bytes, ua, country
+
+Plain files can also be read by byte range (see split_ranges), which lets
+worker processes share one file without reading each other's lines.
+"""
+import os
+import re
+import gzip
+import json
+import logging
+import functools
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("time", "client_ip", "method", "host", "path", "query", "status", "bytes", "ua", "country")
+
+COMBINED_RE = re.compile(
+    r'(?P<client_ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<request>[^"]*)" (?P<status>\d{3}) (?P<bytes>\d+|-)'
+    r'(?: "[^"]*" "(?P<ua>[^"]*)")?(?: "(?P<host>[^"]*)")?(?: "(?P<country>[^"]*)")?'
+)
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_clf_time(value: str) -> float:
+    """Epoch seconds of a "10/Oct/2024:13:55:36 +0800" timestamp (repeats are cached)"""
+    return datetime.strptime(value, "%d/%b/%Y:%H:%M:%S %z").timestamp()
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_iso_time(value: str) -> float:
+    """Epoch seconds of an ISO 8601 timestamp; naive times are taken as UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _parse_time(value) -> float:
+    """Epoch seconds of a JSON log time: a number, ISO 8601 or CLF string (ValueError otherwise)"""
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f"Invalid time: {value!r}")
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return _parse_iso_time(value)
+    except ValueError:
+        return _parse_clf_time(value)
+
+
+def _split_url(url: str) -> tuple:
+    path, _, query = url.partition("?")
+    return path, query
+
+
+def parse_combined(line: str):
+    """Record tuple (in FIELDS order) of a combined log line, or None if malformed"""
+    m = COMBINED_RE.match(line)
+    if m is None:
+        return None
+    request = m.group("request").split(" ")
+    if len(request) < 2:
+        return None
+    path, query = _split_url(request[1])
+    size = m.group("bytes")
+    return (_parse_clf_time(m.group("time")), m.group("client_ip"), request[0], m.group("host") or "",
+            path, query, int(m.group("status")), 0 if size == "-" else int(size),
+            m.group("ua") or "", m.group("country") or "")
+
+
+def parse_jsonl(line: str):
+    """Record tuple (in FIELDS order) of a JSON log line, or None if malformed"""
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(row, dict):
+        return None
+    try:
+        if "url" in row:
+            path, query = _split_url(row["url"])
+        else:
+            path, query = row.get("path", ""), row.get("query", "")
+        size = row.get("bytes", 0)
+        return (_parse_time(row.get("time")), row.get("client_ip", ""), row.get("method", "GET"),
+                row.get("host", ""), path, query, int(row.get("status", 200)), 0 if size == "-" else int(size),
+                row.get("ua", ""), row.get("country", ""))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+PARSERS = {"combined": parse_combined, "jsonl": parse_jsonl}
+
+
+def detect_format(path: str) -> str:
+    """Guess the format of a log file from its first non-empty line"""
+    with _open(path) as f:
+        for line in f:
+            if line.strip():
+                return "jsonl" if line.lstrip().startswith("{") else "combined"
+    return "combined"
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def split_ranges(path: str, parts: int) -> list:
+    """Split a plain log file into `parts` byte ranges [(start, end), ...]
+
+    Ranges are cut at arbitrary offsets; iter_lines assigns every line to
+    exactly one range (the one its first byte falls in).
+    """
+    if path.endswith(".gz"):
+        return [(0, None)]
+    size = os.path.getsize(path)
+    parts = max(1, min(parts, size // (1 << 20) or 1))
+    step = -(-size // parts)
+    return [(start, min(size, start + step)) for start in range(0, size, step)] or [(0, None)]
+
+
+def iter_lines(path: str, start: int = 0, end: int = None):
+    """Lines whose first byte lies in [start, end) (the whole file by default)"""
+    if start == 0 and end is None:
+        with _open(path) as f:
+            yield from f
+        return
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            # A line starting exactly at `start` belongs to this range
+            if f.read(1) != b"\n":
+                f.readline()
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                return
+            yield line.decode("utf-8", errors="replace")
+
+
+def iter_chunks(path: str, fmt: str = "auto", chunk_lines: int = 100_000, start: int = 0, end: int = None):
+    """Stream a log as column chunks
+
+    Input:
+        - path: Log file (plain or .gz)
+        - fmt: "combined", "jsonl" or "auto"
+        - chunk_lines: Records per chunk (bounds memory use)
+        - start, end: Optional byte range of a plain file (see split_ranges)
+
+    Output:
+        - Iterator of {field: [values]} dicts; malformed lines are skipped
+    """
+    parse = PARSERS[detect_format(path) if fmt == "auto" else fmt]
+    rows, skipped = [], 0
+    for line in iter_lines(path, start, end):
+        record = parse(line.rstrip("\r\n"))
+        if record is None:
+            skipped += bool(line.strip())
+            continue
+        rows.append(record)
+        if len(rows) >= chunk_lines:
+            yield _columns(rows)
+            rows = []
+    if rows:
+        yield _columns(rows)
+    if skipped:
+        logger.debug(f"Skipped {skipped} malformed lines in {path}")
+
+
+def _columns(rows: list) -> dict:
+    return dict(zip(FIELDS, map(list, zip(*rows))))
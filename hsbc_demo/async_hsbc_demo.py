@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo asyncio Client
+
+AsyncHSBCDemo exposes awaitable versions of every HSBCDemo operation for
+asyncio applications. The blocking SDK calls run on one managed thread
+pool behind a semaphore, all sharing a single CDNService and its
+keep-alive connection pool, so one event loop can drive thousands of
+in-flight operations while only `max_concurrency` hit the API at once.
+
+Timeouts and cancellation: a call that is cancelled or times out before a
+worker picks it up never runs; one already running in a worker thread
+finishes in the background, but its result is discarded.
+"""
+import time
+import asyncio
+import logging
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from client_pool import mount_connection_pool
+from hsbc_demo import HSBCDemo
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHSBCDemo:
+    def __init__(self, demo: HSBCDemo = None, max_concurrency: int = 32, timeout: float = None, **demo_kwargs):
+        """Wrap an HSBCDemo client for asyncio
+
+        Input:
+            - demo: Existing HSBCDemo client (created from demo_kwargs if omitted)
+            - max_concurrency: Worker threads, semaphore size and HTTP pool size
+            - timeout: Default per-call timeout in seconds (None = no timeout)
+            - demo_kwargs: Passed to HSBCDemo() when demo is omitted
+        """
+        self._demo = demo or HSBCDemo(**demo_kwargs)
+        self._timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="async_hsbc")
+        mount_connection_pool(self._demo._svc, max_concurrency)
+
+    @property
+    def demo(self) -> HSBCDemo:
+        """The underlying synchronous client"""
+        return self._demo
+
+    async def _run(self, func, *args, timeout: float = None, **kwargs):
+        """Run a blocking call on the executor under the semaphore and timeout"""
+        timeout = timeout if timeout is not None else self._timeout
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            return await asyncio.wait_for(future, timeout)
+
+    async def _aiter(self, iterator, batch_size: int):
+        """Drain a blocking iterator batch by batch without blocking the loop
+
+        A batch whose await was cancelled or timed out may still be running in
+        a worker thread; the lock makes close() wait for it instead of failing
+        with "generator already executing".
+        """
+        lock = threading.Lock()
+
+        def _next_batch():
+            with lock:
+                return list(itertools.islice(iterator, batch_size))
+
+        def _close():
+            with lock:
+                iterator.close()
+
+        try:
+            while True:
+                batch = await self._run(_next_batch)
+                if not batch:
+                    return
+                for item in batch:
+                    yield item
+        finally:
+            if hasattr(iterator, "close"):
+                # No timeout: the close has to wait for a batch still running
+                await asyncio.get_running_loop().run_in_executor(self._executor, _close)
+
+    async def close(self) -> None:
+        """Shut down the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Domains
+
+    async def create_domain(self, domain: str, id_rule: str, id_delivery: str, id_cipher, timeout: float = None) -> bool:
+        """Awaitable HSBCDemo.create_domain"""
+        return await self._run(self._demo.create_domain, domain, id_rule, id_delivery, id_cipher, timeout=timeout)
+
+    async def create_domains(self, specs, timeout: float = None) -> list:
+        """Onboard many domains concurrently, bounded by max_concurrency
+
+        Output:
+            - Result rows (Domain, Success, Latency, Error) in input order,
+              like HSBCDemo.create_domains
+        """
+        async def _onboard(spec):
+            started = time.perf_counter()
+            error = None
+            try:
+                success = await self.create_domain(timeout=timeout, **spec)
+            except asyncio.TimeoutError:
+                success, error = False, "timed out"
+            except Exception as e:
+                success, error = False, str(e)
+            if not success and error is None:
+                error = "add_template_domain failed, see log for details"
+            return {"Domain": spec.get("domain"), "Success": success,
+                    "Latency": time.perf_counter() - started, "Error": error}
+
+        return list(await asyncio.gather(*(_onboard(spec) for spec in specs)))
+
+    async def update_template_domain(self, domain: str, id_rule: str, id_delivery: str, id_cipher,
+                                     timeout: float = None) -> bool:
+        """Awaitable HSBCDemo.update_template_domain"""
+        return await self._run(self._demo.update_template_domain, domain, id_rule, id_delivery, id_cipher,
+                               timeout=timeout)
+
+    async def list_cdn_domains(self, timeout: float = None) -> None:
+        """Awaitable HSBCDemo.list_cdn_domains"""
+        return await self._run(self._demo.list_cdn_domains, timeout=timeout)
+
+    def iter_cdn_domains(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Async iterator over HSBCDemo.iter_cdn_domains"""
+        return self._aiter(self._demo.iter_cdn_domains(page_size, filters, prefetch), page_size)
+
+    def iter_template_domains(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Async iterator over HSBCDemo.iter_template_domains"""
+        return self._aiter(self._demo.iter_template_domains(page_size, filters, prefetch), page_size)
+
+    # Templates
+
+    def iter_templates(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Async iterator over HSBCDemo.iter_templates"""
+        return self._aiter(self._demo.iter_templates(page_size, filters, prefetch), page_size)
+
+    async def create_template(self, kind: str, body: dict, timeout: float = None) -> str:
+        """Awaitable HSBCDemo.create_template"""
+        return await self._run(self._demo.create_template, kind, body, timeout=timeout)
+
+    async def describe_template(self, kind: str, template_id: str, timeout: float = None) -> dict:
+        """Awaitable HSBCDemo.describe_template"""
+        return await self._run(self._demo.describe_template, kind, template_id, timeout=timeout)
+
+    async def update_template(self, kind: str, template_id: str, changes: dict, timeout: float = None) -> bool:
+        """Awaitable HSBCDemo.update_template"""
+        return await self._run(self._demo.update_template, kind, template_id, changes, timeout=timeout)
+
+    async def create_delivery_policy(self, title: str, overrides: dict = None, timeout: float = None) -> str:
+        """Awaitable HSBCDemo.create_delivery_policy"""
+        return await self._run(self._demo.create_delivery_policy, title, overrides, timeout=timeout)
+
+    async def describe_delivery_policy(self, template_id: str, timeout: float = None) -> dict:
+        """Awaitable HSBCDemo.describe_delivery_policy"""
+        return await self._run(self._demo.describe_delivery_policy, template_id, timeout=timeout)
+
+    async def create_cipher_policy(self, title: str, timeout: float = None) -> str:
+        """Awaitable HSBCDemo.create_cipher_policy"""
+        return await self._run(self._demo.create_cipher_policy, title, timeout=timeout)
+
+    async def describe_cipher_policy(self, template_id: str, timeout: float = None) -> dict:
+        """Awaitable HSBCDemo.describe_cipher_policy"""
+        return await self._run(self._demo.describe_cipher_policy, template_id, timeout=timeout)
+
+    async def update_cipher_template(self, template_id: str, timeout: float = None) -> None:
+        """Awaitable HSBCDemo.update_cipher_template"""
+        return await self._run(self._demo.update_cipher_template, template_id, timeout=timeout)
+
+    async def create_rule_engine(self, title: str, timeout: float = None) -> str:
+        """Awaitable HSBCDemo.create_rule_engine"""
+        return await self._run(self._demo.create_rule_engine, title, timeout=timeout)
+
+    async def describe_rule_engine_policy(self, template_id: str, timeout: float = None) -> dict:
+        """Awaitable HSBCDemo.describe_rule_engine_policy"""
+        return await self._run(self._demo.describe_rule_engine_policy, template_id, timeout=timeout)
+
+    async def release_policy(self, template_id: str, timeout: float = None) -> bool:
+        """Awaitable HSBCDemo.release_policy"""
+        return await self._run(self._demo.release_policy, template_id, timeout=timeout)
+
+    async def delete_policy(self, template_id: str, timeout: float = None) -> None:
+        """Awaitable HSBCDemo.delete_policy"""
+        return await self._run(self._demo.delete_policy, template_id, timeout=timeout)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo CLI Startup Budget
+
+Measures the wall time of short cli.py invocations in fresh interpreters
+and fails when the median exceeds the budget, so an eager import of the
+SDK (or of another heavy module) is caught before it slows down cron and
+automation loops. With --top, the slowest imports of each invocation are
+listed from python -X importtime.
+
+Usage:
+    python bench_import_time.py [--budget-ms 60] [--runs 15] [--top 10]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(HERE, "cli.py")
+
+# (label, cli.py arguments, budget multiplier)
+INVOCATIONS = (
+    ("--help", ["--help"], 1.0),
+    ("bad arguments", ["release-policy"], 1.0),
+    ("fake describe", ["--fake", "--log-file", "", "--log-level", "ERROR", "describe-template", "cipher", "x"], 3.0),
+)
+
+
+def measure(args: list, runs: int) -> list:
+    """Wall time in seconds of each of `runs` fresh `python args` processes"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def slowest_imports(args: list, top: int) -> list:
+    """[(cumulative microseconds, module)] of the slowest top-level imports"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", CLI, *args], cwd=HERE,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check cli.py startup time against a budget")
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="Median budget of the lightest invocations")
+    parser.add_argument("--runs", type=int, default=15, help="Processes started per invocation")
+    parser.add_argument("--top", type=int, default=0, help="Show the N slowest imports per invocation")
+    args = parser.parse_args()
+
+    baseline = statistics.median(measure(["-c", "pass"], args.runs)) * 1000
+    print(f"{'bare interpreter':<16} median {baseline:7.1f} ms")
+
+    over_budget = False
+    for label, cli_args, multiplier in INVOCATIONS:
+        budget = args.budget_ms * multiplier
+        median = statistics.median(measure([CLI, *cli_args], args.runs)) * 1000
+        status = "ok" if median <= budget else "OVER BUDGET"
+        over_budget |= median > budget
+        print(f"{label:<16} median {median:7.1f} ms  (budget {budget:.0f} ms)  {status}")
+        for cumulative, module in slowest_imports(cli_args, args.top):
+            print(f"    {cumulative / 1000:7.1f} ms  {module}")
+    sys.exit(1 if over_budget else 0)
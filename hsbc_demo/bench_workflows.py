@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: HSBCDemo workflow throughput against the fake CDN OpenAPI
+
+Runs every HSBCDemo operation and the full provisioning workflow against
+fake_cdn.FakeCDNBackend with configurable latency, error rate and quota,
+and reports ops/sec plus p50/p99 latency per step. Use it as the
+regression baseline for performance work.
+
+Usage:
+    python bench_workflows.py [--iterations N] [--concurrency C] [--latency S]
+                              [--error-rate P] [--qps Q] [--client-rate R]
+"""
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_cdn import FakeCDNBackend, FakeCDNService
+from hsbc_demo import HSBCDemo, build_provisioning_workflow
+from log_config import configure_logging
+from resilience import Resilience, RetryPolicy
+from workflow import STATUS_SUCCEEDED
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_step(name: str, func, iterations: int, concurrency: int) -> dict:
+    """Call func(i) for i in range(iterations) on `concurrency` threads
+
+    Output:
+        - Result row with ops/sec, p50/p99 latency and failure count;
+          a call fails when it raises or returns False/None
+    """
+    def _timed(i):
+        started = time.perf_counter()
+        try:
+            result = func(i)
+            ok = result is not None and result is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(_timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        "step": name,
+        "ops": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "failed": sum(1 for _, ok in samples if not ok)
+    }
+
+
+def run_benchmarks(args) -> list:
+    backend = FakeCDNBackend(latency=args.latency, latency_jitter=args.latency_jitter,
+                             error_rate=args.error_rate, qps_limits={"*": args.qps} if args.qps else None,
+                             seed=42)
+    demo = HSBCDemo(
+        resilience=Resilience(default_rate=args.client_rate, retry=RetryPolicy(base_delay=0.05)),
+        svc=FakeCDNService(backend)
+    )
+    n, c = args.iterations, args.concurrency
+    rows = []
+
+    # Template pools created by the create steps feed the later per-template steps
+    ids = {"cipher": [], "rule": [], "delivery": []}
+
+    def _created(kind, template_id):
+        if template_id:
+            ids[kind].append(template_id)
+        return template_id
+
+    pick = lambda kind, i: ids[kind][i % len(ids[kind])] if ids[kind] else None
+
+    rows.append(run_step("create_cipher_policy", lambda i: _created("cipher", demo.create_cipher_policy(f"bench_cipher_{i}")), n, c))
+    rows.append(run_step("create_rule_engine", lambda i: _created("rule", demo.create_rule_engine(f"bench_rule_{i}")), n, c))
+    rows.append(run_step("create_delivery_policy", lambda i: _created("delivery", demo.create_delivery_policy(f"bench_delivery_{i}")), n, c))
+    rows.append(run_step("release_policy", lambda i: demo.release_policy(pick("cipher", i)), n, c))
+    for kind in ("rule", "delivery"):
+        for template_id in ids[kind]:
+            demo.release_policy(template_id)
+    rows.append(run_step("describe_cipher_policy", lambda i: demo.describe_cipher_policy(pick("cipher", i)), n, c))
+    rows.append(run_step("describe_rule_engine_policy", lambda i: demo.describe_rule_engine_policy(pick("rule", i)), n, c))
+    rows.append(run_step("describe_delivery_policy", lambda i: demo.describe_delivery_policy(pick("delivery", i)), n, c))
+    rows.append(run_step("update_cipher_template", lambda i: demo.update_cipher_template(pick("cipher", i)), n, c))
+    rows.append(run_step("create_domain", lambda i: demo.create_domain(
+        f"bench-{i}.example.com", pick("rule", i), pick("delivery", i), pick("cipher", i)), n, c))
+    rows.append(run_step("list_cdn_domains", lambda i: sum(1 for _ in demo.iter_cdn_domains(page_size=100)), max(1, n // 10), c))
+
+    spare = [demo.create_cipher_policy(f"bench_spare_{i}") for i in range(n)]
+    rows.append(run_step("delete_policy", lambda i: demo.delete_policy(spare[i]), n, c))
+
+    runs = max(1, n // 10)
+    rows.append(run_step(
+        "full_provisioning",
+        lambda i: all(row["Status"] == STATUS_SUCCEEDED for row in
+                      build_provisioning_workflow(demo, f"bench-full-{i}.example.com").run().values()),
+        runs, c
+    ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HSBCDemo workflow benchmark against the fake CDN OpenAPI")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per step")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads per step")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake API base latency in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.01, help="Fake API random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake API injected error probability")
+    parser.add_argument("--qps", type=float, default=None, help="Fake API per-action quota")
+    parser.add_argument("--client-rate", type=float, default=1000.0, help="Client-side rate limit per API")
+    args = parser.parse_args()
+
+    configure_logging(level=logging.ERROR, log_file=None)
+    rows = run_benchmarks(args)
+
+    print(f"{'step':<30}{'ops':>6}{'ops/sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for row in rows:
+        print(f"{row['step']:<30}{row['ops']:>6}{row['ops_per_sec']:>10.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['failed']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Cache Key Cardinality Estimator
+
+Counts distinct cache keys per directory in an access log, under the
+delivery policy's current CacheKey rules and under alternative query
+string include/exclude lists, to show how much each configuration
+fragments the cache. Every (variant, directory) pair gets a fixed-memory
+HyperLogLog sketch; the log is split into byte ranges that worker
+processes sketch independently, and the sketches are merged at the end,
+so no log lines or keys are ever held in memory.
+
+Variants are given as NAME=ACTION:PARAMS, e.g.
+    --variant no-tracking=exclude:utm_source,utm_medium,sid
+    --variant versioned=include:v
+    --variant path-only=exclude:*
+
+Usage:
+    python cache_key_cardinality.py access.log --variant versioned=include:v [--depth 1]
+"""
+import os
+import sys
+import json
+import argparse
+from multiprocessing import Pool
+
+from access_log import iter_chunks, split_ranges
+from cache_simulator import CacheKeyRules, query_key
+from hll import HyperLogLog
+from hsbc_demo_json import delivery_policy_template
+
+CURRENT = "current"
+
+
+def parse_variant(spec: str) -> tuple:
+    """("name", action, names) from "NAME=include|exclude:PARAMS" """
+    name, _, rule = spec.partition("=")
+    action, _, names = rule.partition(":")
+    if not name or action not in ("include", "exclude") or not names:
+        raise ValueError(f"Invalid variant {spec!r}, expected NAME=include|exclude:PARAMS")
+    return name, action, names
+
+
+def directory(path: str, depth: int) -> str:
+    """The first `depth` directories of a path ("/" for top-level files)"""
+    parts = path.split("/")[1:-1][:depth]
+    return "/" + "".join(part + "/" for part in parts)
+
+
+def _sketch_range(task) -> dict:
+    """Pool worker: {directory: {"Requests": n, variant: HyperLogLog}} for one byte range"""
+    path, fmt, start, end, cache_key_rules, variants, depth, precision, chunk_lines = task
+    current = CacheKeyRules(cache_key_rules)
+    result = {}
+    for chunk in iter_chunks(path, fmt, chunk_lines, start, end):
+        keys = {}
+        for host, url_path, query in zip(chunk["host"], chunk["path"], chunk["query"]):
+            directory_keys = keys.setdefault(directory(url_path, depth), {CURRENT: []})
+            directory_keys[CURRENT].append(current.key(host, url_path, query))
+            for name, action, names in variants:
+                variant_query = query_key(query, action, names)
+                directory_keys.setdefault(name, []).append(
+                    f"{host}{url_path}?{variant_query}" if variant_query else f"{host}{url_path}")
+        for name, directory_keys in keys.items():
+            entry = result.setdefault(name, {"Requests": 0})
+            entry["Requests"] += len(directory_keys[CURRENT])
+            for variant, variant_keys in directory_keys.items():
+                entry.setdefault(variant, HyperLogLog(precision)).update(variant_keys)
+    return result
+
+
+def estimate(log_path: str, variants: list, policy=delivery_policy_template, depth: int = 1,
+             fmt: str = "auto", workers: int = None, precision: int = 14, chunk_lines: int = 50_000) -> dict:
+    """Estimate distinct cache keys per directory
+
+    Input:
+        - log_path: Access log (plain files are split across workers)
+        - variants: [(name, action, params)] query string alternatives (see parse_variant)
+        - policy: Delivery policy whose CacheKey rules are the "current" variant
+        - depth: Directory levels to group by
+        - precision: HyperLogLog precision (memory per sketch is 2**precision bytes)
+
+    Output:
+        - {directory: {"Requests": n, variant: estimated distinct keys}},
+          plus a "*" entry for the whole log
+    """
+    workers = workers or os.cpu_count() or 1
+    rules = policy.get("CacheKey") or ()
+    tasks = [(log_path, fmt, start, end, rules, list(variants), depth, precision, chunk_lines)
+             for start, end in split_ranges(log_path, workers)]
+    if len(tasks) == 1:
+        parts = [_sketch_range(tasks[0])]
+    else:
+        with Pool(min(workers, len(tasks))) as pool:
+            parts = pool.map(_sketch_range, tasks)
+
+    merged = {}
+    for part in parts:
+        for name, entry in part.items():
+            target = merged.setdefault(name, {"Requests": 0})
+            target["Requests"] += entry.pop("Requests")
+            for variant, sketch in entry.items():
+                if variant in target:
+                    target[variant].merge(sketch)
+                else:
+                    target[variant] = sketch
+
+    overall = {"Requests": 0}
+    for entry in merged.values():
+        overall["Requests"] += entry["Requests"]
+        for variant, sketch in entry.items():
+            if variant != "Requests":
+                overall.setdefault(variant, HyperLogLog(precision)).merge(sketch)
+    merged["*"] = overall
+    return {name: {key: value if key == "Requests" else value.count() for key, value in entry.items()}
+            for name, entry in merged.items()}
+
+
+def print_report(report: dict, variants: list) -> None:
+    names = [CURRENT] + [name for name, _, _ in variants]
+    print(f"{'directory':<32} {'requests':>12} " + " ".join(f"{name:>14}" for name in names))
+    for name, entry in sorted(report.items(), key=lambda item: -item[1]["Requests"]):
+        print(f"{name:<32} {entry['Requests']:>12} " + " ".join(f"{entry.get(v, 0):>14}" for v in names))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate distinct cache keys per directory with HyperLogLog")
+    parser.add_argument("log", help="Access log (combined or jsonl)")
+    parser.add_argument("--variant", action="append", default=[], help="NAME=include|exclude:PARAMS (repeatable)")
+    parser.add_argument("--depth", type=int, default=1, help="Directory levels to group by")
+    parser.add_argument("--precision", type=int, default=14, help="HyperLogLog precision (4..18)")
+    parser.add_argument("--format", default="auto", choices=["auto", "combined", "jsonl"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    alternatives = [parse_variant(spec) for spec in args.variant]
+    result = estimate(args.log, alternatives, depth=args.depth, fmt=args.format, workers=args.workers,
+                      precision=args.precision)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result, alternatives)
+    sys.exit(0)
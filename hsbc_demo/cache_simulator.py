@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Cache Rule Simulator
+
+Predicts how the delivery policy's Cache and CacheKey rules treat real
+traffic before a change is released. Rules are compiled into set and
+prefix lookups, access logs are streamed in chunks (access_log), every
+chunk is classified in one vectorized pass (NumPy when installed, a plain
+Python loop otherwise) and origin fetches are simulated with a bounded LRU
+of cache keys, so memory stays flat however large the log is.
+
+Rule semantics used here:
+    - filetype matches the path extension, directory a path prefix, path
+      the exact path; Operator "not_match" negates
+    - the first Cache rule that matches a request decides its TTL
+    - a request is served from cache if its method is GET/HEAD, its rule
+      caches with a TTL > 0 and its cache key was fetched less than TTL
+      seconds earlier (and is still in the LRU)
+
+Usage:
+    python cache_simulator.py access.log [--policy proposed.json] [--max-keys 1000000]
+"""
+import sys
+import json
+import argparse
+from collections import OrderedDict
+
+from access_log import iter_chunks
+from hsbc_demo_json import delivery_policy_template, overlay
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CACHEABLE_METHODS = frozenset(("GET", "HEAD"))
+NO_RULE = "(no rule)"
+
+
+def _values(value) -> list:
+    """Rule values are semicolon (or comma) separated strings or lists"""
+    if isinstance(value, str):
+        value = value.replace(",", ";").split(";")
+    return [v.strip() for v in value if v.strip()]
+
+
+def extension(path: str) -> str:
+    """Lower-cased file extension of a URL path ("" if none)"""
+    name = path.rpartition("/")[2]
+    return name.rpartition(".")[2].lower() if "." in name else ""
+
+
+class ConditionRule:
+    def __init__(self, rule: dict):
+        """One compiled {"Object", "Operator", "Value"} condition"""
+        self.object = rule["Object"]
+        self.negate = rule.get("Operator") == "not_match"
+        values = _values(rule.get("Value") or [])
+        if self.object == "filetype":
+            self.values = frozenset(v.lower().lstrip(".") for v in values)
+        elif self.object == "directory":
+            self.values = tuple(v if v.endswith("/") else v + "/" for v in values)
+        elif self.object == "path":
+            self.values = frozenset(values)
+        else:
+            raise ValueError(f"Unsupported condition object: {self.object}")
+
+    def match(self, path: str) -> bool:
+        if self.object == "filetype":
+            hit = extension(path) in self.values
+        elif self.object == "directory":
+            hit = path.startswith(self.values)
+        else:
+            hit = path in self.values
+        return hit != self.negate
+
+    def match_array(self, paths, extensions):
+        """Vectorized match over NumPy arrays of paths and extensions"""
+        if self.object == "filetype":
+            hit = np.isin(extensions, list(self.values))
+        elif self.object == "directory":
+            hit = np.zeros(len(paths), dtype=bool)
+            for prefix in self.values:
+                hit |= np.char.startswith(paths, prefix)
+        else:
+            hit = np.isin(paths, list(self.values))
+        return ~hit if self.negate else hit
+
+
+class Condition:
+    def __init__(self, condition: dict):
+        """Compiled {"ConditionRule": [...], "Connective": "OR"|"AND"}; empty matches all"""
+        condition = condition or {}
+        self.rules = [ConditionRule(rule) for rule in condition.get("ConditionRule") or []]
+        self.all = str(condition.get("Connective", "OR")).upper() == "AND"
+
+    def match(self, path: str) -> bool:
+        if not self.rules:
+            return True
+        hits = (rule.match(path) for rule in self.rules)
+        return all(hits) if self.all else any(hits)
+
+    def match_array(self, paths, extensions):
+        if not self.rules:
+            return np.ones(len(paths), dtype=bool)
+        hits = [rule.match_array(paths, extensions) for rule in self.rules]
+        return np.logical_and.reduce(hits) if self.all else np.logical_or.reduce(hits)
+
+    def describe(self) -> str:
+        parts = []
+        for rule in self.rules:
+            values = sorted(rule.values) if isinstance(rule.values, frozenset) else list(rule.values)
+            shown = ";".join(values[:4]) + (f";+{len(values) - 4}" if len(values) > 4 else "")
+            parts.append(f"{rule.object}{'!=' if rule.negate else '='}{shown}")
+        return f" {'AND' if self.all else 'OR'} ".join(parts) or "*"
+
+
+class CacheRule:
+    def __init__(self, rule: dict):
+        action = rule.get("CacheAction") or {}
+        self.condition = Condition(rule.get("Condition"))
+        self.policy = action.get("DefaultPolicy", "")
+        self.ttl = int(action.get("Ttl") or 0)
+        self.ignore_case = bool(action.get("IgnoreCase"))
+        self.caches = action.get("Action", "cache") == "cache" and self.ttl > 0
+        self.name = f"{self.condition.describe()} [{self.policy} ttl={self.ttl}]"
+
+
+def query_key(query: str, action: str = "include", names="*", ignore_case: bool = False) -> str:
+    """Query string part of a cache key under one CacheKey component
+
+    Input:
+        - query: Raw query string (without "?")
+        - action: "include" or "exclude"
+        - names: "*" or the query parameter names the action applies to
+        - ignore_case: Compare parameter names case-insensitively
+    """
+    if names == "*" or names == ["*"]:
+        return query if action == "include" else ""
+    if not query:
+        return ""
+    fold = str.lower if ignore_case else str
+    wanted = frozenset(fold(n) for n in _values(names))
+    include = action == "include"
+    kept = [p for p in query.split("&") if (fold(p.partition("=")[0]) in wanted) == include]
+    return "&".join(sorted(kept))
+
+
+class CacheKeyRules:
+    def __init__(self, rules: list):
+        """Compiled CacheKey rules; the first matching rule builds the key"""
+        self.rules = []
+        for rule in rules or []:
+            components = (rule.get("CacheKeyAction") or {}).get("CacheKeyComponents") or []
+            query = [c for c in components if c.get("Object") == "queryString"]
+            component = query[0] if query else {"Action": "include", "Subobject": "*"}
+            self.rules.append((Condition(rule.get("Condition")), component.get("Action", "include"),
+                               component.get("Subobject", "*"), bool(component.get("IgnoreCase"))))
+
+    def key(self, host: str, path: str, query: str) -> str:
+        for condition, action, names, ignore_case in self.rules:
+            if condition.match(path):
+                query = query_key(query, action, names, ignore_case)
+                break
+        return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+class CacheSimulator:
+    def __init__(self, policy=delivery_policy_template, max_keys: int = 1_000_000, vectorized: bool = True):
+        """Simulate a delivery policy's caching against access logs
+
+        Input:
+            - policy: Delivery policy dict (Cache and CacheKey are used)
+            - max_keys: Cache keys tracked at once (bounds memory; keys
+              evicted from this LRU are treated as evicted from the CDN)
+            - vectorized: Classify with NumPy when it is installed
+        """
+        self.rules = [CacheRule(rule) for rule in policy.get("Cache") or []]
+        self.cache_key = CacheKeyRules(policy.get("CacheKey"))
+        self.vectorized = vectorized and np is not None
+        self._max_keys = max_keys
+        self._fetched = OrderedDict()
+        # Paths and extensions are compared in NumPy cut to one character more
+        # than the longest rule value: prefix and exact matches are unchanged,
+        # and the fixed-width arrays no longer grow with the longest URL
+        condition_rules = [item for rule in self.rules for item in rule.condition.rules]
+        self._path_width = 1 + max((len(v) for item in condition_rules if item.object != "filetype"
+                                    for v in item.values), default=0)
+        self._ext_width = 1 + max((len(v) for item in condition_rules if item.object == "filetype"
+                                   for v in item.values), default=0)
+        self.stats = [{"Rule": name, "Requests": 0, "Bytes": 0, "OriginRequests": 0, "OriginBytes": 0}
+                      for name in [rule.name for rule in self.rules] + [NO_RULE]]
+
+    def classify(self, paths: list) -> list:
+        """Index of the first matching Cache rule per path (len(rules) = none)"""
+        if self.vectorized and paths:
+            path_width, ext_width = self._path_width, self._ext_width
+            path_array = np.array([p[:path_width] for p in paths], dtype=f"<U{path_width}")
+            ext_array = np.array([extension(p)[:ext_width] for p in paths], dtype=f"<U{ext_width}")
+            chosen = np.full(len(paths), len(self.rules))
+            for index in range(len(self.rules) - 1, -1, -1):
+                chosen[self.rules[index].condition.match_array(path_array, ext_array)] = index
+            return chosen.tolist()
+        none = len(self.rules)
+        return [next((i for i, rule in enumerate(self.rules) if rule.condition.match(p)), none) for p in paths]
+
+    def feed(self, chunk: dict) -> None:
+        """Account one access_log chunk"""
+        rule_ids = self.classify(chunk["path"])
+        fetched, max_keys = self._fetched, self._max_keys
+        for rule_id, now, method, host, path, query, size in zip(
+                rule_ids, chunk["time"], chunk["method"], chunk["host"], chunk["path"], chunk["query"],
+                chunk["bytes"]):
+            row = self.stats[rule_id]
+            row["Requests"] += 1
+            row["Bytes"] += size
+            rule = self.rules[rule_id] if rule_id < len(self.rules) else None
+            if rule is not None and rule.caches and method in CACHEABLE_METHODS:
+                key = self.cache_key.key(host, path.lower() if rule.ignore_case else path, query)
+                last = fetched.get(key)
+                if last is not None and (now is None or last is None or now - last < rule.ttl):
+                    fetched.move_to_end(key)
+                    continue
+                fetched[key] = now
+                fetched.move_to_end(key)
+                if len(fetched) > max_keys:
+                    fetched.popitem(last=False)
+            row["OriginRequests"] += 1
+            row["OriginBytes"] += size
+
+    def report(self) -> dict:
+        rows = [dict(row) for row in self.stats]
+        total = sum(row["Requests"] for row in rows)
+        origin = sum(row["OriginRequests"] for row in rows)
+        cacheable = sum(row["Requests"] for rule, row in zip(self.rules, rows) if rule.caches)
+        total_bytes = sum(row["Bytes"] for row in rows)
+        origin_bytes = sum(row["OriginBytes"] for row in rows)
+        for row in rows:
+            row["HitRatio"] = 1 - row["OriginRequests"] / row["Requests"] if row["Requests"] else 0.0
+        return {
+            "Requests": total,
+            "CacheableShare": cacheable / total if total else 0.0,
+            "OriginRequests": origin,
+            "HitRatio": 1 - origin / total if total else 0.0,
+            "ByteHitRatio": 1 - origin_bytes / total_bytes if total_bytes else 0.0,
+            "Rules": rows,
+        }
+
+
+def simulate(log_path: str, policy=delivery_policy_template, fmt: str = "auto", chunk_lines: int = 100_000,
+             max_keys: int = 1_000_000, vectorized: bool = True) -> dict:
+    """Stream a log through CacheSimulator and return its report"""
+    simulator = CacheSimulator(policy, max_keys, vectorized)
+    for chunk in iter_chunks(log_path, fmt, chunk_lines):
+        simulator.feed(chunk)
+    return simulator.report()
+
+
+def load_policy(path: str = None):
+    """Delivery template, overlaid with the changes in a JSON file if given"""
+    if not path:
+        return delivery_policy_template
+    with open(path) as f:
+        return overlay(delivery_policy_template, json.load(f))
+
+
+def print_report(report: dict) -> None:
+    print(f"Requests: {report['Requests']}  cacheable: {report['CacheableShare']:.1%}  "
+          f"origin requests: {report['OriginRequests']}  hit ratio: {report['HitRatio']:.1%}  "
+          f"byte hit ratio: {report['ByteHitRatio']:.1%}")
+    for row in report["Rules"]:
+        print(f"  {row['Requests']:>12} req {row['OriginRequests']:>12} origin "
+              f"{row['HitRatio']:>7.1%} hit  {row['Rule']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate delivery policy cache rules against an access log")
+    parser.add_argument("log", help="Access log (combined or jsonl, optionally .gz)")
+    parser.add_argument("--policy", help="JSON file of changes overlaid on the delivery template")
+    parser.add_argument("--format", default="auto", choices=["auto", "combined", "jsonl"])
+    parser.add_argument("--chunk-lines", type=int, default=100_000)
+    parser.add_argument("--max-keys", type=int, default=1_000_000, help="Cache keys tracked in the LRU")
+    parser.add_argument("--no-numpy", action="store_true", help="Classify without NumPy")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    result = simulate(args.log, load_policy(args.policy), args.format, args.chunk_lines, args.max_keys,
+                      not args.no_numpy)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    sys.exit(0)
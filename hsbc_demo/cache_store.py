@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Persistent Cache Store
+
+Small SQLite-backed key/value store with LRU and TTL eviction, shared by
+the caches that must survive across script runs. Values are JSON
+documents; each entry may carry a tag (e.g. a TemplateId) so every entry
+referring to an object can be invalidated at once.
+"""
+import json
+import time
+import sqlite3
+import threading
+
+
+class SqliteLRUStore:
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = None):
+        """Open (or create) a store
+
+        Input:
+            - path: SQLite database file, or ":memory:"
+            - max_entries: Least recently used entries beyond this are evicted
+            - ttl: Seconds an entry stays valid after it is written (None = forever)
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, tag TEXT,"
+                " written REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+
+    def get(self, key: str):
+        """Return the stored value, or None if missing or expired"""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT value, written FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self._ttl is not None and now - row[1] > self._ttl:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value, tag: str = None) -> None:
+        """Store a JSON-serializable value, evicting LRU entries over the limit"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, tag, written, used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), tag, now, now)
+            )
+            if self._ttl is not None:
+                self._db.execute("DELETE FROM entries WHERE written < ?", (now - self._ttl,))
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def delete_tag(self, tag: str) -> int:
+        """Delete every entry carrying tag, returning how many were removed"""
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM entries WHERE tag = ?", (tag,)).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
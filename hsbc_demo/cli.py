@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Command Line Interface
+
+One subcommand per HSBCDemo operation, e.g.
+    python cli.py list-domains
+    python cli.py create-delivery-policy tpl_hsbc_sdk_delivery_policy
+    python cli.py release-policy <template_id>
+    python cli.py provision hsbc-demo-sdk.security.lcyice.top
+    python cli.py --fake provision demo.example.com      # in-process fake API
+
+Only argparse is imported at startup; hsbc_demo, the SDKs and logging
+handlers are loaded by the subcommand that runs, so --help and argument
+errors return in milliseconds (see bench_import_time.py for the budget).
+Results are printed to stdout as JSON; the exit code is 1 when the
+operation failed.
+"""
+import sys
+import argparse
+
+# Subcommand -> (HSBCDemo method, positional arguments, help)
+OPERATIONS = {
+    "list-domains": ("list_cdn_domains", (), "List CDN domains (logged)"),
+    "iter-domains": ("iter_cdn_domains", (), "Print CDN domains as JSON lines"),
+    "iter-templates": ("iter_templates", (), "Print templates as JSON lines"),
+    "iter-template-domains": ("iter_template_domains", (), "Print template bindings as JSON lines"),
+    "create-domain": ("create_domain", ("domain", "id_rule", "id_delivery", "id_cipher"),
+                      "Add a domain bound to existing templates"),
+    "update-template-domain": ("update_template_domain", ("domain", "id_rule", "id_delivery", "id_cipher"),
+                               "Rebind a domain to different templates"),
+    "create-delivery-policy": ("create_delivery_policy", ("title",), "Create a delivery policy"),
+    "describe-delivery-policy": ("describe_delivery_policy", ("template_id",), "Describe a delivery policy"),
+    "create-cipher-policy": ("create_cipher_policy", ("title",), "Create a cipher policy"),
+    "describe-cipher-policy": ("describe_cipher_policy", ("template_id",), "Describe a cipher policy"),
+    "update-cipher-template": ("update_cipher_template", ("template_id",), "Update a cipher policy"),
+    "create-rule-engine": ("create_rule_engine", ("title",), "Create a header-stripping rule engine policy"),
+    "describe-rule-engine-policy": ("describe_rule_engine_policy", ("template_id",),
+                                    "Describe a rule engine policy"),
+    "describe-template": ("describe_template", ("kind", "template_id"), "Describe a template of any kind"),
+    "release-policy": ("release_policy", ("template_id",), "Release a policy"),
+    "delete-policy": ("delete_policy", ("template_id",), "Delete a policy"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Byteplus CDN HSBC demo operations")
+    parser.add_argument("--log-level", default="INFO", help="Root log level (default INFO)")
+    parser.add_argument("--log-file", default="hsbc_cdn_demo.log", help="Log file ('' to disable)")
+    parser.add_argument("--fake", action="store_true", help="Run against an in-process fake CDN API")
+    parser.add_argument("--template-cache", metavar="PATH", help="Reuse templates via this template cache file")
+    parser.add_argument("--describe-cache", metavar="PATH", help="Cache describe_* results in this file")
+    parser.add_argument("--inventory", action="store_true",
+                        help="Index domain bindings (one listing pass) to report bound domains")
+    parser.add_argument("--metrics-file", metavar="PATH", help="Write Prometheus metrics here on exit")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    for command, (method, positionals, help_text) in OPERATIONS.items():
+        sub = subparsers.add_parser(command, help=help_text, description=help_text)
+        for name in positionals:
+            sub.add_argument(name)
+        if method.startswith("iter_"):
+            sub.add_argument("--page-size", type=int, default=100)
+            sub.add_argument("--filter", action="append", default=[], metavar="NAME=VALUE",
+                             help="Filter on a field (repeatable)")
+        if method == "create_delivery_policy":
+            sub.add_argument("--overrides", metavar="JSON", help="Fields overlaid on the delivery template")
+        if method == "create_rule_engine":
+            sub.add_argument("--prefix", default="/stripheader/", help="Request path prefix")
+            sub.add_argument("--header", default="server", help="Response header to delete")
+        sub.set_defaults(method=method, positionals=positionals)
+
+    provision = subparsers.add_parser("provision", help="Create, release and bind all templates for a domain",
+                                      description="Run the provisioning workflow for a domain")
+    provision.add_argument("domain")
+    provision.add_argument("--max-workers", type=int, default=4, help="Concurrently running steps")
+    provision.add_argument("--journal", default="hsbc_demo_journal.jsonl", metavar="PATH",
+                           help="Checkpoint journal to resume interrupted runs from ('' to disable)")
+    provision.add_argument("--wait", action="store_true",
+                           help="Wait for each release and the domain to propagate before moving on")
+    provision.set_defaults(method=None)
+    return parser
+
+
+def _build_demo(args):
+    from hsbc_demo import HSBCDemo
+
+    kwargs = {}
+    if args.fake:
+        from fake_cdn import FakeCDNService
+
+        kwargs["svc"] = FakeCDNService()
+    if args.template_cache:
+        from template_cache import TemplateCache
+
+        kwargs["template_cache"] = TemplateCache(args.template_cache)
+    if args.describe_cache:
+        from describe_cache import DescribeCache
+
+        kwargs["describe_cache"] = DescribeCache(path=args.describe_cache)
+    if args.inventory:
+        from inventory import InventoryIndex
+
+        kwargs["inventory"] = InventoryIndex()
+    return HSBCDemo(**kwargs)
+
+
+def _print_json(value) -> None:
+    import json
+
+    print(json.dumps(value, indent=2, default=str))
+
+
+def _run_operation(demo, args) -> int:
+    kwargs = {name: getattr(args, name) for name in args.positionals}
+    if args.method.startswith("iter_"):
+        import json
+
+        filters = dict(item.split("=", 1) for item in args.filter)
+        for row in getattr(demo, args.method)(page_size=args.page_size, filters=filters or None):
+            print(json.dumps(row, default=str))
+        return 0
+    if args.method == "create_delivery_policy" and args.overrides:
+        import json
+
+        kwargs["overrides"] = json.loads(args.overrides)
+    if args.method == "create_rule_engine":
+        kwargs.update(prefix=args.prefix, header=args.header)
+
+    result = getattr(demo, args.method)(**kwargs)
+    if result is not None:
+        _print_json(result)
+    # list_cdn_domains, update_cipher_template and delete_policy only log
+    returns_nothing = getattr(demo, args.method).__annotations__.get("return", object) is None
+    return 0 if returns_nothing or (result is not None and result is not False) else 1
+
+
+def _run_provision(demo, args) -> int:
+    from hsbc_demo import build_provisioning_workflow
+    from workflow import STATUS_SUCCEEDED
+
+    journal = None
+    if args.journal:
+        from journal import Journal
+
+        journal = Journal(args.journal)
+    waiter = None
+    if args.wait:
+        from propagation import PropagationWaiter
+
+        waiter = PropagationWaiter(demo)
+    try:
+        results = build_provisioning_workflow(demo, args.domain, args.max_workers, journal, waiter).run()
+    finally:
+        if waiter is not None:
+            waiter.close()
+        if journal is not None:
+            journal.close()
+    _print_json({step: {"Status": row["Status"], "Result": row["Result"], "Error": row["Error"]}
+                 for step, row in results.items()})
+    return 0 if all(row["Status"] == STATUS_SUCCEEDED for row in results.values()) else 1
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    import logging
+    from log_config import configure_logging
+
+    configure_logging(getattr(logging, args.log_level.upper(), logging.INFO), log_file=args.log_file or None)
+    try:
+        demo = _build_demo(args)
+        return _run_provision(demo, args) if args.method is None else _run_operation(demo, args)
+    except ValueError as e:
+        logging.getLogger(__name__).error(str(e))
+        return 1
+    finally:
+        if args.metrics_file:
+            import metrics
+
+            metrics.REGISTRY.write_textfile(args.metrics_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo HTTP Connection Pooling
+
+Keep-alive connection pools and a multi-account client pool:
+    - mount_connection_pool: size a CDNService's HTTP pool so concurrent
+      calls reuse TLS connections instead of opening new ones
+    - CDNClientPool: one long-lived CDNService per access key, with idle
+      eviction and in-place secret key rotation, so one process can serve
+      many sub-accounts without a TLS handshake per call
+
+Every get() leases the client until the matching release(); a leased
+client is never closed by idle eviction, however long it is held.
+
+Usage:
+    pool = CDNClientPool(pool_size=32)
+    with pool.lease(ak, sk) as svc:
+        HSBCDemo(svc=svc).list_cdn_domains()
+
+    demo = HSBCDemo(svc=pool.get(ak, sk))   # long-lived: leased until
+    ...                                     # pool.release(ak)
+"""
+import time
+import contextlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def mount_connection_pool(svc, pool_size: int) -> bool:
+    """Mount a keep-alive HTTPAdapter sized for pool_size concurrent calls
+
+    Input:
+        - svc: CDNService (or compatible) client; clients without a
+          requests session (e.g. fake_cdn.FakeCDNService) are left alone
+        - pool_size: Maximum connections kept open per host
+
+    Output:
+        - True if the adapter was mounted
+    """
+    session = getattr(svc, "session", None)
+    if session is None or not hasattr(session, "mount"):
+        return False
+
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logger.debug(f"Mounted HTTP connection pool of size {pool_size}")
+    return True
+
+
+def new_cdn_service():
+    """Create an independent CDNService instance
+
+    Some SDK releases make CDNService a process-wide singleton through
+    __new__, which would make every account share one set of credentials.
+    Allocating with object.__new__ and running __init__ is what normal
+    construction does anyway, minus that override, so each pooled client
+    keeps its own credentials and HTTP session.
+    """
+    from byteplus_sdk.cdn.service import CDNService
+
+    svc = object.__new__(CDNService)
+    svc.__init__()
+    return svc
+
+
+class CDNClientPool:
+    def __init__(self, pool_size: int = 16, idle_timeout: float = 300.0, factory=None):
+        """Pool of CDNService clients keyed by access key
+
+        Input:
+            - pool_size: Keep-alive HTTP connections per client
+            - idle_timeout: Seconds after which an unused client is closed
+            - factory: Callable returning a new CDNService-compatible client
+              (defaults to new_cdn_service)
+        """
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._factory = factory or new_cdn_service
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, ak: str, sk: str):
+        """Lease the pooled client for an access key, creating it on first use
+
+        The client stays leased (and is never evicted) until release(ak) is
+        called once for every get().
+
+        A changed secret key for a known access key is applied to the
+        existing client (requests are re-signed with it) without dropping
+        its keep-alive connections.
+        """
+        if not ak or not sk:
+            raise ValueError("Access key and secret key must be set")
+
+        now = time.monotonic()
+        self.evict_idle(now)
+        with self._lock:
+            entry = self._clients.get(ak)
+            if entry is None:
+                svc = self._factory()
+                svc.set_ak(ak)
+                svc.set_sk(sk)
+                mount_connection_pool(svc, self._pool_size)
+                entry = self._clients[ak] = {"svc": svc, "sk": sk, "used": now, "leases": 0}
+                logger.info(f"Created pooled CDN client for access key {_mask(ak)}")
+            elif entry["sk"] != sk:
+                entry["svc"].set_sk(sk)
+                entry["sk"] = sk
+                logger.info(f"Rotated secret key of pooled CDN client {_mask(ak)}")
+            entry["used"] = now
+            entry["leases"] += 1
+            return entry["svc"]
+
+    def release(self, ak: str) -> None:
+        """Return a client leased by get(); idle time counts from the last release"""
+        with self._lock:
+            entry = self._clients.get(ak)
+            if entry is None or entry["leases"] <= 0:
+                raise ValueError(f"No leased client for access key {_mask(ak or '')}")
+            entry["leases"] -= 1
+            entry["used"] = time.monotonic()
+
+    @contextlib.contextmanager
+    def lease(self, ak: str, sk: str):
+        """Context manager around get()/release()"""
+        svc = self.get(ak, sk)
+        try:
+            yield svc
+        finally:
+            self.release(ak)
+
+    def evict_idle(self, now: float = None) -> int:
+        """Close unleased clients unused for longer than idle_timeout, returning how many"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [ak for ak, entry in self._clients.items()
+                    if not entry["leases"] and now - entry["used"] > self._idle_timeout]
+            evicted = [self._clients.pop(ak) for ak in idle]
+        for ak, entry in zip(idle, evicted):
+            _close_client(entry["svc"])
+            logger.info(f"Evicted idle CDN client {_mask(ak)}")
+        return len(evicted)
+
+    def close(self) -> None:
+        """Close every pooled client, leased or not (shutdown)"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for entry in entries:
+            _close_client(entry["svc"])
+
+    def __len__(self):
+        return len(self._clients)
+
+
+def _close_client(svc) -> None:
+    session = getattr(svc, "session", None)
+    if session is not None and hasattr(session, "close"):
+        session.close()
+
+
+def _mask(ak: str) -> str:
+    """Access key shortened for logs"""
+    return f"{ak[:4]}...{ak[-4:]}" if len(ak) > 8 else "****"
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Content Refresh and Preload
+
+Bulk cache purge (SubmitRefreshTask) and prefetch (SubmitPreloadTask)
+through the same HSBCDemo client as the template operations:
+
+    - URLs and directories are canonicalized the way the delivery
+      policy's UrlNormalize does it at the edge (back_slashes,
+      successive_slashes, dot_segments), plus lower-case scheme/host,
+      default ports and fragments dropped, then deduplicated
+    - URLs and sub-directories already covered by a directory refresh
+      are dropped
+    - the rest is packed into batches of the API maximum per call
+      (URL_LIMITS) and submitted concurrently, after checking the daily
+      quota (DescribeContentQuota); the call rate is bounded by the
+      client's Resilience rate limit of each SDK method
+    - track() polls the task IDs (one DescribeContentTasks query per
+      TaskID, run concurrently) until every URL is complete or failed
+
+A 100k-URL purge is therefore 1000 SubmitRefreshTask calls (fewer after
+deduplication) plus one quota call.
+
+Usage:
+    python content_tasks.py refresh --urls urls.txt [--dirs dirs.txt] [--wait] [--fake]
+    python content_tasks.py preload --urls - < urls.txt
+"""
+import re
+import sys
+import time
+import logging
+import argparse
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Most URLs one submit call accepts, by task type
+URL_LIMITS = {"refresh_file": 100, "refresh_dir": 50, "preload": 100}
+# UrlNormalize.NormalizeObject values of the delivery policy template
+NORMALIZE_ALL = ("back_slashes", "successive_slashes", "dot_segments")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+DONE_STATUSES = ("complete", "failed")
+
+_SUCCESSIVE_SLASHES = re.compile(r"/{2,}")
+
+
+def normalize_objects(policy: dict) -> tuple:
+    """NormalizeObject list of a delivery policy's UrlNormalize, () when switched off"""
+    url_normalize = (policy or {}).get("UrlNormalize") or {}
+    if not url_normalize.get("Switch"):
+        return ()
+    return tuple(url_normalize.get("NormalizeObject") or ())
+
+
+def remove_dot_segments(path: str) -> str:
+    """RFC 3986 section 5.2.4 removal of "." and ".." path segments"""
+    segments = []
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    trailing = path.endswith(("/.", "/.."))
+    return "/" + "/".join(segments) + ("/" if trailing and segments else "")
+
+
+def canonicalize(url: str, normalize: tuple = NORMALIZE_ALL, directory: bool = False) -> str:
+    """Canonical form of a URL as the edge sees it after UrlNormalize
+
+    Input:
+        - url: Absolute http(s) URL
+        - normalize: NormalizeObject values to apply
+        - directory: Canonicalize as a directory (trailing "/", no query)
+
+    Output:
+        - Canonical URL string
+        - Raises ValueError for anything that is not an absolute http(s) URL
+    """
+    scheme, sep, rest = url.strip().partition("://")
+    scheme = scheme.lower()
+    if not sep or scheme not in DEFAULT_PORTS:
+        raise ValueError(f"Not an absolute http(s) URL: {url!r}")
+    before_query, _, query = rest.partition("#")[0].partition("?")
+    if "back_slashes" in normalize:
+        before_query = before_query.replace("\\", "/")
+    netloc, slash, path = before_query.partition("/")
+    host = _authority(scheme, netloc)
+    path = slash + path
+
+    if "successive_slashes" in normalize and "//" in path:
+        path = _SUCCESSIVE_SLASHES.sub("/", path)
+    if "dot_segments" in normalize and "/." in path:
+        path = remove_dot_segments(path)
+    if directory:
+        return f"{scheme}://{host}{path if path.endswith('/') else path + '/'}"
+    return f"{scheme}://{host}{path or '/'}{'?' if query else ''}{query}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _authority(scheme: str, netloc: str) -> str:
+    """Lower-case host[:port] of a URL authority, without user info and default port"""
+    parts = urlsplit(f"{scheme}://{netloc}")
+    if not parts.hostname:
+        raise ValueError(f"URL without host: {scheme}://{netloc}")
+    if parts.port is not None and parts.port != DEFAULT_PORTS[scheme]:
+        return f"{parts.hostname}:{parts.port}"
+    return parts.hostname
+
+
+def _ancestors(url: str):
+    """Directory URLs above a URL, nearest last: http://h/a/b.png -> http://h/, http://h/a/"""
+    end = url.find("?")
+    end = len(url) if end == -1 else end
+    position = url.find("/", url.find("://") + 3)
+    while position != -1 and position < end - 1:
+        yield url[:position + 1]
+        position = url.find("/", position + 1, end)
+
+
+def plan_refresh(urls=(), dirs=(), normalize: tuple = NORMALIZE_ALL) -> tuple:
+    """Canonicalize, deduplicate and prune what a refresh has to submit
+
+    Input:
+        - urls: Iterable of file URLs (may be a stream)
+        - dirs: Iterable of directory URLs
+        - normalize: NormalizeObject values to apply
+
+    Output:
+        - (file URLs, directory URLs, invalid inputs); no file or directory
+          is inside another submitted directory
+    """
+    invalid = []
+
+    def _canonical(items, directory):
+        for item in items:
+            if not item.strip():
+                continue
+            try:
+                yield canonicalize(item, normalize, directory)
+            except ValueError:
+                invalid.append(item)
+
+    kept_dirs = set()
+    for directory in sorted(set(_canonical(dirs, True)), key=len):
+        if not any(ancestor in kept_dirs for ancestor in _ancestors(directory)):
+            kept_dirs.add(directory)
+    files = list(dict.fromkeys(_canonical(urls, False)))
+    if kept_dirs:
+        files = [url for url in files if not any(ancestor in kept_dirs for ancestor in _ancestors(url))]
+    return files, sorted(kept_dirs), invalid
+
+
+def batches(items: list, size: int) -> list:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class ContentTasks:
+    def __init__(self, demo, max_workers: int = 4, normalize: tuple = NORMALIZE_ALL, limits: dict = None):
+        """Bulk refresh/preload submitter
+
+        Input:
+            - demo: HSBCDemo whose CDNService is used; its Resilience rate
+              limits (e.g. rate_limits={"submit_refresh_task": 20}) bound
+              the call rate
+            - max_workers: Concurrent submit / status calls
+            - normalize: UrlNormalize objects to canonicalize with, e.g.
+              normalize_objects(demo.describe_delivery_policy(template_id))
+            - limits: Per task type overrides of URL_LIMITS
+        """
+        self._demo = demo
+        self._max_workers = max_workers
+        self._normalize = tuple(normalize)
+        self._limits = {**URL_LIMITS, **(limits or {})}
+        self._calls_lock = threading.Lock()
+        self.calls = 0
+
+    def _count_call(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+
+    def _call(self, method, body: dict, success_msg: str) -> dict:
+        self._count_call()
+        resp = self._demo._call_sdk_method(method, body, success_msg)
+        return resp["Result"] if resp and "Result" in resp else None
+
+    def quota(self) -> dict:
+        """DescribeContentQuota Result (RefreshRemain, RefreshDirRemain, PreloadRemain, ...), None on failure"""
+        return self._call(self._demo._svc.describe_content_quota, {}, "Retrieved content quota")
+
+    def _submit(self, task_type: str, urls: list):
+        if task_type == "preload":
+            method, body = self._demo._svc.submit_preload_task, {"Urls": "\n".join(urls)}
+        else:
+            method = self._demo._svc.submit_refresh_task
+            body = {"Type": "dir" if task_type == "refresh_dir" else "file", "Urls": "\n".join(urls)}
+        result = self._call(method, body, f"Submitted {task_type} task of {len(urls)} URLs")
+        return result.get("TaskID") if result else None
+
+    def _submit_all(self, jobs: list) -> dict:
+        """Submit [(task_type, urls)] in API-maximum batches
+
+        Output:
+            - {"Tasks": {task_id: [urls]}, "Failed": [urls not submitted], "Calls": submit calls}
+        """
+        work = [(task_type, batch) for task_type, urls in jobs for batch in batches(urls, self._limits[task_type])]
+        report = {"Tasks": {}, "Failed": [], "Calls": len(work)}
+        if not work:
+            return report
+
+        quota = self.quota()
+        quota_keys = {"refresh_file": "RefreshRemain", "refresh_dir": "RefreshDirRemain", "preload": "PreloadRemain"}
+        for task_type, urls in jobs:
+            remain = (quota or {}).get(quota_keys[task_type])
+            if remain is not None and len(urls) > remain:
+                logger.error(f"{len(urls)} {task_type} URLs exceed the remaining daily quota of {remain}, "
+                             f"nothing submitted")
+                report["Failed"] = [url for _, urls_ in jobs for url in urls_]
+                report["Calls"] = 0
+                return report
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="content_submit") as pool:
+            task_ids = list(pool.map(lambda job: self._submit(*job), work))
+        for (task_type, urls), task_id in zip(work, task_ids):
+            if task_id:
+                report["Tasks"][task_id] = urls
+            else:
+                report["Failed"].extend(urls)
+        logger.info(f"Submitted {len(report['Tasks'])} content tasks ({len(work) - len(report['Tasks'])} failed) "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return report
+
+    def refresh(self, urls=(), dirs=()) -> dict:
+        """Purge file URLs and directories from the cache
+
+        Output:
+            - {"Tasks": {task_id: [urls]}, "Failed": [...], "Invalid": [...],
+               "Calls": submit calls, "Urls": files submitted, "Dirs": directories submitted}
+        """
+        files, directories, invalid = plan_refresh(urls, dirs, self._normalize)
+        report = self._submit_all([("refresh_dir", directories), ("refresh_file", files)])
+        return {**report, "Invalid": invalid, "Urls": len(files), "Dirs": len(directories)}
+
+    def preload(self, urls=()) -> dict:
+        """Prefetch file URLs into the cache (same report as refresh())"""
+        files, _, invalid = plan_refresh(urls, (), self._normalize)
+        report = self._submit_all([("preload", files)])
+        return {**report, "Invalid": invalid, "Urls": len(files), "Dirs": 0}
+
+    def _task_status(self, task_id: str) -> dict:
+        """{status: URL count} of one task, None if the call failed"""
+        counts, page_num = {}, 1
+        while True:
+            self._count_call()
+            page = self._demo._fetch_page(self._demo._svc.describe_content_tasks, {"TaskID": task_id},
+                                          "Data", page_num, 100)
+            if page is None:
+                return None
+            for row in page["Data"] or []:
+                counts[row.get("Status")] = counts.get(row.get("Status"), 0) + 1
+            if len(page["Data"] or []) < 100 or sum(counts.values()) >= (page.get("Total") or 0):
+                return counts
+            page_num += 1
+
+    def track(self, task_ids, poll_interval: float = 5.0, timeout: float = 1800.0) -> dict:
+        """Poll tasks until all of their URLs are complete or failed
+
+        Input:
+            - task_ids: Task IDs (e.g. the "Tasks" of a refresh() report)
+            - poll_interval: Seconds between polling rounds
+            - timeout: Seconds after which the tasks still running are returned as such
+
+        Output:
+            - {task_id: {"Status": "complete" | "failed" | "running", "Urls": {status: count}}}
+        """
+        deadline = time.monotonic() + timeout
+        pending = list(task_ids)
+        states = {task_id: {"Status": "running", "Urls": {}} for task_id in pending}
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="content_track") as pool:
+            while pending:
+                for task_id, counts in zip(pending, pool.map(self._task_status, pending)):
+                    if counts is None:
+                        continue
+                    done = bool(counts) and all(status in DONE_STATUSES for status in counts)
+                    status = ("failed" if counts.get("failed") else "complete") if done else "running"
+                    states[task_id] = {"Status": status, "Urls": counts}
+                pending = [task_id for task_id in pending if states[task_id]["Status"] == "running"]
+                if not pending or time.monotonic() + poll_interval > deadline:
+                    break
+                time.sleep(poll_interval)
+        if pending:
+            logger.warning(f"{len(pending)} content tasks still running after {timeout:.0f}s")
+        return states
+
+
+def _read_lines(path: str):
+    if not path:
+        return
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            yield line.strip()
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+if __name__ == '__main__':
+    from log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Bulk CDN cache refresh / preload")
+    parser.add_argument("action", choices=("refresh", "preload"))
+    parser.add_argument("--urls", metavar="FILE", help="File of URLs, one per line ('-' for stdin)")
+    parser.add_argument("--dirs", metavar="FILE", help="File of directory URLs to refresh")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent API calls")
+    parser.add_argument("--qps", type=float, default=10.0, help="Calls per second of each content API")
+    parser.add_argument("--no-normalize", action="store_true", help="Skip the UrlNormalize canonicalization")
+    parser.add_argument("--wait", action="store_true", help="Track the tasks until they complete")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--fake", action="store_true", help="Run against an in-process fake CDN API")
+    args = parser.parse_args()
+
+    from hsbc_demo import HSBCDemo
+    from resilience import Resilience
+
+    configure_logging(logging.WARNING, log_file=None)
+    svc = None
+    if args.fake:
+        from fake_cdn import FakeCDNService
+
+        svc = FakeCDNService()
+    content_apis = ("submit_refresh_task", "submit_preload_task", "describe_content_tasks", "describe_content_quota")
+    resilience = Resilience(rate_limits=dict.fromkeys(content_apis, args.qps))
+    content = ContentTasks(HSBCDemo(resilience, svc=svc), args.workers, () if args.no_normalize else NORMALIZE_ALL)
+    if args.action == "refresh":
+        result = content.refresh(_read_lines(args.urls), _read_lines(args.dirs))
+    else:
+        result = content.preload(_read_lines(args.urls))
+    print(f"{result['Urls']} URLs and {result['Dirs']} directories in {len(result['Tasks'])} tasks "
+          f"({result['Calls']} submit calls), {len(result['Failed'])} failed, {len(result['Invalid'])} invalid")
+
+    failed = bool(result["Failed"])
+    if args.wait and result["Tasks"]:
+        states = content.track(result["Tasks"], args.poll_interval)
+        summary = {}
+        for state in states.values():
+            summary[state["Status"]] = summary.get(state["Status"], 0) + 1
+        print(f"Tasks: {summary}")
+        failed |= any(state["Status"] != "complete" for state in states.values())
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Describe Cache
+
+Read-through cache for describe_* template responses. Entries live in a
+size-bounded in-memory LRU, each with its own expiry, optionally backed
+by a SqliteLRUStore so repeated audit runs also start warm. HSBCDemo
+invalidates a template's entries whenever it updates, releases or
+deletes that template, so a process never reads its own stale writes;
+changes made elsewhere become visible once the TTL expires. Each
+invalidation bumps the template's generation, and get_or_load does not
+store a result whose load overlapped an invalidation.
+
+Cached results are frozen (hsbc_demo_json.freeze) because one object is
+handed to every caller.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from cache_store import SqliteLRUStore
+from hsbc_demo_json import freeze
+
+logger = logging.getLogger(__name__)
+
+
+class DescribeCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, path: str = None, ttls: dict = None):
+        """Create a describe cache
+
+        Input:
+            - max_entries: LRU bound of the in-memory layer (and of the disk layer)
+            - ttl: Default seconds a described template stays fresh
+            - path: Optional SQLite file for the on-disk layer
+            - ttls: Optional per-kind TTL overrides, e.g. {"cipher": 3600}
+        """
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._ttls = dict(ttls or {})
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._disk = SqliteLRUStore(path, max_entries=max_entries) if path else None
+        self.hits = self.misses = 0
+
+    def get(self, kind: str, template_id: str):
+        """Return the fresh cached Result, or None"""
+        key = f"{kind}:{template_id}"
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        if self._disk is not None:
+            stored = self._disk.get(key)
+            if stored is not None and stored["Expires"] > now:
+                result = freeze(stored["Result"])
+                self._remember(key, stored["Expires"], result, hit=True)
+                return result
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def generation(self, template_id: str) -> int:
+        """Number of times a template has been invalidated"""
+        with self._lock:
+            return self._generations.get(template_id, 0)
+
+    def put(self, kind: str, template_id: str, result: dict, ttl: float = None, generation: int = None) -> dict:
+        """Cache a Result for ttl seconds (default: the kind's TTL), returning the frozen copy
+
+        With a generation (read before loading the Result), nothing is cached
+        if the template was invalidated since.
+        """
+        key = f"{kind}:{template_id}"
+        expires = time.time() + (ttl if ttl is not None else self._ttls.get(kind, self._ttl))
+        result = freeze(result)
+        if not self._remember(key, expires, result, template_id=template_id, generation=generation):
+            logger.debug(f"Describe cache skipped a result loaded before invalidation: {template_id}")
+            return result
+        if self._disk is not None:
+            self._disk.put(key, {"Expires": expires, "Result": result}, tag=template_id)
+            if generation is not None and self.generation(template_id) != generation:
+                self._disk.delete_tag(template_id)  # Invalidated while writing
+        return result
+
+    def _remember(self, key: str, expires: float, result, hit: bool = False,
+                  template_id: str = None, generation: int = None) -> bool:
+        with self._lock:
+            if generation is not None and self._generations.get(template_id, 0) != generation:
+                return False
+            if hit:
+                self.hits += 1
+            self._entries[key] = (expires, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def get_or_load(self, kind: str, template_id: str, loader):
+        """Cached Result, or loader() stored on a miss (None results are not cached)"""
+        generation = self.generation(template_id)
+        result = self.get(kind, template_id)
+        if result is None:
+            result = loader()
+            if result is not None:
+                result = self.put(kind, template_id, result, generation=generation)
+        return result
+
+    def invalidate(self, template_id: str) -> None:
+        """Drop every cached Result of a template"""
+        if not template_id:
+            return
+        suffix = f":{template_id}"
+        with self._lock:
+            self._generations[template_id] = self._generations.get(template_id, 0) + 1
+            for key in [key for key in self._entries if key.endswith(suffix)]:
+                del self._entries[key]
+        if self._disk is not None:
+            self._disk.delete_tag(template_id)
+        logger.debug(f"Describe cache invalidated: {template_id}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
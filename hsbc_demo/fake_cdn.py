@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Fake CDN OpenAPI
+
+Local stand-in for the Byteplus CDN OpenAPI, for benchmarks and offline
+runs of the HSBCDemo workflows. FakeCDNBackend keeps templates and domains
+in memory and injects configurable latency, random server errors and
+per-API throttling. With propagation_delay, released templates stay
+"releasing" and new or rebound domains "configuring" for a while before
+they become "released" / "online", like changes rolling out to the edge.
+Refresh and preload tasks are accepted against daily quotas and complete
+after the same delay.
+It can be used two ways:
+    - in process: HSBCDemo(svc=FakeCDNService(backend))
+    - over HTTP:  python fake_cdn.py --port 8080, then point a real
+      CDNService at it (svc.set_host("127.0.0.1:8080"); svc.set_scheme("http"))
+
+Errors are raised the way the SDK raises them: an Exception whose text is
+the JSON error response, so the resilience layer classifies them the same.
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from log_config import configure_logging
+from resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# SDK method name -> OpenAPI action
+SDK_ACTIONS = {
+    "list_cdn_domains": "ListCdnDomains",
+    "add_template_domain": "AddTemplateDomain",
+    "create_service_template": "CreateServiceTemplate",
+    "create_cipher_template": "CreateCipherTemplate",
+    "create_rule_engine_template": "CreateRuleEngineTemplate",
+    "describe_service_template": "DescribeServiceTemplate",
+    "describe_cipher_template": "DescribeCipherTemplate",
+    "describe_rule_engine_template": "DescribeRuleEngineTemplate",
+    "update_service_template": "UpdateServiceTemplate",
+    "update_cipher_template": "UpdateCipherTemplate",
+    "update_rule_engine_template": "UpdateRuleEngineTemplate",
+    "describe_templates": "DescribeTemplates",
+    "describe_template_domains": "DescribeTemplateDomains",
+    "update_template_domain": "UpdateTemplateDomain",
+    "release_template": "ReleaseTemplate",
+    "delete_template": "DeleteTemplate",
+    "submit_refresh_task": "SubmitRefreshTask",
+    "submit_preload_task": "SubmitPreloadTask",
+    "describe_content_tasks": "DescribeContentTasks",
+    "describe_content_quota": "DescribeContentQuota",
+}
+
+# Most URLs one SubmitRefreshTask / SubmitPreloadTask call accepts, by task type
+CONTENT_TASK_LIMITS = {"refresh_file": 100, "refresh_dir": 50, "preload": 100}
+
+TEMPLATE_TYPES = {
+    "CreateServiceTemplate": "service",
+    "CreateCipherTemplate": "cipher",
+    "CreateRuleEngineTemplate": "rule_engine",
+    "DescribeServiceTemplate": "service",
+    "DescribeCipherTemplate": "cipher",
+    "DescribeRuleEngineTemplate": "rule_engine",
+    "UpdateServiceTemplate": "service",
+    "UpdateCipherTemplate": "cipher",
+    "UpdateRuleEngineTemplate": "rule_engine",
+}
+
+# Fields returned by DescribeTemplates for each template
+TEMPLATE_SUMMARY_FIELDS = ("TemplateId", "Title", "Type", "Status", "Message", "Project", "CreateTime", "UpdateTime")
+
+
+class FakeAPIError(Exception):
+    """Error response of the fake API; str() is the JSON body like the SDK's exceptions"""
+
+    def __init__(self, code: str, message: str, status: int):
+        self.code = code
+        self.status = status
+        super().__init__(json.dumps({"ResponseMetadata": {"Error": {"Code": code, "Message": message}}}))
+
+
+class FakeCDNBackend:
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 qps_limits: dict = None, seed: int = None, propagation_delay: float = 0.0,
+                 propagation_jitter: float = 0.0, content_quotas: dict = None):
+        """In-memory CDN control plane with injectable latency, errors and throttling
+
+        Input:
+            - latency: Base seconds added to every call
+            - latency_jitter: Extra uniformly random seconds per call
+            - error_rate: Probability (0..1) that a call fails with InternalError
+            - qps_limits: Dict mapping OpenAPI action (or "*" for all others)
+              to the calls/second quota; calls over quota fail with Throttling
+            - seed: Random seed for reproducible runs
+            - propagation_delay: Base seconds a release or domain change takes
+              to become active (0: immediately)
+            - propagation_jitter: Extra uniformly random propagation seconds
+            - content_quotas: Daily URL quota by task type (refresh_file,
+              refresh_dir, preload)
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._qps_limits = dict(qps_limits or {})
+        self._quotas = {}
+        self._lock = threading.Lock()
+        self.templates = {}
+        self.domains = {}
+        self.calls = {}
+        self.propagation_delay = propagation_delay
+        self.propagation_jitter = propagation_jitter
+        # ("templates" | "domains", key) -> (monotonic time it becomes active, final status)
+        self._propagating = {}
+        self.content_quotas = {"refresh_file": 200000, "refresh_dir": 1000, "preload": 200000,
+                               **(content_quotas or {})}
+        self.content_used = dict.fromkeys(self.content_quotas, 0)
+        self.content_tasks = {}
+
+    def _check_quota(self, action: str) -> None:
+        limit = self._qps_limits.get(action, self._qps_limits.get("*"))
+        if not limit:
+            return
+        with self._lock:
+            bucket = self._quotas.get(action)
+            if bucket is None:
+                bucket = self._quotas[action] = TokenBucket(limit)
+        if not bucket.try_acquire():
+            raise FakeAPIError("Throttling", f"Request rate of {action} exceeds {limit}/s", 429)
+
+    def handle(self, action: str, body: dict) -> dict:
+        """Execute one OpenAPI action and return the response dict"""
+        with self._lock:
+            self.calls[action] = self.calls.get(action, 0) + 1
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        self._check_quota(action)
+        if failed:
+            raise FakeAPIError("InternalError", "Injected server error", 500)
+
+        handler = getattr(self, f"_do_{action}", None)
+        if handler is None:
+            raise FakeAPIError("InvalidAction", f"Unsupported action {action}", 400)
+        with self._lock:
+            self._propagate()
+            result = handler(body or {})
+        return {
+            "ResponseMetadata": {"RequestId": uuid.uuid4().hex, "Action": action},
+            "Result": result
+        }
+
+    # Propagation
+
+    def _start_propagation(self, collection: str, key: str, pending_status: str, final_status: str) -> None:
+        """Set the status of self.<collection>[key], reaching final_status only after the propagation delay"""
+        if not self.propagation_delay and not self.propagation_jitter:
+            getattr(self, collection)[key]["Status"] = final_status
+            return
+        getattr(self, collection)[key]["Status"] = pending_status
+        delay = self.propagation_delay + self._random.uniform(0, self.propagation_jitter)
+        self._propagating[(collection, key)] = (time.monotonic() + delay, final_status)
+
+    def _propagate(self) -> None:
+        """Activate the objects whose propagation delay has passed (called under the lock)"""
+        if not self._propagating:
+            return
+        now = time.monotonic()
+        for (collection, key), (ready_at, final_status) in list(self._propagating.items()):
+            if ready_at <= now:
+                del self._propagating[(collection, key)]
+                row = getattr(self, collection).get(key)
+                if row is not None:
+                    row["Status"] = final_status
+
+    # Templates
+
+    def _template(self, template_id: str, template_type: str = None) -> dict:
+        template = self.templates.get(template_id)
+        if template is None or (template_type and template["Type"] != template_type):
+            raise FakeAPIError("InvalidParameter.TemplateNotFound", f"Template {template_id} not found", 404)
+        return template
+
+    def _create_template(self, template_type: str, body: dict) -> dict:
+        if not body.get("Title"):
+            raise FakeAPIError("MissingParameter", "Title is required", 400)
+        template_id = f"tpl-{uuid.uuid4().hex[:16]}"
+        now = int(time.time())
+        self.templates[template_id] = {
+            **json.loads(json.dumps(body)),
+            "TemplateId": template_id,
+            "Type": template_type,
+            "Status": "draft",
+            "HasDraft": True,
+            "CreateTime": now,
+            "UpdateTime": now
+        }
+        return {"TemplateId": template_id}
+
+    def _do_CreateServiceTemplate(self, body):
+        return self._create_template("service", body)
+
+    def _do_CreateCipherTemplate(self, body):
+        return self._create_template("cipher", body)
+
+    def _do_CreateRuleEngineTemplate(self, body):
+        return self._create_template("rule_engine", body)
+
+    def _describe_template(self, action, body):
+        return json.loads(json.dumps(self._template(body.get("TemplateId"), TEMPLATE_TYPES[action])))
+
+    def _do_DescribeServiceTemplate(self, body):
+        return self._describe_template("DescribeServiceTemplate", body)
+
+    def _do_DescribeCipherTemplate(self, body):
+        return self._describe_template("DescribeCipherTemplate", body)
+
+    def _do_DescribeRuleEngineTemplate(self, body):
+        return self._describe_template("DescribeRuleEngineTemplate", body)
+
+    def _update_template(self, action, body):
+        template = self._template(body.get("TemplateId"), TEMPLATE_TYPES[action])
+        template.update({key: value for key, value in json.loads(json.dumps(body)).items() if key != "TemplateId"})
+        template["UpdateTime"] = int(time.time())
+        # Edits stay in a draft version until the next release; a released
+        # template remains usable by domains meanwhile
+        template["HasDraft"] = True
+        return {}
+
+    def _do_UpdateServiceTemplate(self, body):
+        return self._update_template("UpdateServiceTemplate", body)
+
+    def _do_UpdateCipherTemplate(self, body):
+        return self._update_template("UpdateCipherTemplate", body)
+
+    def _do_UpdateRuleEngineTemplate(self, body):
+        return self._update_template("UpdateRuleEngineTemplate", body)
+
+    def _do_DescribeTemplates(self, body):
+        rows = [{field: template.get(field) for field in TEMPLATE_SUMMARY_FIELDS}
+                for template in self.templates.values()
+                if _matches_filters(template, body.get("Filters"))]
+        return _page(rows, body, "Templates")
+
+    def _do_ReleaseTemplate(self, body):
+        template = self._template(body.get("TemplateId"))
+        template["HasDraft"] = False
+        self._start_propagation("templates", template["TemplateId"], "releasing", "released")
+        return {}
+
+    def _do_DeleteTemplate(self, body):
+        template_id = body.get("TemplateId")
+        self._template(template_id)
+        for domain in self.domains.values():
+            if template_id in (domain["ServiceTemplateId"], domain["CipherTemplateId"], *domain["RuleTemplateIds"]):
+                raise FakeAPIError("OperationDenied.TemplateInUse",
+                                   f"Template {template_id} is bound to {domain['Domain']}", 400)
+        del self.templates[template_id]
+        return {}
+
+    # Domains
+
+    def _do_AddTemplateDomain(self, body):
+        domain = body.get("Domain")
+        if not domain:
+            raise FakeAPIError("MissingParameter", "Domain is required", 400)
+        if domain in self.domains:
+            raise FakeAPIError("InvalidParameter.DomainExists", f"Domain {domain} already exists", 400)
+        template_ids = [body.get("ServiceTemplateId"), body.get("CipherTemplateId"), *(body.get("RuleTemplateIds") or [])]
+        for template_id in template_ids:
+            if template_id and self._template(template_id)["Status"] != "released":
+                raise FakeAPIError("InvalidParameter.TemplateNotReleased", f"Template {template_id} is not released", 400)
+        self.domains[domain] = {
+            "Domain": domain,
+            "Cname": f"{domain}.cdn.fake-byteplus.com",
+            "Status": "online",
+            "Waf": "off",
+            "ServiceRegion": body.get("ServiceRegion"),
+            "ServiceTemplateId": body.get("ServiceTemplateId"),
+            "CipherTemplateId": body.get("CipherTemplateId"),
+            "RuleTemplateIds": list(body.get("RuleTemplateIds") or []),
+            "HTTPSSwitch": body.get("HTTPSSwitch"),
+            "CertId": body.get("CertId"),
+            "UpdateTime": int(time.time())
+        }
+        self._start_propagation("domains", domain, "configuring", "online")
+        return {"ResourceIds": [{"Domain": domain}]}
+
+    def _do_UpdateTemplateDomain(self, body):
+        domain = self.domains.get(body.get("Domain"))
+        if domain is None:
+            raise FakeAPIError("InvalidParameter.DomainNotFound", f"Domain {body.get('Domain')} not found", 404)
+        for key in ("ServiceTemplateId", "CipherTemplateId", "RuleTemplateIds"):
+            if body.get(key):
+                domain[key] = json.loads(json.dumps(body[key]))
+        domain["UpdateTime"] = int(time.time())
+        self._start_propagation("domains", domain["Domain"], "configuring", "online")
+        return {}
+
+    def _do_ListCdnDomains(self, body):
+        rows = [row for row in self.domains.values()
+                if (not body.get("Domain") or body["Domain"] in row["Domain"])
+                and (not body.get("Status") or row["Status"] == body["Status"])]
+        return _page(rows, body, "Data")
+
+    def _do_DescribeTemplateDomains(self, body):
+        return _page([row for row in self.domains.values() if _matches_filters(row, body.get("Filters"))],
+                     body, "Data")
+
+    # Content refresh and preload
+
+    def _submit_content_task(self, task_type: str, body: dict) -> dict:
+        urls = [url for url in (body.get("Urls") or "").split("\n") if url]
+        if not urls:
+            raise FakeAPIError("MissingParameter", "Urls is required", 400)
+        if len(urls) > CONTENT_TASK_LIMITS[task_type]:
+            raise FakeAPIError("InvalidParameter.Urls",
+                               f"At most {CONTENT_TASK_LIMITS[task_type]} URLs per {task_type} task", 400)
+        if self.content_used[task_type] + len(urls) > self.content_quotas[task_type]:
+            raise FakeAPIError("QuotaExceeded", f"Daily {task_type} quota exhausted", 400)
+        self.content_used[task_type] += len(urls)
+        task_id = uuid.uuid4().hex
+        delay = self.propagation_delay + self._random.uniform(0, self.propagation_jitter)
+        self.content_tasks[task_id] = {
+            "TaskType": task_type, "Urls": urls, "CreateTime": int(time.time()),
+            "DoneAt": time.monotonic() + delay
+        }
+        return {"TaskID": task_id}
+
+    def _do_SubmitRefreshTask(self, body):
+        return self._submit_content_task("refresh_dir" if body.get("Type") == "dir" else "refresh_file", body)
+
+    def _do_SubmitPreloadTask(self, body):
+        return self._submit_content_task("preload", body)
+
+    def _do_DescribeContentTasks(self, body):
+        now = time.monotonic()
+        rows = [
+            {"TaskID": task_id, "Url": url, "TaskType": task["TaskType"], "CreateTime": task["CreateTime"],
+             "Status": "complete" if task["DoneAt"] <= now else "running"}
+            for task_id, task in self.content_tasks.items()
+            if (not body.get("TaskID") or body["TaskID"] == task_id)
+            and (not body.get("TaskType") or body["TaskType"] == task["TaskType"])
+            for url in task["Urls"]
+            if not body.get("Url") or body["Url"] == url
+        ]
+        return _page(rows, body, "Data")
+
+    def _do_DescribeContentQuota(self, body):
+        quota_names = (("Refresh", "refresh_file"), ("RefreshDir", "refresh_dir"), ("Preload", "preload"))
+        result = {}
+        for name, task_type in quota_names:
+            result[f"{name}Quota"] = self.content_quotas[task_type]
+            result[f"{name}Remain"] = self.content_quotas[task_type] - self.content_used[task_type]
+            result[f"{name}Limit"] = CONTENT_TASK_LIMITS[task_type]
+        return result
+
+
+def _matches_filters(row: dict, filters: list) -> bool:
+    """Apply OpenAPI style [{"Name": ..., "Value": [...], "Fuzzy": bool}] filters"""
+    for item in filters or []:
+        value = row.get(item.get("Name"))
+        wanted = item.get("Value") or []
+        values = value if isinstance(value, list) else [value]
+        if item.get("Fuzzy"):
+            if not any(str(w) in str(v) for w in wanted for v in values):
+                return False
+        elif not any(v in wanted for v in values):
+            return False
+    return True
+
+
+def _page(rows: list, body: dict, result_key: str) -> dict:
+    """Slice rows by PageNum/PageSize into a paginated Result"""
+    page_num = int(body.get("PageNum") or 1)
+    page_size = int(body.get("PageSize") or 20)
+    start = (page_num - 1) * page_size
+    return {
+        result_key: json.loads(json.dumps(rows[start:start + page_size])),
+        "PageNum": page_num,
+        "PageSize": page_size,
+        "Total": len(rows)
+    }
+
+
+class FakeCDNService:
+    """CDNService-compatible client that dispatches to a FakeCDNBackend in process"""
+
+    def __init__(self, backend: FakeCDNBackend = None):
+        self.backend = backend or FakeCDNBackend()
+
+    def set_ak(self, ak):
+        pass
+
+    def set_sk(self, sk):
+        pass
+
+
+def _sdk_method(name: str, action: str):
+    def method(self, body):
+        return self.backend.handle(action, body)
+    method.__name__ = name
+    method.__doc__ = f"Fake {action} call"
+    return method
+
+
+for _name, _action in SDK_ACTIONS.items():
+    setattr(FakeCDNService, _name, _sdk_method(_name, _action))
+
+
+class _FakeOpenAPIHandler(BaseHTTPRequestHandler):
+    backend = None
+
+    def _dispatch(self):
+        action = parse_qs(urlparse(self.path).query).get("Action", [""])[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            status, payload = 200, self.backend.handle(action, body)
+        except FakeAPIError as e:
+            status, payload = e.status, json.loads(str(e))
+        except ValueError as e:
+            status, payload = 400, {"ResponseMetadata": {"Error": {"Code": "InvalidJSON", "Message": str(e)}}}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _dispatch
+
+    def log_message(self, fmt, *args):
+        logger.debug("fake_cdn %s", fmt % args)
+
+
+def serve(backend: FakeCDNBackend, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Start the fake OpenAPI over HTTP on a background thread
+
+    Output:
+        - The running server; call shutdown() to stop it
+    """
+    handler = type("FakeOpenAPIHandler", (_FakeOpenAPIHandler,), {"backend": backend})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="fake_cdn", daemon=True).start()
+    logger.info(f"Fake CDN OpenAPI listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local fake Byteplus CDN OpenAPI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="Base latency per call in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.02, help="Random extra latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected InternalError")
+    parser.add_argument("--qps", type=float, default=None, help="Per-action quota in calls/second")
+    parser.add_argument("--propagation-delay", type=float, default=0.0,
+                        help="Seconds until releases and domain changes become active")
+    parser.add_argument("--propagation-jitter", type=float, default=0.0, help="Random extra propagation seconds")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    server = serve(
+        FakeCDNBackend(args.latency, args.latency_jitter, args.error_rate, {"*": args.qps} if args.qps else None,
+                       propagation_delay=args.propagation_delay, propagation_jitter=args.propagation_jitter),
+        args.host, args.port
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
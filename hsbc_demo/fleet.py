@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Fleet Executor
+
+Runs HSBCDemo operations for many accounts and domains across worker
+processes, for fleet-wide audits and rollouts that one Python process
+(and one GIL) cannot drive fast enough.
+
+    - The work list (accounts x domains x operations) is sharded by
+      account: every account lives in exactly one worker, so its client,
+      keep-alive connections and rate limits (Resilience) are not
+      duplicated across processes. Accounts are balanced over shards by
+      item count (largest first).
+    - Each worker builds its own CDNService per account via CDNClientPool
+      and runs its items on a thread pool.
+    - Result rows stream back to the parent through a multiprocessing
+      queue as they complete and are merged into one report with
+      per-shard timing.
+
+Work file (JSON):
+    {
+      "Accounts": {"acct-a": {"AccessKey": "$ACCT_A_AK", "SecretKey": "$ACCT_A_SK"}},
+      "Items": [{"Account": "acct-a", "Operation": "describe_delivery_policy",
+                 "Args": {"template_id": "tpl-..."}}],
+      "Matrix": {"Accounts": ["acct-a"], "Domains": ["a.example.com"],
+                 "Operations": [{"Operation": "provision", "Args": {"domain": "{domain}"}}]}
+    }
+Credentials starting with "$" are read from that environment variable.
+"provision" runs build_provisioning_workflow; every other Operation is a
+public HSBCDemo method called with Args.
+
+Usage:
+    python fleet.py work.json [--processes 8] [--threads 8] [--fake-latency 0.05]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import pickle
+import logging
+import argparse
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PROVISION = "provision"
+
+
+def expand_matrix(matrix: dict) -> list:
+    """Work items for every account x domain x operation; "{domain}" in string Args is substituted"""
+    items = []
+    for account in matrix.get("Accounts") or []:
+        for domain in matrix.get("Domains") or [None]:
+            for operation in matrix.get("Operations") or []:
+                args = {key: value.format(domain=domain) if isinstance(value, str) and domain else value
+                        for key, value in (operation.get("Args") or {}).items()}
+                items.append({"Account": account, "Operation": operation["Operation"], "Args": args})
+    return items
+
+
+def load_work(path: str) -> tuple:
+    """(accounts, items) from a work file"""
+    with open(path) as f:
+        work = json.load(f)
+    items = list(work.get("Items") or []) + expand_matrix(work.get("Matrix") or {})
+    return work.get("Accounts") or {}, items
+
+
+def shard_items(items: list, shards: int) -> list:
+    """Split items into at most `shards` lists, keeping each account in one shard"""
+    by_account = {}
+    for index, item in enumerate(items):
+        by_account.setdefault(item["Account"], []).append((index, item))
+    buckets = [[] for _ in range(max(1, min(shards, len(by_account))))]
+    for account_items in sorted(by_account.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(account_items)
+    return [bucket for bucket in buckets if bucket]
+
+
+def _credential(value: str) -> str:
+    if isinstance(value, str) and value.startswith("$"):
+        return os.environ.get(value[1:], "")
+    return value
+
+
+def _fake_factory(latency: float):
+    from fake_cdn import FakeCDNBackend, FakeCDNService
+
+    return FakeCDNService(FakeCDNBackend(latency=latency))
+
+
+def _run_item(demo, item: dict):
+    operation = item["Operation"]
+    args = item.get("Args") or {}
+    if operation == PROVISION:
+        from hsbc_demo import build_provisioning_workflow
+        from workflow import STATUS_SUCCEEDED
+
+        steps = build_provisioning_workflow(demo, **args).run()
+        failed = [name for name, step in steps.items() if step["Status"] != STATUS_SUCCEEDED]
+        return not failed, {name: step["Status"] for name, step in steps.items()}, \
+            f"Steps not succeeded: {', '.join(failed)}" if failed else None
+    if operation.startswith("_") or not callable(getattr(demo, operation, None)):
+        return False, None, f"Unknown operation: {operation}"
+    method = getattr(demo, operation)
+    result = method(**args)
+    if hasattr(result, "__next__"):
+        result = list(result)
+    # Methods annotated "-> None" only log; for the others None or False means failure
+    returns_nothing = "return" in method.__annotations__ and method.__annotations__["return"] is None
+    return returns_nothing or (result is not None and result is not False), result, None
+
+
+def _worker(shard: int, items: list, accounts: dict, threads: int, fake_latency, results) -> None:
+    """Worker process: run one shard, streaming ("result", ...) rows and a final ("done", ...)"""
+    from client_pool import CDNClientPool
+    from hsbc_demo import HSBCDemo
+
+    started = time.perf_counter()
+    factory = functools.partial(_fake_factory, fake_latency) if fake_latency is not None else None
+    pool = CDNClientPool(pool_size=threads, factory=factory)
+    demos = {}
+    demos_lock = threading.Lock()
+
+    def _demo(account: str):
+        # One HSBCDemo (and Resilience) per account, however many threads start on it at once
+        with demos_lock:
+            if account not in demos:
+                credentials = accounts.get(account) or {}
+                svc = pool.get(_credential(credentials.get("AccessKey", account)),
+                               _credential(credentials.get("SecretKey", account)))
+                demos[account] = HSBCDemo(svc=svc)
+            return demos[account]
+
+    def _execute(entry):
+        index, item = entry
+        item_started = time.perf_counter()
+        try:
+            success, result, error = _run_item(_demo(item["Account"]), item)
+        except Exception as e:
+            success, result, error = False, None, str(e)
+        row = {**item, "Index": index, "Shard": shard, "Success": success, "Result": result,
+               "Error": error if success else error or "Operation returned no result",
+               "Latency": time.perf_counter() - item_started}
+        # Queue.put pickles in a feeder thread, where a failure would silently drop the row
+        try:
+            pickle.dumps(row)
+        except Exception as e:  # Unpicklable result
+            row = {**row, "Result": repr(result), "Error": row["Error"] or f"Unpicklable result: {str(e)}"}
+        results.put(("result", shard, row))
+        return success
+
+    try:
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"fleet{shard}") as executor:
+            succeeded = sum(executor.map(_execute, items))
+    finally:
+        pool.close()
+    results.put(("done", shard, {"Shard": shard, "Pid": os.getpid(), "Items": len(items),
+                                 "Succeeded": succeeded, "Failed": len(items) - succeeded,
+                                 "Accounts": sorted({item["Account"] for _, item in items}),
+                                 "Duration": time.perf_counter() - started}))
+
+
+class FleetExecutor:
+    def __init__(self, accounts: dict, processes: int = None, threads: int = 8, fake_latency: float = None):
+        """Process-pool driver for fleet-wide HSBCDemo operations
+
+        Input:
+            - accounts: {account: {"AccessKey": ..., "SecretKey": ...}}
+            - processes: Worker processes (default: all cores)
+            - threads: Concurrent operations per worker
+            - fake_latency: Run against a per-worker fake_cdn backend with
+              this latency instead of the real API (for load tests)
+        """
+        self._accounts = accounts
+        self._processes = processes or os.cpu_count() or 1
+        self._threads = threads
+        self._fake_latency = fake_latency
+
+    def run(self, items: list, on_result=None) -> dict:
+        """Run work items and return the merged report
+
+        Input:
+            - items: [{"Account", "Operation", "Args"}]
+            - on_result: Optional callback invoked with each result row as it arrives
+
+        Output:
+            - {"Results": rows in input order, "Shards": per-shard timing,
+               "Succeeded", "Failed", "Duration"}
+        """
+        started = time.perf_counter()
+        shards = shard_items(items, self._processes)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = [
+            context.Process(target=_worker, name=f"fleet-shard-{shard}",
+                            args=(shard, shard_items_, self._accounts, self._threads, self._fake_latency, results))
+            for shard, shard_items_ in enumerate(shards)
+        ]
+        for worker in workers:
+            worker.start()
+
+        rows, timings, pending = {}, {}, set(range(len(workers)))
+
+        def _receive(message):
+            kind, shard, payload = message
+            if kind == "result":
+                rows[payload["Index"]] = payload
+                if on_result is not None:
+                    on_result(payload)
+            else:  # "done" is each shard's last message
+                timings[shard] = payload
+                pending.discard(shard)
+
+        while pending:
+            try:
+                _receive(results.get(timeout=1.0))
+                continue
+            except queue.Empty:
+                pass
+            exited = [shard for shard in pending if workers[shard].exitcode is not None]
+            if not exited:
+                continue
+            # An exited worker has flushed its queue into the pipe, but the rows
+            # may not have been read yet: drain before declaring a shard dead
+            try:
+                while True:
+                    _receive(results.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            for shard in [shard for shard in exited if shard in pending]:
+                logger.error(f"Fleet shard {shard} exited with code {workers[shard].exitcode} before finishing")
+                pending.discard(shard)
+        for worker in workers:
+            worker.join()
+
+        for shard, entries in enumerate(shards):
+            for index, item in entries:
+                if index not in rows:
+                    rows[index] = {**item, "Index": index, "Shard": shard, "Success": False, "Result": None,
+                                   "Error": "Worker process died", "Latency": None}
+            timings.setdefault(shard, {"Shard": shard, "Pid": None, "Items": len(entries), "Succeeded": 0,
+                                       "Failed": len(entries), "Accounts": [], "Duration": None})
+        ordered = [rows[index] for index in sorted(rows)]
+        succeeded = sum(1 for row in ordered if row["Success"])
+        return {"Results": ordered, "Shards": [timings[shard] for shard in sorted(timings)],
+                "Succeeded": succeeded, "Failed": len(ordered) - succeeded,
+                "Duration": time.perf_counter() - started}
+
+
+if __name__ == '__main__':
+    from log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Run HSBCDemo operations across accounts in worker processes")
+    parser.add_argument("work", help="Work file (JSON)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent operations per worker")
+    parser.add_argument("--fake-latency", type=float, default=None,
+                        help="Use an in-process fake CDN API with this latency (seconds)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING)
+    work_accounts, work_items = load_work(args.work)
+    report = FleetExecutor(work_accounts, args.processes, args.threads, args.fake_latency).run(work_items)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        for timing in report["Shards"]:
+            duration = f"{timing['Duration']:.2f}s" if timing["Duration"] is not None else "crashed"
+            print(f"shard {timing['Shard']}: {timing['Items']} items, {timing['Failed']} failed, "
+                  f"{len(timing['Accounts'])} accounts, {duration}")
+        print(f"{report['Succeeded']} succeeded, {report['Failed']} failed in {report['Duration']:.2f}s")
+    sys.exit(0 if report["Failed"] == 0 else 1)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo HyperLogLog
+
+Fixed-memory distinct-count sketch. A sketch with precision p keeps 2**p
+one-byte registers (16 KB at the default p=14, about 0.8% standard error)
+no matter how many items are added, and sketches built in different
+processes merge exactly, because items are hashed with a stable hash
+(blake2b) instead of Python's per-process randomized hash().
+
+Usage:
+    sketch = HyperLogLog()
+    sketch.update(keys)
+    sketch.merge(other_sketch)
+    estimate = sketch.count()
+"""
+import math
+import hashlib
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 14):
+        """Create an empty sketch
+
+        Input:
+            - p: Precision, 4..18; memory is 2**p bytes, standard error 1.04 / sqrt(2**p)
+        """
+        if not 4 <= p <= 18:
+            raise ValueError("Precision must be between 4 and 18")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item: str) -> None:
+        self.update((item,))
+
+    def update(self, items) -> None:
+        """Add every item of an iterable of strings"""
+        p, registers, width = self.p, self.registers, 64 - self.p
+        mask = (1 << width) - 1
+        blake2b = hashlib.blake2b
+        for item in items:
+            x = int.from_bytes(blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+            index = x >> width
+            rank = width - (x & mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Fold another sketch of the same precision into this one"""
+        if other.p != self.p:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct items added"""
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
@@ -1,63 +1,125 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
-import json
+import time
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from requests.exceptions import RequestException
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("hsbc_cdn_demo.log"),  # Log to file
-        logging.StreamHandler()                    # Log to console
-    ]
-)
+from typing import TYPE_CHECKING
+
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())  # Handlers are set up by the application, see log_config
+
+# Optional path of a source checkout of byteplus-sdk-python
+if os.environ.get("HSBC_DEMO_SDK_PATH"):
+    sys.path.insert(0, os.environ["HSBC_DEMO_SDK_PATH"])
+
+# The SDKs (byteplus_sdk, cdn_rule_engine_sdk, requests) are imported where
+# they are first needed, so importing this module stays cheap for the CLI
+from hsbc_demo_json import delivery_policy_template, overlay  # Pre-parsed base delivery policy template
+from log_config import LazyJson, configure_logging
+import metrics
+from resilience import Resilience, CircuitOpenError
+from workflow import DagExecutor, STATUS_SUCCEEDED, require
+
+if TYPE_CHECKING:
+    from describe_cache import DescribeCache
+    from inventory import InventoryIndex
+    from staging import ChangeSet
+    from template_cache import TemplateCache
+
+
+# Template kind -> infix of its SDK methods (create_<infix>_template, ...)
+TEMPLATE_KINDS = {
+    "service": "service",
+    "cipher": "cipher",
+    "rule_engine": "rule_engine",
+}
 
-sys.path.insert(0, "/Users/bytedance/byteplus/byteplus-sdk-python/")
 
-from byteplus_sdk.cdn.service import CDNService
-from cdn_rule_engine_sdk.rule_engine.Rule import Condition, Action, Rule
-from cdn_rule_engine_sdk.rule_engine.Const import Const
-from hsbc_demo_json import json_delivery_policy  # Import base delivery policy template
+def _request_exception():
+    """requests' RequestException, or () (matching nothing) while requests is not loaded
+
+    An SDK call that raised a RequestException has necessarily imported
+    requests already, so this never needs to import it.
+    """
+    module = sys.modules.get("requests.exceptions")
+    return module.RequestException if module is not None else ()
 
 
 class HSBCDemo:
-    def __init__(self):
+    def __init__(self, resilience: Resilience = None, svc=None, template_cache: "TemplateCache" = None,
+                 describe_cache: "DescribeCache" = None, inventory: "InventoryIndex" = None):
         """Initialize Byteplus CDN service with authentication
         
         Input:
             - Environment variables: HSBC_DEMO_ACCESSKEY, HSBC_DEMO_SECRETKEY
+            - resilience: Rate limit / retry / circuit breaker settings
+              (defaults to Resilience())
+            - svc: Optional pre-configured CDNService-compatible client
+              (e.g. fake_cdn.FakeCDNService); skips the environment credentials
+            - template_cache: Optional TemplateCache; identical template
+              bodies then reuse an existing TemplateId instead of creating one
+            - describe_cache: Optional DescribeCache; describe_* calls are then
+              served locally until the entry expires or this client changes
+              the template
+            - inventory: Optional InventoryIndex; describe_delivery_policy then
+              reports the bound domains (loaded on first use) and domains
+              created or rebound by this client are re-indexed
         
         Output:
             - Initialized CDN service instance with credentials
             - Raises ValueError if credentials are missing
         """
-        self._svc = CDNService()
-        
-        # Get credentials from environment variables
-        self._ak = os.environ.get('HSBC_DEMO_ACCESSKEY', '')
-        self._sk = os.environ.get('HSBC_DEMO_SECRETKEY', '')
-        
-        # Validate credentials
-        if not self._ak or not self._sk:
-            error_msg = "Environment variables HSBC_DEMO_ACCESSKEY and HSBC_DEMO_SECRETKEY must be set"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        
-        # Configure service with credentials
-        self._svc.set_ak(self._ak)
-        self._svc.set_sk(self._sk)
+        if svc is not None:
+            self._svc = svc
+            self._ak = self._sk = None
+        else:
+            from byteplus_sdk.cdn.service import CDNService
+
+            self._svc = CDNService()
+
+            # Get credentials from environment variables
+            self._ak = os.environ.get('HSBC_DEMO_ACCESSKEY', '')
+            self._sk = os.environ.get('HSBC_DEMO_SECRETKEY', '')
+
+            # Validate credentials
+            if not self._ak or not self._sk:
+                error_msg = "Environment variables HSBC_DEMO_ACCESSKEY and HSBC_DEMO_SECRETKEY must be set"
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+
+            # Configure service with credentials
+            self._svc.set_ak(self._ak)
+            self._svc.set_sk(self._sk)
         self._message = 'Byteplus SDK HSBC Demo'
         self._cert_id = "cert-9fe8c4d8bf2746469eb0050c4812698b"
+        self._resilience = resilience or Resilience()
+        self._template_cache = template_cache
+        self._describe_cache = describe_cache
+        self._inventory = inventory
 
         logger.info("Byteplus CDN service initialized successfully")
 
+    @property
+    def identity(self) -> str:
+        """Stable identity of the account and endpoint this client talks to
+
+        A hash of the access key plus the API host, e.g. "3f2a9c01d4e5@cdn.byteplusapi.com".
+        A client without credentials (e.g. fake_cdn) gets an identity unique to
+        that client object, so nothing keyed by it is shared with another backend.
+        """
+        service_info = getattr(self._svc, "service_info", None)
+        credentials = getattr(service_info, "credentials", None)
+        ak = self._ak or getattr(credentials, "ak", None)
+        if not ak:
+            return f"{type(self._svc).__name__}:{id(self._svc):x}"
+        host = getattr(service_info, "host", None) or "default"
+        return f"{hashlib.sha256(ak.encode()).hexdigest()[:12]}@{host}"
+
     def _call_sdk_method(self, method, body, success_msg) -> dict:
-        """Generic wrapper for SDK method calls with error handling
+        """Generic wrapper for SDK method calls with rate limiting, retries and error handling
         
         Input:
             - method: SDK method to call (e.g., self._svc.create_service_template)
@@ -66,24 +128,48 @@ class HSBCDemo:
         
         Output:
             - Dictionary containing API response if successful
-            - None if call fails
+            - None if call fails (after retries) or the circuit is open
         """
+        api = getattr(method, "__name__", "sdk_call")
+        spans = metrics.start_spans(api)
+        started = time.perf_counter()
         try:
-            logger.debug(f"Calling SDK method with parameters: {json.dumps(body, indent=2)}")
-            resp = method(body)
+            logger.debug("Calling SDK method with parameters: %s", LazyJson(body))
+            resp = self._resilience.call(api, method, body)
+            metrics.record_call(api, time.perf_counter() - started, body, resp)
+            metrics.end_spans(spans)
             logger.info(success_msg)
-            logger.debug(f"API response: {json.dumps(resp, indent=2)}")
+            logger.debug("API response: %s", LazyJson(resp))
             return resp
-        except RequestException as e:
+        except CircuitOpenError as e:
+            error, error_kind = e, "circuit_open"
+            logger.error(f"API request skipped: {str(e)}")
+        except _request_exception() as e:
+            error, error_kind = e, "request"
             logger.error(f"API request failed: {str(e)}")
         except KeyError as e:
+            error, error_kind = e, "response_format"
             logger.error(f"Response format error - missing field: {str(e)}")
         except Exception as e:
+            error, error_kind = e, "unexpected"
             logger.error(f"Unexpected error: {str(e)}")
+        metrics.record_call(api, time.perf_counter() - started, body, None, error_kind)
+        metrics.end_spans(spans, error)
         return None
 
-    def create_domain(self, domain: str, id_rule: str, id_delivery: str, id_cipher) -> None:
-    
+    def create_domain(self, domain: str, id_rule: str, id_delivery: str, id_cipher) -> bool:
+        """Bind a new domain to the rule engine, delivery and cipher templates
+
+        Input:
+            - domain: String containing the domain name to onboard
+            - id_rule: Rule engine template ID
+            - id_delivery: Delivery (service) template ID
+            - id_cipher: Cipher template ID
+
+        Output:
+            - True if the domain was created
+            - False if creation fails
+        """
         resp = self._call_sdk_method(
             self._svc.add_template_domain,
             {
@@ -99,12 +185,156 @@ class HSBCDemo:
         )
           # Print and log domain details if response is valid
         if resp and "Result" in resp and "ResourceIds" in resp["Result"]:
-            for seq, domain in enumerate(resp["Result"]["ResourceIds"], start=1):
-                domain_info = f"[{seq}]. Domain: [{domain.get('Domain')}] is created"
+            for seq, resource in enumerate(resp["Result"]["ResourceIds"], start=1):
+                domain_info = f"[{seq}]. Domain: [{resource.get('Domain')}] is created"
                 logger.info(domain_info)
-        else:
-            logger.warning(f"Failed in creating new {domain=} {resp=}")
-        
+            self._reindex_domain(domain)
+            return True
+
+        logger.warning(f"Failed in creating new {domain=} {resp=}")
+        return False
+
+    def create_domains(self, specs, max_workers: int = 8) -> list:
+        """Onboard many domains concurrently through a bounded thread pool
+
+        Input:
+            - specs: Iterable of dicts with the create_domain arguments
+              (domain, id_rule, id_delivery, id_cipher)
+            - max_workers: Upper bound on in-flight add_template_domain calls
+
+        Output:
+            - List of result rows, one per spec and in input order, with keys
+              Domain, Success, Latency (seconds) and Error
+        """
+        specs = list(specs)
+        if not specs:
+            logger.warning("No domain specs given for create_domains")
+            return []
+
+        def _onboard(spec: dict) -> dict:
+            started = time.perf_counter()
+            error = None
+            try:
+                success = self.create_domain(**spec)
+            except Exception as e:
+                success = False
+                error = str(e)
+            if not success and error is None:
+                error = "add_template_domain failed, see log for details"
+            return {
+                "Domain": spec.get("domain"),
+                "Success": success,
+                "Latency": time.perf_counter() - started,
+                "Error": error
+            }
+
+        workers = max(1, min(max_workers, len(specs)))
+        logger.info(f"Onboarding {len(specs)} domains with {workers} workers")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="create_domains") as pool:
+            results = list(pool.map(_onboard, specs))
+        elapsed = time.perf_counter() - started
+
+        succeeded = sum(1 for row in results if row["Success"])
+        logger.info(f"Domain onboarding finished: {succeeded} succeeded, "
+                    f"{len(results) - succeeded} failed in {elapsed:.2f}s "
+                    f"({len(results) / elapsed if elapsed else 0:.1f} domains/s)")
+        return results
+
+    def _fetch_page(self, method, body: dict, result_key: str, page_num: int, page_size: int) -> dict:
+        """Fetch one page of a paginated list API, returning its Result or None"""
+        resp = self._call_sdk_method(
+            method,
+            {**body, "PageNum": page_num, "PageSize": page_size},
+            f"Successfully retrieved {method.__name__} page {page_num}"
+        )
+        if resp and "Result" in resp and result_key in resp["Result"]:
+            return resp["Result"]
+        return None
+
+    def _iter_pages(self, method, body: dict, result_key: str, page_size: int, prefetch: bool):
+        """Lazily iterate the items of a PageNum/PageSize paginated list API
+
+        Input:
+            - method: SDK list method (e.g. self._svc.list_cdn_domains)
+            - body: Request fields other than PageNum/PageSize (filters)
+            - result_key: Key of the item list inside Result
+            - page_size: Items requested per call
+            - prefetch: Fetch the next page in the background while the
+              caller processes the current one
+
+        Output:
+            - Generator of items; at most two pages are held in memory
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page_prefetch") if prefetch else None
+        fetch = lambda num: self._fetch_page(method, body, result_key, num, page_size)
+
+        try:
+            page_num, seen = 1, 0
+            pending = executor.submit(fetch, page_num) if executor else None
+            while True:
+                page = pending.result() if executor else fetch(page_num)
+                if page is None:
+                    logger.warning(f"Stopped {method.__name__} at page {page_num}: invalid response")
+                    return
+
+                items = page[result_key] or []
+                seen += len(items)
+                total = page.get("Total")
+                has_more = len(items) == page_size and (total is None or seen < total)
+                page_num += 1
+                if executor and has_more:
+                    pending = executor.submit(fetch, page_num)
+
+                yield from items
+                del items, page
+                if not has_more:
+                    return
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_cdn_domains(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Lazily iterate over all CDN domains, one page at a time
+
+        Input:
+            - page_size: Domains requested per list_cdn_domains call
+            - filters: Optional ListCdnDomains filter fields (e.g. {"Status": "online"})
+            - prefetch: Fetch the next page in the background while the
+              caller processes the current one
+
+        Output:
+            - Generator of domain dicts; at most two pages are held in memory
+        """
+        return self._iter_pages(self._svc.list_cdn_domains, dict(filters or {}), "Data", page_size, prefetch)
+
+    def iter_templates(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Lazily iterate over all templates (service, cipher and rule engine)
+
+        Input:
+            - page_size: Templates requested per describe_templates call
+            - filters: Optional DescribeTemplates fields,
+              e.g. {"Filters": [{"Name": "Type", "Value": ["cipher"]}]}
+            - prefetch: Prefetch the next page in the background
+
+        Output:
+            - Generator of template summary dicts (TemplateId, Title, Type, Status, ...)
+        """
+        return self._iter_pages(self._svc.describe_templates, dict(filters or {}), "Templates", page_size, prefetch)
+
+    def iter_template_domains(self, page_size: int = 100, filters: dict = None, prefetch: bool = True):
+        """Lazily iterate over domains together with their template bindings
+
+        Input:
+            - page_size: Domains requested per describe_template_domains call
+            - filters: Optional DescribeTemplateDomains fields
+            - prefetch: Prefetch the next page in the background
+
+        Output:
+            - Generator of dicts with Domain, ServiceTemplateId, CipherTemplateId,
+              RuleTemplateIds and Status
+        """
+        return self._iter_pages(self._svc.describe_template_domains, dict(filters or {}), "Data", page_size, prefetch)
 
     def list_cdn_domains(self) -> None:
         """Retrieve and display list of CDN domains
@@ -116,48 +346,194 @@ class HSBCDemo:
             - Prints domain details to console
             - Logs results to log file
         """
+        count = 0
+        for seq, domain in enumerate(self.iter_cdn_domains(), start=1):
+            domain_info = (f"{seq}. Domain: {domain.get('Domain')}, "
+                          f"CNAME: {domain.get('Cname')}, "
+                          f"WAF Status: {domain.get('Waf')}")
+            logger.info(domain_info)
+            count = seq
+
+        if not count:
+            logger.warning("No CDN domains found or invalid response format")
+
+    def _template_method(self, kind: str, operation: str):
+        """Resolve the SDK method for an operation on a template kind"""
+        if kind not in TEMPLATE_KINDS:
+            raise ValueError(f"Unknown template kind: {kind}")
+        return getattr(self._svc, f"{operation}_{TEMPLATE_KINDS[kind]}_template")
+
+    def _cached_template_id(self, kind: str, body: dict) -> str:
+        """Look up a template with identical content in the template cache
+
+        Output:
+            - TemplateId of a reusable template, or None on a miss
+        """
+        if self._template_cache is None:
+            return None
+        template_id = self._template_cache.lookup(kind, body, self.identity)
+        if template_id is None:
+            return None
+        if self._template_cache.validate:
+            # Straight from the server: the describe cache is only invalidated
+            # by this process and would hide edits made elsewhere
+            described = self._describe(kind, template_id, f"Validating cached {kind} template: {template_id}",
+                                       cached=False)
+            if described is None:
+                logger.info(f"Cached {kind} template {template_id} is gone, creating a new one")
+                self._forget_template(template_id)
+                return None
+            if not self._template_cache.matches(kind, body, described):
+                logger.info(f"Cached {kind} template {template_id} was changed elsewhere, creating a new one")
+                self._forget_template(template_id)
+                return None
+        logger.info(f"Reusing {kind} template {template_id} with identical content for {body.get('Title')}")
+        return template_id
+
+    def _remember_template(self, kind: str, body: dict, template_id: str) -> None:
+        if self._template_cache is not None:
+            self._template_cache.store(kind, body, template_id, self.identity)
+
+    def _forget_template(self, template_id: str) -> None:
+        """Invalidate cached content and descriptions of a changed or deleted template"""
+        if self._template_cache is not None:
+            self._template_cache.invalidate(template_id)
+        if self._describe_cache is not None:
+            self._describe_cache.invalidate(template_id)
+
+    def _reindex_domain(self, domain: str) -> None:
+        """Re-fetch the bindings of a domain this client changed into a loaded inventory index"""
+        if self._inventory is not None and self._inventory.loaded:
+            self._inventory.refresh_domains(self, [domain])
+
+    def _describe(self, kind: str, template_id: str, success_msg: str, cached: bool = True) -> dict:
+        """Describe a template (through the describe cache unless cached=False), returning its Result or None"""
+        def _load():
+            resp = self._call_sdk_method(
+                self._template_method(kind, "describe"),
+                {"TemplateId": template_id},
+                success_msg
+            )
+            if resp and "Result" in resp:
+                return resp["Result"]
+            return None
+
+        if self._describe_cache is None or not cached:
+            return _load()
+        return self._describe_cache.get_or_load(kind, template_id, _load)
+
+    def create_template(self, kind: str, body: dict) -> str:
+        """Create a template of any kind from a complete request body
+
+        Input:
+            - kind: Template kind, one of TEMPLATE_KINDS ("service", "cipher", "rule_engine")
+            - body: Request body including Title
+
+        Output:
+            - String containing template ID if successful
+            - None if creation fails
+        """
+        template_id = self._cached_template_id(kind, body)
+        if template_id:
+            return template_id
+
         resp = self._call_sdk_method(
-            self._svc.list_cdn_domains,
-            {},
-            "Successfully retrieved CDN domains"
+            self._template_method(kind, "create"),
+            body,
+            f"{kind} template creation initiated: {body.get('Title')}"
         )
-        
-        # Print and log domain details if response is valid
-        if resp and "Result" in resp and "Data" in resp["Result"]:
-            for seq, domain in enumerate(resp["Result"]["Data"], start=1):
-                domain_info = (f"{seq}. Domain: {domain.get('Domain')}, "
-                              f"CNAME: {domain.get('Cname')}, "
-                              f"WAF Status: {domain.get('Waf')}")
-                logger.info(domain_info)
-        else:
-            logger.warning("No CDN domains found or invalid response format")
+        if resp and "Result" in resp and "TemplateId" in resp["Result"]:
+            template_id = resp["Result"]["TemplateId"]
+            self._remember_template(kind, body, template_id)
+            return template_id
 
-    def create_delivery_policy(self, title: str) -> str:
-        """Create a new delivery policy by merging metadata with base template
+        logger.error(f"Failed to create {kind} template: {body.get('Title')}")
+        return None
+
+    def describe_template(self, kind: str, template_id: str) -> dict:
+        """Fetch the configuration of a template of any kind
+
+        Output:
+            - Dictionary containing the template Result if successful
+            - None if the call fails
+        """
+        if not template_id:
+            logger.warning("Template ID cannot be empty for describe_template")
+            return None
+
+        return self._describe(kind, template_id, f"Successfully retrieved details for {kind} template: {template_id}")
+
+    def update_template(self, kind: str, template_id: str, changes: dict) -> bool:
+        """Update fields of a template of any kind (takes effect on release)
+
+        Input:
+            - kind: Template kind, one of TEMPLATE_KINDS
+            - template_id: String containing policy template ID
+            - changes: Fields to update
+
+        Output:
+            - True if the update call succeeded, False otherwise
+        """
+        if not template_id:
+            logger.warning("Template ID cannot be empty for update_template")
+            return False
+
+        resp = self._call_sdk_method(
+            self._template_method(kind, "update"),
+            {**changes, "TemplateId": template_id},
+            f"{kind} template update initiated: {template_id}"
+        )
+        self._forget_template(template_id)
+        if resp is None:
+            logger.error(f"Failed to update {kind} template: {template_id}")
+        return resp is not None
+
+    def update_template_domain(self, domain: str, id_rule: str, id_delivery: str, id_cipher) -> bool:
+        """Rebind an existing domain to different templates
+
+        Output:
+            - True if the update call succeeded, False otherwise
+        """
+        resp = self._call_sdk_method(
+            self._svc.update_template_domain,
+            {
+                "Domain": domain,
+                "RuleTemplateIds": [id_rule],
+                "ServiceTemplateId": id_delivery,
+                "CipherTemplateId": id_cipher
+            },
+            f"Updating template bindings of domain {domain}"
+        )
+        if resp is None:
+            logger.error(f"Failed to update template bindings of domain {domain}")
+            return False
+        self._reindex_domain(domain)
+        return True
+
+    def create_delivery_policy(self, title: str, overrides: dict = None) -> str:
+        """Create a new delivery policy by overlaying metadata on the base template
         
         Input:
             - title: String containing policy title
+            - overrides: Optional per-policy fields merged over the base
+              template (nested dicts are merged, other values replaced)
         
         Output:
             - String containing template ID if successful
             - None if creation fails
         """
-        try:
-            # Parse base policy template from JSON string
-            base_policy = json.loads(json_delivery_policy)
-            logger.debug(f"Successfully parsed base delivery policy: {json_delivery_policy[:100]}...")
-            
-            # Merge metadata with base policy (avoids JSON syntax errors)
-            full_policy = {
-                "Title": title,
-                "Message": self._message,
-                "Project": "default",
-                **base_policy  # Merge base policy fields
-            }
-            logger.debug(f"Full delivery policy: {json.dumps(full_policy, indent=2)[:5000]}...")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse base policy JSON: {str(e)}")
-            return None
+        # Overlay metadata on the pre-parsed base policy; unchanged subtrees are shared
+        full_policy = overlay(delivery_policy_template, {
+            "Title": title,
+            "Message": self._message,
+            "Project": "default",
+            **(overrides or {})
+        })
+        logger.debug("Full delivery policy: %s", LazyJson(full_policy, limit=5000))
+
+        template_id = self._cached_template_id("service", full_policy)
+        if template_id:
+            return template_id
 
         # Call SDK to create policy
         resp = self._call_sdk_method(
@@ -169,43 +545,45 @@ class HSBCDemo:
         # Extract and return template ID if successful
         if resp and "Result" in resp and "TemplateId" in resp["Result"]:
             template_id = resp["Result"]["TemplateId"]
+            self._remember_template("service", full_policy, template_id)
             logger.info(f"Delivery policy created successfully: {title} -> {template_id}")
             return template_id
         
         logger.error(f"Failed to create delivery policy: {title}")
         return None
 
-    def describe_delivery_policy(self, template_id: str) -> None:
+    def describe_delivery_policy(self, template_id: str) -> dict:
         """Retrieve and display details of a specific delivery policy
         
         Input:
             - template_id: String containing policy template ID
         
         Output:
-            - Prints policy details to console
-            - Logs results to log file
+            - Logs policy details
+            - Dictionary containing the policy Result, None if the call fails
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for describe_delivery_policy")
-            return
+            return None
 
-        resp = self._call_sdk_method(
-            self._svc.describe_service_template,
-            {"TemplateId": template_id},
-            f"Successfully retrieved details for policy: {template_id}"
-        )
+        policy = self._describe("service", template_id, f"Successfully retrieved details for policy: {template_id}")
 
         # Extract and display policy details
-        if resp and "Result" in resp:
-            policy = resp["Result"]
-            domains = []
+        if policy is not None:
+            if self._inventory is None:
+                domains = "unknown (no inventory index)"
+            elif self._inventory.loaded or self._inventory.load(self):
+                domains = sorted(self._inventory.domains_for_template(template_id))
+            else:
+                domains = "unknown (inventory listing failed)"
             policy_info = (f"Delivery Policy - ID: {policy.get('TemplateId')}, "
                           f"Title: {policy.get('Title')}, "
                           f"Bound Domains: {domains}")
             logger.info(policy_info)
-            logger.debug(f"Full policy details: {json.dumps(policy, indent=2)}")
+            logger.debug("Full policy details: %s", LazyJson(policy))
         else:
             logger.warning(f"No details found for delivery policy: {template_id}")
+        return policy
 
     def create_cipher_policy(self, title: str) -> str:
         """Create a new cipher policy (HTTPS configuration)
@@ -244,7 +622,11 @@ class HSBCDemo:
                 "StatusCode": "301"
             },
         }
-        logger.debug(f"Cipher policy configuration: {json.dumps(body, indent=2)}")
+        logger.debug("Cipher policy configuration: %s", LazyJson(body))
+
+        template_id = self._cached_template_id("cipher", body)
+        if template_id:
+            return template_id
 
         # Call SDK to create policy
         resp = self._call_sdk_method(
@@ -256,63 +638,58 @@ class HSBCDemo:
         # Extract and return template ID if successful
         if resp and "Result" in resp and "TemplateId" in resp["Result"]:
             template_id = resp["Result"]["TemplateId"]
+            self._remember_template("cipher", body, template_id)
             logger.info(f"Cipher policy created successfully: {template_id}")
             return template_id
         
         logger.error(f"Failed to create cipher policy: {title}")
         return None
 
-    def describe_cipher_policy(self, template_id: str) -> None:
+    def describe_cipher_policy(self, template_id: str) -> dict:
         """Retrieve and display details of a specific cipher policy
         
         Input:
             - template_id: String containing policy template ID
         
         Output:
-            - Prints policy details to console
-            - Logs results to log file
+            - Logs policy details
+            - Dictionary containing the policy Result, None if the call fails
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for describe_cipher_policy")
-            return
+            return None
 
-        resp = self._call_sdk_method(
-            self._svc.describe_cipher_template,
-            {"TemplateId": template_id},
-            f"Successfully retrieved details for cipher policy: {template_id}"
-        )
+        policy = self._describe("cipher", template_id, f"Successfully retrieved details for cipher policy: {template_id}")
 
-        if resp:
-            logger.debug(f"Cipher policy {template_id} details: {json.dumps(resp, indent=2)}")
+        if policy is not None:
+            logger.debug("Cipher policy %s details: %s", template_id, LazyJson(policy))
         else:
             logger.warning(f"No details found for cipher policy: {template_id}")
+        return policy
 
-    def describe_rule_engine_policy(self, template_id: str) -> None:
+    def describe_rule_engine_policy(self, template_id: str) -> dict:
         """Retrieve and display details of a specific rule engine policy
         
         Input:
             - template_id: String containing policy template ID
         
         Output:
-            - Prints policy details to console
-            - Logs results to log file
+            - Logs policy details
+            - Dictionary containing the policy Result, None if the call fails
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for describe_rule_engine_policy")
-            return
+            return None
 
-        resp = self._call_sdk_method(
-            self._svc.describe_rule_engine_template,
-            {"TemplateId": template_id},
-            f"Successfully retrieved details for rule engine policy: {template_id}"
-        )
+        policy = self._describe("rule_engine", template_id, f"Successfully retrieved details for rule engine policy: {template_id}")
 
-        if resp:
-            logger.debug(f"Rule engine policy {template_id} details: {json.dumps(resp, indent=2)}")
+        if policy is not None:
+            logger.debug("Rule engine policy %s details: %s", template_id, LazyJson(policy))
         else:
             logger.warning(f"No details found for rule engine policy: {template_id}")
+        return policy
 
-    def update_cipher_template(self, template_id: str) -> None:
+    def update_cipher_template(self, template_id: str) -> bool:
         """Update an existing cipher policy
         
         Input:
@@ -321,23 +698,26 @@ class HSBCDemo:
         Output:
             - Prints update response to console
             - Logs results to log file
+            - True if the update call succeeded, False otherwise
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for update_cipher_template")
-            return
+            return False
 
         resp = self._call_sdk_method(
             self._svc.update_cipher_template,
             {"TemplateId": template_id, "Title": "revised-tpl_hsbc_sdk_cipher"},
             f"Cipher policy update initiated: {template_id}"
         )
+        self._forget_template(template_id)
 
         if resp:
             logger.info(f"Cipher policy {template_id} updated successfully")
         else:
             logger.error(f"Failed to update cipher policy: {template_id}")
+        return resp is not None
 
-    def release_policy(self, template_id: str) -> None:
+    def release_policy(self, template_id: str) -> bool:
         """Release a policy (make it active)
         
         Input:
@@ -345,18 +725,57 @@ class HSBCDemo:
         
         Output:
             - Logs release status
+            - True if the release call succeeded, False otherwise
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for release_policy")
-            return
+            return False
+        if (self._template_cache is not None and self._template_cache.skip_released
+                and self._template_cache.is_released(template_id, self.identity)
+                and self._is_released_on_server(template_id)):
+            logger.info(f"Policy already released with identical content, skipping: {template_id}")
+            return True
 
-        self._call_sdk_method(
+        resp = self._call_sdk_method(
             self._svc.release_template,
             {"TemplateId": template_id},
             f"Policy released successfully: {template_id}"
         )
+        if self._describe_cache is not None:
+            self._describe_cache.invalidate(template_id)
+        if resp is not None and self._template_cache is not None:
+            self._template_cache.mark_released(template_id, self.identity)
+        return resp is not None
+
+    def _is_released_on_server(self, template_id: str) -> bool:
+        """Check with one DescribeTemplates call that a template is released without a pending draft
+
+        Edits made in the console or by another client leave a draft that the
+        template cache's released flag knows nothing about.
+        """
+        page = self._fetch_page(self._svc.describe_templates,
+                                {"Filters": [{"Name": "TemplateId", "Value": [template_id]}]}, "Templates", 1, 1)
+        rows = (page or {}).get("Templates") or []
+        return any(row.get("TemplateId") == template_id and row.get("Status") == "released"
+                   and not row.get("HasDraft") for row in rows)
+
+    def stage_changes(self, window: float = None, waiter=None) -> "ChangeSet":
+        """Collect template updates and releases, sending one update and one release per template on commit
 
-    def delete_policy(self, template_id: str) -> None:
+        Input:
+            - window: Optional seconds after the first staged change at which
+              the changes are committed automatically
+            - waiter: Optional propagation.PropagationWaiter to wait for the
+              releases on commit
+
+        Output:
+            - staging.ChangeSet; use it as a context manager for a transaction
+        """
+        from staging import ChangeSet
+
+        return ChangeSet(self, window=window, waiter=waiter)
+
+    def delete_policy(self, template_id: str) -> bool:
         """Delete a policy
         
         Input:
@@ -364,91 +783,57 @@ class HSBCDemo:
         
         Output:
             - Logs deletion status
+            - True if the delete call succeeded, False otherwise
         """
         if not template_id:
             logger.warning("Template ID cannot be empty for delete_policy")
-            return
+            return False
 
-        self._call_sdk_method(
+        self._forget_template(template_id)
+        resp = self._call_sdk_method(
             self._svc.delete_template,
             {"TemplateId": template_id},
             f"Policy deleted successfully: {template_id}"
         )
+        return resp is not None
 
-    def create_rule_engine(self, title: str) -> str:
+    def create_rule_engine(self, title: str, prefix: str = "/stripheader/", header: str = "server") -> str:
         """Create a rule engine policy (header modification rules)
         
         Input:
             - title: String containing policy title
+            - prefix: Request path prefix the rule applies to (case-insensitive)
+            - header: Response header the rule deletes
         
         Output:
             - String containing template ID if successful
             - None if creation fails
         """
-        # Initialize rule object
-        rule = Rule()
-        rule.desc = self._message
-        logger.debug("Initialized rule engine object")
-        
-        # Define condition: match paths starting with /stripheader/
-        rule.if_block.condition = Condition({
-            "IsGroup": True,
-            "Connective": Const.ConnectiveAnd,
-            "ConditionGroups": [
-                {
-                    "IsGroup": True,
-                    "Connective": Const.ConnectiveAnd,
-                    "ConditionGroups": [
-                        {
-                            "IsGroup": False,
-                            "Connective": Const.ConnectiveAnd,
-                            "Condition": {
-                                "Object": Const.ConditionHTTPPath,
-                                "Operator": Const.OperatorPrefixMatch,
-                                "IgnoreCase": True,
-                                "Value": ["/stripheader/"]
-                            }
-                        }
-                    ]
-                }
-            ]
-        })
-        logger.debug("Rule engine condition defined")
-        
-        # Define action: delete "server" response header
-        rule.if_block.actions.append(Action({
-            "Action": Const.ActionResponseHeader,
-            "Groups": [
-                {
-                    "Dimension": Const.ActionResponseHeader,
-                    "GroupParameters": [
-                        {
-                            "Parameters": [
-                                {"Name": "action", "Values": [Const.Delete]},
-                                {"Name": "header_name", "Values": ["server"]}
-                            ]
-                        }
-                    ]
-                }
-            ]
-        }))
-        logger.debug("Rule engine action defined")
+        from rule_builder import strip_response_header
+
+        # Condition: paths starting with prefix; action: delete the response header.
+        # The encoded rule is cached by content, so repeated rules skip the build.
+        body = {
+            "Project": "default",
+            "Title": title,
+            "Message": f"{self._message}: delete response header {header}",
+            "Rule": strip_response_header(prefix, header, desc=self._message)
+        }
+        template_id = self._cached_template_id("rule_engine", body)
+        if template_id:
+            return template_id
 
         # Call SDK to create rule engine policy
         resp = self._call_sdk_method(
             self._svc.create_rule_engine_template,
-            {
-                "Project": "default",
-                "Title": title,
-                "Message": f"{self._message}: delete response header server",
-                "Rule": rule.encode_to_string()
-            },
+            body,
             f"Rule engine policy creation initiated: {title}"
         )
 
         # Extract and return template ID if successful
         if resp and "Result" in resp and "TemplateId" in resp["Result"]:
             template_id = resp["Result"]["TemplateId"]
+            self._remember_template("rule_engine", body, template_id)
             logger.info(f"Rule engine policy created successfully: {template_id}")
             return template_id
         
@@ -456,60 +841,119 @@ class HSBCDemo:
         return None
 
 
+def build_provisioning_workflow(demo: HSBCDemo, domain: str, max_workers: int = 4, journal=None,
+                                waiter=None) -> DagExecutor:
+    """Build the demo provisioning workflow as a dependency graph
+
+    The cipher, rule engine and delivery template branches are independent
+    and run concurrently; only the domain binding waits for all three.
+
+    Input:
+        - demo: Initialized HSBCDemo client
+        - domain: Domain to bind to the new templates
+        - max_workers: Upper bound on concurrently running steps
+        - journal: Optional journal.Journal; mutating steps completed by an
+          earlier, interrupted run for the same domain and account/endpoint
+          (demo.identity) are then not executed again
+        - waiter: Optional propagation.PropagationWaiter; each release step
+          then waits until its template is active, and a final
+          domain_online step waits for the domain
+
+    Output:
+        - DagExecutor ready to run()
+    """
+    dag = DagExecutor(max_workers=max_workers, journal=journal, run_id=f"provision:{demo.identity}:{domain}")
+    dag.add_step("list_cdn_domains", lambda _: demo.list_cdn_domains(), journaled=False)
+
+    branches = (
+        ("cipher", "tpl_hsbc_sdk_cipher", demo.create_cipher_policy, demo.describe_cipher_policy),
+        ("rule_engine", "tpl_hsbc_sdk_rule_engine", demo.create_rule_engine, demo.describe_rule_engine_policy),
+        ("delivery_policy", "tpl_hsbc_sdk_delivery_policy", demo.create_delivery_policy, demo.describe_delivery_policy),
+    )
+    for kind, title, create, describe in branches:
+        create_step, release_step = f"create_{kind}", f"release_{kind}"
+        dag.add_step(
+            create_step,
+            lambda _, create=create, title=title: require(create(title=title), f"Failed to create {title}")
+        )
+        dag.add_step(
+            release_step,
+            lambda deps, create_step=create_step: _await_template(waiter, require(
+                demo.release_policy(template_id=deps[create_step]) and deps[create_step],
+                f"Failed to release {deps[create_step]}"
+            )),
+            depends_on=[create_step]
+        )
+        dag.add_step(
+            f"describe_{kind}",
+            lambda deps, describe=describe, release_step=release_step: describe(template_id=deps[release_step]),
+            depends_on=[release_step],
+            journaled=False
+        )
+
+    dag.add_step(
+        "create_domain",
+        lambda deps: require(
+            demo.create_domain(
+                domain=domain,
+                id_rule=deps["release_rule_engine"],
+                id_delivery=deps["release_delivery_policy"],
+                id_cipher=deps["release_cipher"]
+            ),
+            f"Failed to create domain {domain}"
+        ),
+        depends_on=["release_cipher", "release_rule_engine", "release_delivery_policy"]
+    )
+    if waiter is not None:
+        dag.add_step(
+            "domain_online",
+            lambda _: waiter.wait_domain(domain).result()["Status"],
+            depends_on=["create_domain"],
+            journaled=False
+        )
+    return dag
+
+
+def _await_template(waiter, template_id: str) -> str:
+    """Block until a released template is active (no-op without a waiter)"""
+    if waiter is not None:
+        waiter.wait_template(template_id).result()
+    return template_id
+
+
 if __name__ == '__main__':
+    configure_logging()
     try:
         logger.info("Starting HSBC CDN Demo..")
         # Initialize CDN demo client
         byteplus_cdn_sdk = HSBCDemo()
-        
-        # List all CDN domains
-        logger.info(f"..............................................................")  
-        byteplus_cdn_sdk.list_cdn_domains()
-
-        # Create and manage cipher policy
-        title_tpl_cipher = 'tpl_hsbc_sdk_cipher'
-        logger.info(f"..............................................................")   
-        logger.info(f"Starting creation of cipher policy: {title_tpl_cipher}")
-        id_tpl_cipher = byteplus_cdn_sdk.create_cipher_policy(title=title_tpl_cipher)
-        if id_tpl_cipher:
-            byteplus_cdn_sdk.release_policy(template_id=id_tpl_cipher)
-            # byteplus_cdn_sdk.update_cipher_template(template_id=id_tpl_cipher)  # Uncomment to test update
-            byteplus_cdn_sdk.describe_cipher_policy(template_id=id_tpl_cipher)
-            # byteplus_cdn_sdk.delete_policy(template_id=id_tpl_cipher)  # Uncomment to test deletion
-
-        # Create and manage rule engine policy
-        title_tpl_rule_engine = 'tpl_hsbc_sdk_rule_engine'
-        logger.info(f"..............................................................")   
-        logger.info(f"Starting creation of rule engine policy: {title_tpl_rule_engine}")
-        id_tpl_rule_engine = byteplus_cdn_sdk.create_rule_engine(title=title_tpl_rule_engine)
-        if id_tpl_rule_engine:
-            byteplus_cdn_sdk.release_policy(template_id=id_tpl_rule_engine)
-            byteplus_cdn_sdk.describe_rule_engine_policy(template_id=id_tpl_rule_engine)
-            # byteplus_cdn_sdk.delete_policy(template_id=id_tpl_rule_engine)  # Uncomment to test deletion
-
-        # Create and manage delivery policy
-        title_tpl_delivery_policy = 'tpl_hsbc_sdk_delivery_policy'   
-        logger.info(f"..............................................................")   
-        logger.info(f"Starting creation of delivery policy: {title_tpl_delivery_policy}")
-        id_tpl_delivery_policy = byteplus_cdn_sdk.create_delivery_policy(title=title_tpl_delivery_policy)
-        if id_tpl_delivery_policy:
-            byteplus_cdn_sdk.release_policy(template_id=id_tpl_delivery_policy)
-            byteplus_cdn_sdk.describe_delivery_policy(template_id=id_tpl_delivery_policy)
-            # byteplus_cdn_sdk.delete_policy(template_id=id_tpl_delivery_policy)  # Uncomment to test deletion
 
+        # Create, release and bind the cipher, rule engine and delivery templates.
+        # Independent branches run concurrently; the domain waits for all three.
+        # byteplus_cdn_sdk.update_cipher_template(template_id=...)  # Call to test update
+        # byteplus_cdn_sdk.delete_policy(template_id=...)  # Call to test deletion
         domain = "hsbc-demo-sdk.security.lcyice.top"
-        logger.info(f"..............................................................")  
-        logger.info(f"Starting creation new domain: {domain}")
-        byteplus_cdn_sdk.create_domain(
-            domain=domain,
-            id_rule=id_tpl_rule_engine,
-            id_delivery=id_tpl_delivery_policy,
-            id_cipher=id_tpl_cipher
-        )   
-        
         logger.info(f"..............................................................")
+        logger.info(f"Starting provisioning workflow for domain: {domain}")
+        # Completed steps are journaled, so a rerun after a crash resumes instead of starting over
+        from journal import Journal
+
+        journal = Journal()
+        try:
+            results = build_provisioning_workflow(byteplus_cdn_sdk, domain, journal=journal).run()
+        finally:
+            journal.close()
+        logger.info(f"..............................................................")
+
+        for step, row in results.items():
+            logger.info(f"{step}: {row['Status']} {row['Error'] or ''}")
+        if any(row["Status"] != STATUS_SUCCEEDED for row in results.values()):
+            sys.exit(1)
 
-        
     except Exception as e:
         logger.error(f"Script failed: {str(e)}", exc_info=True)
         sys.exit(1)
+    finally:
+        # Prometheus text dump of SDK call metrics, e.g. for the node_exporter textfile collector
+        if os.environ.get("HSBC_DEMO_METRICS_FILE"):
+            metrics.REGISTRY.write_textfile(os.environ["HSBC_DEMO_METRICS_FILE"])
@@ -5,7 +5,67 @@ HSBC Demo Delivery Policy JSON Template
 This file defines the JSON configuration for delivery policy in a clear,
 efficient and professional format. The configuration is stored as a Python
 multi-line string for direct consumption or further serialization.
+
+The string is parsed once at import into `delivery_policy_template`, a
+frozen structure (FrozenDict / tuple). Per-policy variants are built with
+`overlay()`, which copies only the dicts along changed paths and shares
+every untouched subtree (Cache rules, CustomErrorPage, ...) with the base.
 """
+import json
+from collections.abc import Mapping
+
+
+class FrozenDict(dict):
+    """Read-only dict; still a dict subclass so json.dumps and the SDK accept it"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is immutable, use overlay() to derive a variant")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # Default dict pickling replays __setitem__; rebuild from a plain dict instead
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value):
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, Mapping):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def overlay(base: Mapping, changes: Mapping) -> FrozenDict:
+    """Derive a frozen variant of base with changes applied (copy-on-write)
+
+    Input:
+        - base: Frozen mapping, e.g. delivery_policy_template
+        - changes: Mapping of fields to set; nested mappings are merged
+          into the corresponding base mapping instead of replacing it
+
+    Output:
+        - New FrozenDict sharing every unchanged subtree with base
+    """
+    merged = dict(base)
+    for key, value in changes.items():
+        current = merged.get(key)
+        if isinstance(value, Mapping) and isinstance(current, Mapping):
+            merged[key] = overlay(current, value)
+        else:
+            merged[key] = freeze(value)
+    return FrozenDict(merged)
+
 
 json_delivery_policy = """
 {
@@ -282,4 +342,7 @@ json_delivery_policy = """
     "Switch": true
   }
 }
-"""
\ No newline at end of file
+"""
+
+# Parsed once at import; never mutate, derive variants with overlay()
+delivery_policy_template = freeze(json.loads(json_delivery_policy))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Inventory Index
+
+In-memory index of the account's domains and their template bindings,
+built from one paginated DescribeTemplateDomains pass, so questions like
+"which domains use template X" are dictionary lookups instead of an API
+call per template:
+
+    - template ID -> domains bound to it (service, cipher or rule engine)
+    - CNAME -> domain
+    - status -> domains
+
+refresh() lists the domains (ListCdnDomains, one call per page) and only
+re-fetches the bindings of domains that are new or whose UpdateTime
+changed; domains no longer listed are dropped. A listing that fails
+part-way leaves the index untouched.
+
+Usage:
+    inventory = InventoryIndex()
+    demo = HSBCDemo(inventory=inventory)
+    inventory.load(demo)
+    inventory.domains_for_template("tpl-...")
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Row fields holding the template IDs a domain is bound to
+TEMPLATE_FIELDS = ("ServiceTemplateId", "CipherTemplateId", "RuleTemplateIds")
+
+
+def template_ids(row: dict) -> set:
+    """All template IDs a DescribeTemplateDomains row is bound to"""
+    ids = set()
+    for field in TEMPLATE_FIELDS:
+        value = row.get(field)
+        if isinstance(value, (list, tuple)):
+            ids.update(item for item in value if item)
+        elif value:
+            ids.add(value)
+    return ids
+
+
+class InventoryIndex:
+    def __init__(self, page_size: int = 100):
+        """Create an empty index; fill it with load()
+
+        Input:
+            - page_size: Items requested per list call (also the batch size
+              of the bindings re-fetched by refresh())
+        """
+        self._page_size = page_size
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._by_template = {}
+        self._by_cname = {}
+        self._by_status = {}
+        self.loaded = False
+
+    def _list(self, demo, method, body: dict) -> list:
+        """All items of a paginated list API, or None if any page failed"""
+        items, page_num = [], 1
+        while True:
+            page = demo._fetch_page(method, body, "Data", page_num, self._page_size)
+            if page is None:
+                logger.warning(f"Inventory listing {method.__name__} failed at page {page_num}")
+                return None
+            rows = page["Data"] or []
+            items.extend(rows)
+            total = page.get("Total")
+            if len(rows) < self._page_size or (total is not None and len(items) >= total):
+                return items
+            page_num += 1
+
+    def _add(self, row: dict) -> None:
+        domain = row["Domain"]
+        self._rows[domain] = row
+        for template_id in template_ids(row):
+            self._by_template.setdefault(template_id, set()).add(domain)
+        if row.get("Cname"):
+            self._by_cname[row["Cname"]] = domain
+        self._by_status.setdefault(row.get("Status"), set()).add(domain)
+
+    def _remove(self, domain: str) -> None:
+        row = self._rows.pop(domain, None)
+        if row is None:
+            return
+        for template_id in template_ids(row):
+            domains = self._by_template.get(template_id)
+            if domains is not None:
+                domains.discard(domain)
+                if not domains:
+                    del self._by_template[template_id]
+        if self._by_cname.get(row.get("Cname")) == domain:
+            del self._by_cname[row["Cname"]]
+        domains = self._by_status.get(row.get("Status"))
+        if domains is not None:
+            domains.discard(domain)
+            if not domains:
+                del self._by_status[row.get("Status")]
+
+    def _upsert(self, row: dict) -> None:
+        self._remove(row["Domain"])
+        self._add(dict(row))
+
+    def load(self, demo) -> bool:
+        """(Re)build the index from a full DescribeTemplateDomains listing
+
+        Input:
+            - demo: HSBCDemo used for the API calls
+
+        Output:
+            - True if loaded, False if the listing failed (index unchanged)
+        """
+        rows = self._list(demo, demo._svc.describe_template_domains, {})
+        if rows is None:
+            return False
+        with self._lock:
+            self._rows, self._by_template, self._by_cname, self._by_status = {}, {}, {}, {}
+            for row in rows:
+                self._add(dict(row))
+            self.loaded = True
+        logger.info(f"Inventory loaded: {len(rows)} domains, {len(self._by_template)} templates")
+        return True
+
+    def refresh_domains(self, demo, domains) -> bool:
+        """Re-fetch the bindings of specific domains (dropping the ones that no longer exist)
+
+        Output:
+            - True if every batch was fetched
+        """
+        domains = list(dict.fromkeys(domains))
+        ok = True
+        for start in range(0, len(domains), self._page_size):
+            batch = domains[start:start + self._page_size]
+            body = {"Filters": [{"Name": "Domain", "Value": batch}]}
+            rows = self._list(demo, demo._svc.describe_template_domains, body)
+            if rows is None:
+                ok = False
+                continue
+            with self._lock:
+                found = set()
+                for row in rows:
+                    found.add(row["Domain"])
+                    self._upsert(row)
+                for domain in batch:
+                    if domain not in found:
+                        self._remove(domain)
+        return ok
+
+    def refresh(self, demo) -> dict:
+        """Incrementally bring the index up to date
+
+        Input:
+            - demo: HSBCDemo used for the API calls
+
+        Output:
+            - {"Added": [...], "Changed": [...], "Removed": [...]} domains,
+              None if the listing failed (index unchanged)
+        """
+        if not self.loaded:
+            if not self.load(demo):
+                return None
+            return {"Added": sorted(self._rows), "Changed": [], "Removed": []}
+
+        listed = self._list(demo, demo._svc.list_cdn_domains, {})
+        if listed is None:
+            return None
+
+        added, changed = [], []
+        with self._lock:
+            for row in listed:
+                current = self._rows.get(row["Domain"])
+                if current is None:
+                    added.append(row["Domain"])
+                elif current.get("UpdateTime") != row.get("UpdateTime"):
+                    changed.append(row["Domain"])
+                elif current.get("Status") != row.get("Status") or current.get("Cname") != row.get("Cname"):
+                    # Status and CNAME are in the listing itself, no need to re-fetch bindings
+                    self._upsert({**current, "Status": row.get("Status"), "Cname": row.get("Cname")})
+            removed = sorted(set(self._rows) - {row["Domain"] for row in listed})
+            for domain in removed:
+                self._remove(domain)
+
+        if added or changed:
+            self.refresh_domains(demo, added + changed)
+        logger.info(f"Inventory refreshed: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+        return {"Added": added, "Changed": changed, "Removed": removed}
+
+    def domains_for_template(self, template_id: str) -> frozenset:
+        """Domains bound to a template through any of its service, cipher or rule bindings"""
+        with self._lock:
+            return frozenset(self._by_template.get(template_id, ()))
+
+    def domain_for_cname(self, cname: str) -> str:
+        """Domain served by a CNAME, or None"""
+        return self._by_cname.get(cname)
+
+    def domains_with_status(self, status: str) -> frozenset:
+        with self._lock:
+            return frozenset(self._by_status.get(status, ()))
+
+    def get(self, domain: str) -> dict:
+        """Copy of the indexed DescribeTemplateDomains row of a domain, or None"""
+        row = self._rows.get(domain)
+        return dict(row) if row is not None else None
+
+    def __contains__(self, domain: str) -> bool:
+        return domain in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Checkpoint Journal
+
+Append-only JSON-lines journal of completed workflow steps, so a
+provisioning run that dies halfway resumes where it stopped instead of
+creating and releasing its templates again. Every record is flushed and
+fsync'ed before the next step can depend on it; a line torn by a crash is
+ignored on replay.
+
+Records:
+    {"Run": "provision:<account>@<host>:example.com", "Step": "create_cipher", "Result": "tpl-...", "Time": ...}
+    {"Run": "provision:<account>@<host>:example.com", "Closed": true, "Time": ...}
+
+Run ids include the client identity (HSBCDemo.identity), so template IDs of
+one account or backend are never resumed against another. Only mutating
+steps are recorded; read-only steps run again on resume.
+
+A run is closed once all of its steps succeeded; the next run with the
+same id starts from scratch. A step whose API call succeeded but whose
+record was not yet written when the process died is executed again.
+
+Usage:
+    journal = Journal("hsbc_demo_journal.jsonl")
+    build_provisioning_workflow(demo, domain, journal=journal).run()
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = "hsbc_demo_journal.jsonl"
+
+
+class Journal:
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        """Open (or create) a journal and replay it
+
+        Input:
+            - path: Journal file; appended to, never rewritten except by compact()
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._open = {}
+        self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() and not _ends_with_newline(path):
+            # Terminate a torn last record so the next one starts on its own line
+            self._file.write("\n")
+
+    def _replay(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring torn journal record at {self._path}:{number}")
+                    continue
+                if record.get("Closed"):
+                    self._open.pop(record["Run"], None)
+                else:
+                    self._open.setdefault(record["Run"], {})[record["Step"]] = record.get("Result")
+
+    def _append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def completed(self, run_id: str) -> dict:
+        """Steps of an unfinished run recorded as done: {step: result}"""
+        with self._lock:
+            return dict(self._open.get(run_id, {}))
+
+    def record(self, run_id: str, step: str, result) -> bool:
+        """Durably record a completed step
+
+        Output:
+            - False (and nothing written) if result is not JSON-serializable;
+              the step will then run again on resume
+        """
+        try:
+            self._append({"Run": run_id, "Step": step, "Result": result, "Time": time.time()})
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Step {step} of {run_id} not journaled, result is not serializable: {str(e)}")
+            return False
+        with self._lock:
+            self._open.setdefault(run_id, {})[step] = result
+        return True
+
+    def close_run(self, run_id: str) -> None:
+        """Mark a run finished so its steps are not replayed again"""
+        self._append({"Run": run_id, "Closed": True, "Time": time.time()})
+        with self._lock:
+            self._open.pop(run_id, None)
+
+    def compact(self) -> None:
+        """Rewrite the journal with only the records of unfinished runs (atomic replace)"""
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for run_id, steps in self._open.items():
+                    for step, result in steps.items():
+                        f.write(json.dumps({"Run": run_id, "Step": step, "Result": result, "Time": time.time()},
+                                           separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self._path)
+            self._file = open(self._path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Logging Configuration
+
+Library modules only create loggers; handlers are installed by the
+application (the __main__ block, or your own code) via configure_logging().
+Two pieces keep logging off the hot path of bulk API runs:
+    - LazyJson: defers json.dumps of request/response payloads until a
+      record is actually emitted, so disabled DEBUG costs nothing
+    - QueueHandler/QueueListener: callers only enqueue records; a
+      background thread does the file and console I/O
+"""
+import json
+import atexit
+import queue
+import logging
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_LOG_FILE = "hsbc_cdn_demo.log"
+
+_listener = None
+_stop_registered = False
+
+
+def _stop_listener() -> None:
+    """Stop whichever QueueListener is current and close its handlers (registered with atexit once)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+class LazyJson:
+    """Log argument rendered as JSON only when the record is formatted
+
+    Usage:
+        logger.debug("API response: %s", LazyJson(resp))
+    """
+    __slots__ = ("_obj", "_limit")
+
+    def __init__(self, obj, limit: int = None):
+        self._obj = obj
+        self._limit = limit
+
+    def __str__(self):
+        text = json.dumps(self._obj, indent=2)
+        if self._limit is not None and len(text) > self._limit:
+            return text[:self._limit] + "..."
+        return text
+
+
+def configure_logging(level=logging.INFO, log_file: str = DEFAULT_LOG_FILE,
+                      console: bool = True, queued: bool = True, fmt: str = DEFAULT_FORMAT):
+    """Install file/console handlers on the root logger
+
+    Input:
+        - level: Root log level
+        - log_file: Path of the log file, or None to skip file logging
+        - console: Also log to stderr
+        - queued: Route records through a queue to a background writer thread
+        - fmt: Log record format
+
+    Output:
+        - The QueueListener when queued (stopped automatically at exit), else None
+    """
+    global _listener, _stop_registered
+
+    formatter = logging.Formatter(fmt)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    _stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    if not queued:
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    from logging.handlers import QueueHandler, QueueListener
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _stop_registered:
+        atexit.register(_stop_listener)
+        _stop_registered = True
+    return _listener
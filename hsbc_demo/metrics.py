@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Metrics
+
+Dependency-free, low-overhead instrumentation of SDK calls:
+    - histograms of latency and request/response payload size per SDK method
+    - counters of errors (by kind) and retries (by reason)
+    - Prometheus text exposition, served on /metrics (serve_metrics) or
+      written atomically to a file for the node_exporter textfile
+      collector (REGISTRY.write_textfile)
+    - optional span hooks for tracing, e.g. OpenTelemetry:
+      add_span_hook(lambda name, attrs: tracer.start_as_current_span(name, attributes=attrs))
+
+Recording a call costs a few microseconds: one lock and one bisect per
+histogram. Payload size histograms are sampled (payload_sample_every)
+because sizing needs a json.dumps of request and response.
+"""
+import os
+import json
+import bisect
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *labelvalues) -> dict:
+        """{"Count", "Sum", "Buckets": {upper bound: cumulative count}} of one series"""
+        with self._lock:
+            counts, total, count = self._series.get(labelvalues, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"Count": count, "Sum": total, "Buckets": cumulative}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            labels_list = sorted(self._series)
+        for labels in labels_list:
+            snapshot = self.snapshot(*labels)
+            for bound, count in snapshot["Buckets"].items():
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {snapshot['Sum']}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {snapshot['Count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write the exposition to a file (node_exporter textfile collector)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+
+SDK_LATENCY = REGISTRY.histogram(
+    "hsbc_sdk_request_duration_seconds", "SDK call latency including retries", ("method",))
+SDK_REQUEST_BYTES = REGISTRY.histogram(
+    "hsbc_sdk_request_bytes", "JSON size of SDK request bodies (sampled)", ("method",), SIZE_BUCKETS)
+SDK_RESPONSE_BYTES = REGISTRY.histogram(
+    "hsbc_sdk_response_bytes", "JSON size of SDK responses (sampled)", ("method",), SIZE_BUCKETS)
+SDK_ERRORS = REGISTRY.counter(
+    "hsbc_sdk_errors_total", "SDK calls that failed, by error kind", ("method", "kind"))
+SDK_RETRIES = REGISTRY.counter(
+    "hsbc_sdk_retries_total", "SDK call attempts retried, by reason", ("method", "reason"))
+
+# Payload sizes need a json.dumps of request and response (~100us for a full
+# delivery policy), so only every Nth call is measured; 1 measures all, 0 none
+payload_sample_every = 16
+_calls = itertools.count()
+
+_span_hooks = []
+
+
+def add_span_hook(hook) -> None:
+    """Register hook(name, attributes) returning a context manager wrapped around every SDK call"""
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook) -> None:
+    _span_hooks.remove(hook)
+
+
+def start_spans(method: str) -> list:
+    """Enter the span of every hook for one SDK call (nothing to do without hooks)"""
+    if not _span_hooks:
+        return []
+    spans = []
+    for hook in list(_span_hooks):
+        try:
+            span = hook(f"cdn.{method}", {"sdk.method": method})
+            span.__enter__()
+            spans.append(span)
+        except Exception as e:
+            logger.debug(f"Span hook failed: {str(e)}")
+    return spans
+
+
+def end_spans(spans: list, error: BaseException = None) -> None:
+    for span in reversed(spans):
+        try:
+            if error is None:
+                span.__exit__(None, None, None)
+            else:
+                span.__exit__(type(error), error, error.__traceback__)
+        except Exception as e:
+            logger.debug(f"Span hook failed: {str(e)}")
+
+
+def _json_size(value) -> int:
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_call(method: str, duration: float, body, resp, error_kind: str = None) -> None:
+    """Record latency, payload sizes and the error (if any) of one SDK call"""
+    SDK_LATENCY.observe(duration, method)
+    if payload_sample_every and next(_calls) % payload_sample_every == 0:
+        SDK_REQUEST_BYTES.observe(_json_size(body), method)
+        if resp is not None:
+            SDK_RESPONSE_BYTES.observe(_json_size(resp), method)
+    if error_kind is not None:
+        SDK_ERRORS.inc(method, error_kind)
+
+
+def record_retry(method: str, reason: str) -> None:
+    SDK_RETRIES.inc(method, reason)
+
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+    """Serve /metrics from a daemon thread; call .shutdown() on the returned server to stop
+
+    Binds to localhost by default; pass host="0.0.0.0" to let a remote scraper in.
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics %s - " + format, self.address_string(), *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Propagation Waiter
+
+A release or domain change is accepted by the API long before it is
+active at the edge. PropagationWaiter waits for many templates and
+domains at once from a single background thread:
+
+    - wait_template() / wait_domain() return a concurrent.futures.Future
+      resolved with the object's status row once it is active
+      (template "released" without a draft, domain "online"), or failed
+      with TimeoutError
+    - status checks are batched: one DescribeTemplates or
+      DescribeTemplateDomains call with an ID filter covers up to
+      max_batch objects; spare room in a batch is filled with the objects
+      due next
+    - every object backs off on its own (exponential, with jitter), so a
+      slow rollout does not hold up the polling of fast ones
+    - all checks share one token bucket, so waiting on 500 releases costs
+      a bounded request rate and about as long as the slowest release
+
+Usage:
+    with PropagationWaiter(demo) as waiter:
+        futures = [waiter.wait_template(template_id) for template_id in released]
+        concurrent.futures.wait(futures)
+"""
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import Future, InvalidStateError, wait
+
+from resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# kind -> (SDK list method, Result key, ID field, is-active predicate)
+KINDS = {
+    "template": ("describe_templates", "Templates", "TemplateId",
+                 lambda row: row.get("Status") == "released" and not row.get("HasDraft")),
+    "domain": ("describe_template_domains", "Data", "Domain",
+               lambda row: row.get("Status") == "online"),
+}
+
+
+class _Pending:
+    __slots__ = ("kind", "key", "future", "delay", "next_check", "deadline", "started", "checks")
+
+    def __init__(self, kind: str, key: str, future: Future, delay: float, now: float, timeout: float):
+        self.kind, self.key, self.future = kind, key, future
+        self.delay = delay
+        self.next_check = now + delay
+        self.deadline = now + timeout
+        self.started = now
+        self.checks = 0
+
+
+class PropagationWaiter:
+    def __init__(self, demo, max_batch: int = 100, max_rps: float = 5.0, initial_delay: float = 1.0,
+                 max_delay: float = 30.0, backoff: float = 2.0, timeout: float = 600.0):
+        """Create a waiter; its polling thread starts with the first wait
+
+        Input:
+            - demo: HSBCDemo used for the status calls
+            - max_batch: Objects checked per list call
+            - max_rps: Upper bound on status calls per second
+            - initial_delay: Seconds before an object's first check
+            - max_delay: Upper bound of an object's backoff
+            - backoff: Factor the delay grows by after each check that
+              found the object not yet active
+            - timeout: Default seconds before a wait fails with TimeoutError
+        """
+        self._demo = demo
+        self._max_batch = max_batch
+        self._bucket = TokenBucket(max_rps)
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._backoff = backoff
+        self._timeout = timeout
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.requests = 0
+
+    def wait(self, kind: str, key: str, callback=None, timeout: float = None) -> Future:
+        """Wait for an object of any kind ("template" or "domain") to become active
+
+        Input:
+            - kind: Key of KINDS
+            - key: TemplateId or domain name
+            - callback: Optional fn(future) called when the wait finishes
+            - timeout: Seconds before the future fails with TimeoutError
+              (default: the waiter's timeout)
+
+        Output:
+            - Future resolved with the status row; waiting twice on the same
+              object returns the same future
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind {kind!r}, expected one of {', '.join(KINDS)}")
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("PropagationWaiter is closed")
+            pending = self._pending.get((kind, key))
+            if pending is None:
+                pending = _Pending(kind, key, Future(), self._initial_delay, time.monotonic(),
+                                   self._timeout if timeout is None else timeout)
+                self._pending[(kind, key)] = pending
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="propagation-waiter", daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+        if callback is not None:
+            pending.future.add_done_callback(callback)
+        return pending.future
+
+    def wait_template(self, template_id: str, callback=None, timeout: float = None) -> Future:
+        """Wait until a released template is active"""
+        return self.wait("template", template_id, callback, timeout)
+
+    def wait_domain(self, domain: str, callback=None, timeout: float = None) -> Future:
+        """Wait until a new or rebound domain is online"""
+        return self.wait("domain", domain, callback, timeout)
+
+    def _next_batches(self, now: float) -> list:
+        """[(kind, [pending])] of the due objects, topped up with the ones due next (under the lock)"""
+        batches = []
+        for kind in KINDS:
+            queued = sorted((p for p in self._pending.values() if p.kind == kind), key=lambda p: p.next_check)
+            due = sum(1 for p in queued if p.next_check <= now or p.deadline <= now)
+            if not due:
+                continue
+            size = -(-due // self._max_batch) * self._max_batch
+            queued = queued[:size]
+            batches.extend((kind, queued[start:start + self._max_batch])
+                           for start in range(0, len(queued), self._max_batch))
+        return batches
+
+    def _check(self, kind: str, keys: list) -> dict:
+        """{key: status row} of one batch, None if the call failed"""
+        method_name, result_key, id_field, _ = KINDS[kind]
+        self._bucket.acquire()
+        self.requests += 1
+        body = {"Filters": [{"Name": id_field, "Value": keys}]}
+        page = self._demo._fetch_page(getattr(self._demo._svc, method_name), body, result_key, 1, len(keys))
+        if page is None:
+            return None
+        return {row.get(id_field): row for row in page[result_key] or []}
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._pending and min(min(p.next_check, p.deadline) for p in self._pending.values()) <= now:
+                        break
+                    timeout = (min(min(p.next_check, p.deadline) for p in self._pending.values()) - now
+                               if self._pending else None)
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                batches = self._next_batches(time.monotonic())
+
+            for kind, batch in batches:
+                rows = self._check(kind, [p.key for p in batch])
+                self._resolve(kind, batch, rows or {})
+
+    def _resolve(self, kind: str, batch: list, rows: dict) -> None:
+        is_active = KINDS[kind][3]
+        now = time.monotonic()
+        done = []
+        with self._condition:
+            for pending in batch:
+                if self._pending.get((kind, pending.key)) is not pending:
+                    continue
+                row = rows.get(pending.key)
+                pending.checks += 1
+                if pending.future.cancelled():
+                    del self._pending[(kind, pending.key)]
+                elif row is not None and is_active(row):
+                    del self._pending[(kind, pending.key)]
+                    done.append((pending, row, None))
+                elif pending.deadline <= now:
+                    del self._pending[(kind, pending.key)]
+                    status = row.get("Status") if row is not None else "not found"
+                    done.append((pending, None, TimeoutError(
+                        f"{kind} {pending.key} not active after {now - pending.started:.1f}s (status: {status})")))
+                elif pending.next_check <= now:
+                    # Only objects that were due back off; the ones topping up the batch keep their schedule
+                    pending.delay = min(pending.delay * self._backoff, self._max_delay)
+                    pending.next_check = now + random.uniform(pending.delay / 2, pending.delay)
+        for pending, row, error in done:
+            try:
+                if error is None:
+                    logger.info(f"{kind} {pending.key} active after {now - pending.started:.1f}s "
+                                f"({pending.checks} checks)")
+                    pending.future.set_result(row)
+                else:
+                    logger.warning(str(error))
+                    pending.future.set_exception(error)
+            except InvalidStateError:  # Cancelled meanwhile
+                pass
+
+    @property
+    def pending(self) -> int:
+        """Number of objects still being waited on"""
+        with self._condition:
+            return len(self._pending)
+
+    def close(self) -> None:
+        """Stop polling and cancel the waits still pending"""
+        with self._condition:
+            self._closed = True
+            pending, self._pending = list(self._pending.values()), {}
+            self._condition.notify()
+        for item in pending:
+            item.future.cancel()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    from fake_cdn import FakeCDNBackend, FakeCDNService
+    from hsbc_demo import HSBCDemo
+    from log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Wait for many releases to propagate against the fake CDN API")
+    parser.add_argument("--templates", type=int, default=500, help="Templates to create, release and wait for")
+    parser.add_argument("--propagation-delay", type=float, default=2.0, help="Base propagation seconds")
+    parser.add_argument("--propagation-jitter", type=float, default=8.0, help="Random extra propagation seconds")
+    parser.add_argument("--max-rps", type=float, default=5.0, help="Status calls per second")
+    parser.add_argument("--max-batch", type=int, default=100, help="Objects per status call")
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING, log_file=None)
+    backend = FakeCDNBackend(propagation_delay=args.propagation_delay, propagation_jitter=args.propagation_jitter)
+    demo = HSBCDemo(svc=FakeCDNService(backend))
+    released = []
+    for number in range(args.templates):
+        template_id = demo.create_cipher_policy(f"propagation-{number}")
+        if demo.release_policy(template_id):
+            released.append(template_id)
+
+    started = time.perf_counter()
+    with PropagationWaiter(demo, max_batch=args.max_batch, max_rps=args.max_rps) as waiter:
+        futures = [waiter.wait_template(template_id) for template_id in released]
+        wait(futures)
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for future in futures if future.exception() is not None)
+    slowest = args.propagation_delay + args.propagation_jitter
+    print(f"{len(futures)} templates active in {elapsed:.1f}s (slowest possible {slowest:.1f}s), "
+          f"{failed} failed, {waiter.requests} status calls ({waiter.requests / elapsed:.1f}/s)")
+    sys.exit(1 if failed else 0)
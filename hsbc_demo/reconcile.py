@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Desired-State Reconciler
+
+Reads the desired templates and domains from a JSON file, fetches the
+current state, computes a structural diff and issues only the create,
+update, release, rebind and (optionally) delete calls needed to converge.
+A rerun with nothing changed makes zero mutating calls.
+
+Templates are identified by (Kind, Title). Every template written by the
+reconciler carries a fingerprint of its desired body in Message, so on a
+rerun unchanged templates are recognised from the paginated template
+listing alone, without one describe call per template. Edits made outside
+the reconciler keep the old fingerprint; use --verify to describe and diff
+every desired template regardless.
+
+Desired state file:
+    {
+      "Templates": [
+        {"Kind": "cipher", "Title": "tpl_cipher", "Body": {...}},
+        {"Kind": "service", "Title": "tpl_delivery", "Base": "delivery_policy", "Body": {...}}
+      ],
+      "Domains": [
+        {"Domain": "a.example.com", "ServiceTemplate": "tpl_delivery",
+         "CipherTemplate": "tpl_cipher", "RuleTemplate": "tpl_rule"}
+      ],
+      "Prune": false
+    }
+
+"Base": "delivery_policy" overlays Body on the base template from
+hsbc_demo_json. With "Prune": true, templates previously written by the
+reconciler that are no longer desired are deleted. Domains are never deleted.
+
+Usage:
+    python reconcile.py desired_state.json [--dry-run] [--verify]
+"""
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from hsbc_demo_json import delivery_policy_template, overlay
+
+logger = logging.getLogger(__name__)
+
+BASE_TEMPLATES = {"delivery_policy": delivery_policy_template}
+
+# Server-managed or identity fields that never count as a difference
+IGNORED_FIELDS = frozenset(("TemplateId", "Title", "Message", "Type", "Status", "HasDraft",
+                            "CreateTime", "UpdateTime", "BoundDomains", "Project"))
+
+RELEASED = "released"
+
+FINGERPRINT_RE = re.compile(r"\[reconcile:([0-9a-f]{16})\]")
+
+# Plan operations, in execution order
+OP_CREATE = "create"
+OP_UPDATE = "update"
+OP_RELEASE = "release"
+OP_ADD_DOMAIN = "add_domain"
+OP_REBIND_DOMAIN = "rebind_domain"
+OP_DELETE = "delete"
+
+
+def load_desired_state(path: str) -> dict:
+    """Load and validate a desired state file
+
+    Output:
+        - Dict with Templates (bodies resolved against their Base), Domains and Prune
+    """
+    with open(path) as f:
+        state = json.load(f)
+
+    templates = {}
+    for spec in state.get("Templates", []):
+        kind, title = spec.get("Kind"), spec.get("Title")
+        if not kind or not title:
+            raise ValueError(f"Template entries need Kind and Title: {spec}")
+        if (kind, title) in templates:
+            raise ValueError(f"Duplicate desired template: {kind}/{title}")
+        body = spec.get("Body") or {}
+        if spec.get("Base"):
+            if spec["Base"] not in BASE_TEMPLATES:
+                raise ValueError(f"Unknown Base template {spec['Base']} for {title}")
+            body = overlay(BASE_TEMPLATES[spec["Base"]], body)
+        templates[(kind, title)] = {"Kind": kind, "Title": title, "Message": spec.get("Message", ""), "Body": body}
+
+    return {"Templates": templates, "Domains": list(state.get("Domains", [])), "Prune": bool(state.get("Prune"))}
+
+
+def normalize(body: dict) -> dict:
+    """Drop identity and server-managed fields from a template body"""
+    return {key: value for key, value in body.items() if key not in IGNORED_FIELDS}
+
+
+def fingerprint(body: dict) -> str:
+    """Stable content hash of a normalized template body"""
+    canonical = json.dumps(normalize(body), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def diff(desired, current, path: str = "") -> list:
+    """Structural diff restricted to the fields present in desired
+
+    Output:
+        - List of dotted paths whose desired value differs from current
+    """
+    if isinstance(desired, dict) and isinstance(current, dict):
+        changed = []
+        for key, value in desired.items():
+            changed.extend(diff(value, current.get(key), f"{path}.{key}" if path else key))
+        return changed
+    if isinstance(desired, (list, tuple)) and isinstance(current, (list, tuple)):
+        if len(desired) != len(current):
+            return [path]
+        return [path] if any(diff(d, c) for d, c in zip(desired, current)) else []
+    return [] if desired == current else [path]
+
+
+class Reconciler:
+    def __init__(self, demo, max_workers: int = 16):
+        """Desired-state reconciler driving an HSBCDemo client
+
+        Input:
+            - demo: Initialized HSBCDemo client
+            - max_workers: Concurrency for describe calls and for each apply phase
+        """
+        self._demo = demo
+        self._max_workers = max_workers
+
+    def fetch_current(self, desired: dict, verify: bool = False) -> dict:
+        """Fetch the current templates and domain bindings
+
+        Input:
+            - desired: State returned by load_desired_state
+            - verify: Describe every desired template, even with a matching fingerprint
+
+        Output:
+            - Dict with Templates ((kind, title) -> summary, plus Body when it
+              had to be described) and Domains (name -> binding)
+        """
+        started = time.perf_counter()
+        templates = {}
+        for summary in self._demo.iter_templates():
+            key = (summary.get("Type"), summary.get("Title"))
+            previous = templates.get(key)
+            if previous is not None:
+                logger.warning(f"Duplicate template title {key[0]}/{key[1]}: "
+                               f"{previous['TemplateId']} and {summary['TemplateId']}, using the newest")
+                if (previous.get("UpdateTime") or 0) >= (summary.get("UpdateTime") or 0):
+                    continue
+            templates[key] = dict(summary)
+
+        # Only desired templates without a matching fingerprint need a describe call
+        to_describe = []
+        for key, spec in desired["Templates"].items():
+            current = templates.get(key)
+            if current is None:
+                continue
+            match = FINGERPRINT_RE.search(current.get("Message") or "")
+            if verify or not match or match.group(1) != fingerprint(spec["Body"]):
+                to_describe.append(key)
+
+        if to_describe:
+            with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="reconcile_fetch") as pool:
+                bodies = pool.map(lambda key: self._demo.describe_template(key[0], templates[key]["TemplateId"]),
+                                  to_describe)
+                for key, body in zip(to_describe, bodies):
+                    templates[key]["Body"] = body
+
+        domains = {}
+        if desired["Domains"]:
+            domains = {row["Domain"]: row for row in self._demo.iter_template_domains()}
+
+        logger.info(f"Fetched current state in {time.perf_counter() - started:.2f}s: "
+                    f"{len(templates)} templates ({len(to_describe)} described), {len(domains)} domains")
+        return {"Templates": templates, "Domains": domains}
+
+    def plan(self, desired: dict, current: dict) -> list:
+        """Compute the minimal list of operations to reach the desired state
+
+        Output:
+            - List of operation dicts with Op, Kind/Title or Domain, and Changes
+        """
+        ops = []
+        for key, spec in desired["Templates"].items():
+            kind, title = key
+            existing = current["Templates"].get(key)
+            if existing is None:
+                ops.append({"Op": OP_CREATE, "Kind": kind, "Title": title, "Changes": ["*"]})
+                ops.append({"Op": OP_RELEASE, "Kind": kind, "Title": title})
+                continue
+
+            # Body is only present when the fingerprint did not match and it was described
+            changes = []
+            if "Body" in existing:
+                if existing["Body"] is None:
+                    logger.warning(f"Could not describe {kind}/{title}, leaving it untouched")
+                    continue
+                changes = diff(normalize(spec["Body"]), existing["Body"])
+            if changes:
+                ops.append({"Op": OP_UPDATE, "Kind": kind, "Title": title,
+                            "TemplateId": existing["TemplateId"], "Changes": changes})
+            if changes or existing.get("Status") != RELEASED or existing.get("HasDraft"):
+                ops.append({"Op": OP_RELEASE, "Kind": kind, "Title": title, "TemplateId": existing["TemplateId"]})
+
+        for spec in desired["Domains"]:
+            wanted = {
+                "ServiceTemplateId": ("service", spec.get("ServiceTemplate")),
+                "CipherTemplateId": ("cipher", spec.get("CipherTemplate")),
+                "RuleTemplateIds": ("rule_engine", spec.get("RuleTemplate")),
+            }
+            binding = current["Domains"].get(spec["Domain"])
+            if binding is None:
+                ops.append({"Op": OP_ADD_DOMAIN, "Domain": spec["Domain"], "Templates": wanted})
+                continue
+            changes = []
+            for field, (kind, title) in wanted.items():
+                existing = current["Templates"].get((kind, title))
+                if existing is None:
+                    changes.append(field)
+                    continue
+                bound = binding.get(field)
+                bound = bound if isinstance(bound, list) else [bound]
+                if existing["TemplateId"] not in bound:
+                    changes.append(field)
+            if changes:
+                ops.append({"Op": OP_REBIND_DOMAIN, "Domain": spec["Domain"], "Templates": wanted, "Changes": changes})
+
+        if desired["Prune"]:
+            for key, existing in current["Templates"].items():
+                if key not in desired["Templates"] and FINGERPRINT_RE.search(existing.get("Message") or ""):
+                    ops.append({"Op": OP_DELETE, "Kind": key[0], "Title": key[1], "TemplateId": existing["TemplateId"]})
+
+        order = [OP_CREATE, OP_UPDATE, OP_RELEASE, OP_ADD_DOMAIN, OP_REBIND_DOMAIN, OP_DELETE]
+        ops.sort(key=lambda op: order.index(op["Op"]))
+        return ops
+
+    def apply(self, desired: dict, ops: list, current: dict = None) -> list:
+        """Execute a plan phase by phase; operations within a phase run concurrently
+
+        Input:
+            - desired: State returned by load_desired_state
+            - ops: Plan returned by plan()
+            - current: State returned by fetch_current; domains are bound to
+              its templates when the plan does not touch them
+
+        Output:
+            - List of result rows with Op, Target, Success and Error
+        """
+        ids = {key: existing["TemplateId"] for key, existing in ((current or {}).get("Templates") or {}).items()
+               if existing.get("TemplateId")}
+        for op in ops:
+            if op.get("TemplateId"):
+                ids[(op["Kind"], op["Title"])] = op["TemplateId"]
+        failed_templates = set()
+
+        def _template_body(op):
+            spec = desired["Templates"][(op["Kind"], op["Title"])]
+            message = f"{spec['Message']} [reconcile:{fingerprint(spec['Body'])}]".strip()
+            return {**spec["Body"], "Title": op["Title"], "Message": message}
+
+        def _resolve(templates):
+            resolved = {}
+            for field, key in templates.items():
+                if key in failed_templates or key not in ids:
+                    raise ValueError(f"Template {key[0]}/{key[1]} is unavailable")
+                resolved[field] = ids[key]
+            return resolved
+
+        def _run(op):
+            target = op.get("Domain") or f"{op['Kind']}/{op['Title']}"
+            try:
+                if op["Op"] == OP_CREATE:
+                    template_id = self._demo.create_template(op["Kind"], _template_body(op))
+                    ok = template_id is not None
+                    if ok:
+                        ids[(op["Kind"], op["Title"])] = template_id
+                elif op["Op"] == OP_UPDATE:
+                    ok = self._demo.update_template(op["Kind"], op["TemplateId"], _template_body(op))
+                elif op["Op"] == OP_RELEASE:
+                    key = (op["Kind"], op["Title"])
+                    ok = key not in failed_templates and self._demo.release_policy(ids.get(key))
+                elif op["Op"] == OP_DELETE:
+                    ok = self._demo.delete_policy(op["TemplateId"])
+                else:
+                    resolved = _resolve(op["Templates"])
+                    call = self._demo.create_domain if op["Op"] == OP_ADD_DOMAIN else self._demo.update_template_domain
+                    ok = call(op["Domain"], id_rule=resolved["RuleTemplateIds"],
+                              id_delivery=resolved["ServiceTemplateId"], id_cipher=resolved["CipherTemplateId"])
+                error = None if ok else "API call failed, see log for details"
+            except Exception as e:
+                ok, error = False, str(e)
+            if not ok and op.get("Kind"):
+                failed_templates.add((op["Kind"], op["Title"]))
+            return {"Op": op["Op"], "Target": target, "Success": bool(ok), "Error": error}
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="reconcile_apply") as pool:
+            for phase in (OP_CREATE, OP_UPDATE, OP_RELEASE, OP_ADD_DOMAIN, OP_REBIND_DOMAIN, OP_DELETE):
+                results.extend(pool.map(_run, [op for op in ops if op["Op"] == phase]))
+        return results
+
+    def reconcile(self, desired: dict, dry_run: bool = False, verify: bool = False) -> list:
+        """Fetch, diff and (unless dry_run) apply
+
+        Output:
+            - The plan when dry_run, otherwise the apply result rows
+        """
+        current = self.fetch_current(desired, verify=verify)
+        ops = self.plan(desired, current)
+        if not ops:
+            logger.info("Already in desired state, nothing to do")
+            return []
+        for op in ops:
+            target = op.get("Domain") or f"{op['Kind']}/{op['Title']}"
+            logger.info(f"Plan: {op['Op']} {target} {op.get('Changes') or ''}")
+        if dry_run:
+            return ops
+        results = self.apply(desired, ops, current)
+        failed = [row for row in results if not row["Success"]]
+        logger.info(f"Reconcile applied {len(results) - len(failed)}/{len(results)} operations")
+        return results
+
+
+if __name__ == '__main__':
+    from hsbc_demo import HSBCDemo
+    from log_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Reconcile CDN templates and domains to a desired state file")
+    parser.add_argument("desired_state", help="Path of the desired state JSON file")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    parser.add_argument("--verify", action="store_true", help="Describe and diff every template, ignoring fingerprints")
+    args = parser.parse_args()
+
+    configure_logging()
+    rows = Reconciler(HSBCDemo()).reconcile(load_desired_state(args.desired_state),
+                                            dry_run=args.dry_run, verify=args.verify)
+    if not args.dry_run and any(not row["Success"] for row in rows):
+        sys.exit(1)
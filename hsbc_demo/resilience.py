@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Resilience Layer
+
+Rate limiting, retry and circuit breaking for Byteplus OpenAPI calls:
+    - TokenBucket: per-API client-side rate limit, kept just under the quota
+    - RetryPolicy: exponential backoff with full jitter on retryable errors
+    - CircuitBreaker: fails fast while the endpoint is unhealthy
+    - Resilience: combines the three around a single SDK call
+
+Errors are classified by their ResponseMetadata.Error.Code or HTTP status,
+never by digits in the message. Throttled calls were rejected and are
+retried for every API; server errors and timeouts are retried only for
+idempotent APIs (describe/list/update/release/delete), since a create that
+timed out may still have created the template, domain or task.
+"""
+import sys
+import json
+import time
+import random
+import logging
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ResponseMetadata.Error.Code values (or their dotted sub-codes) and HTTP statuses worth retrying
+THROTTLING_CODES = ("Throttling", "TooManyRequests", "RequestLimitExceeded", "FlowLimitExceeded")
+SERVER_ERROR_CODES = ("InternalError", "InternalServiceError", "ServiceUnavailable", "InternalServiceTimeout")
+THROTTLING_STATUSES = frozenset((429,))
+SERVER_ERROR_STATUSES = frozenset((500, 502, 503, 504))
+# Reason phrases of gateway error pages, which carry no JSON error code
+THROTTLING_REASONS = ("Too Many Requests",)
+SERVER_ERROR_REASONS = ("Bad Gateway", "Service Unavailable", "Gateway Timeout", "Gateway Time-out")
+# SDK methods not resent after a server error: the failed call may have gone
+# through, and a second create/add/submit would duplicate it
+NON_IDEMPOTENT_PREFIXES = ("create_", "add_", "submit_")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+def error_details(exc: Exception) -> tuple:
+    """(error code, HTTP status) of an SDK exception, each None when unknown
+
+    The SDK raises Exception(response text), so the code is read from the JSON
+    error response; exceptions that carry .code/.status (fake_cdn) or a
+    requests .response provide them directly.
+    """
+    code = getattr(exc, "code", None)
+    status = getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if code is None:
+        try:
+            error = json.loads(str(exc))["ResponseMetadata"]["Error"]
+            code = error.get("Code")
+        except (ValueError, TypeError, KeyError, AttributeError):
+            pass
+    return code, status
+
+
+def _classify(exc: Exception, codes: tuple, statuses: frozenset, reasons: tuple) -> bool:
+    code, status = error_details(exc)
+    if status in statuses:
+        return True
+    if code:
+        return any(code == wanted or code.startswith(wanted + ".") for wanted in codes)
+    if status is None:
+        text = str(exc)
+        return any(reason in text for reason in reasons)
+    return False
+
+
+def is_throttling_error(exc: Exception) -> bool:
+    """Check whether an SDK exception reports a quota/throttling rejection"""
+    return _classify(exc, THROTTLING_CODES, THROTTLING_STATUSES, THROTTLING_REASONS)
+
+
+def is_server_error(exc: Exception) -> bool:
+    """Check whether an SDK exception is a transport or 5xx failure"""
+    # requests is only loaded by the real SDK; without it (fake_cdn) only the
+    # error response can tell, and importing it here would fail
+    module = sys.modules.get("requests.exceptions")
+    if module is not None and isinstance(exc, (module.ConnectionError, module.Timeout)):
+        return True
+    return _classify(exc, SERVER_ERROR_CODES, SERVER_ERROR_STATUSES, SERVER_ERROR_REASONS)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """Token bucket allowing `rate` calls/second with bursts up to `capacity`
+
+        Input:
+            - rate: Sustained refill rate in tokens per second
+            - capacity: Maximum burst size (defaults to one second of tokens)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available and take them
+
+        Output:
+            - Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available without waiting"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def drain(self) -> None:
+        """Empty the bucket so every caller backs off after a throttling error"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.2, max_delay: float = 10.0):
+        """Exponential backoff with full jitter
+
+        Input:
+            - max_attempts: Total attempts including the first call
+            - base_delay: Delay ceiling in seconds before the first retry
+            - max_delay: Upper bound on any single delay
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Sleep time before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Circuit breaker over consecutive endpoint failures
+
+        Input:
+            - failure_threshold: Consecutive failures that open the circuit
+            - reset_timeout: Seconds to stay open before allowing a probe call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Check whether a call may go out; admits one probe when half-open"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker closed, endpoint recovered")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class Resilience:
+    def __init__(self, rate_limits: dict = None, default_rate: float = None,
+                 retry: RetryPolicy = None, breaker: CircuitBreaker = None,
+                 non_idempotent: tuple = NON_IDEMPOTENT_PREFIXES):
+        """Resilience settings shared by every SDK call of an HSBCDemo client
+
+        Input:
+            - rate_limits: Dict mapping SDK method name (e.g. "release_template")
+              to calls/second; set these slightly below the provider quota
+            - default_rate: Calls/second for methods not in rate_limits; by
+              default those are not rate limited
+            - retry: RetryPolicy for throttling and server errors
+            - breaker: CircuitBreaker shared by all APIs of the endpoint
+            - non_idempotent: SDK method name prefixes retried after throttling
+              only, never after a server error or timeout
+        """
+        self._rate_limits = dict(rate_limits or {})
+        self._default_rate = default_rate
+        self._non_idempotent = tuple(non_idempotent)
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    def bucket(self, api: str) -> TokenBucket:
+        """Return the token bucket for an API, creating it on first use; None when not rate limited"""
+        if api in self._buckets:
+            return self._buckets[api]
+        with self._buckets_lock:
+            if api not in self._buckets:
+                rate = self._rate_limits.get(api, self._default_rate)
+                self._buckets[api] = TokenBucket(rate) if rate else None
+            return self._buckets[api]
+
+    def idempotent(self, api: str) -> bool:
+        """Check whether an SDK method may be resent after a server error"""
+        return not api.startswith(self._non_idempotent)
+
+    def call(self, api: str, method, body):
+        """Invoke method(body) under rate limit, retry and circuit breaker
+
+        Input:
+            - api: SDK method name used to pick the rate limit
+            - method: SDK method to call
+            - body: Request parameters
+
+        Output:
+            - API response
+            - Raises CircuitOpenError while the endpoint is unhealthy, or the
+              last SDK exception once retries are exhausted
+        """
+        bucket = self.bucket(api)
+        attempt = 1
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open, skipping {api}")
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                resp = method(body)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                server_error = not throttled and is_server_error(e)
+                if server_error:
+                    self.breaker.record_failure()
+                else:
+                    # Throttling and client errors say nothing about endpoint health
+                    self.breaker.record_success()
+                if throttled and bucket is not None:
+                    bucket.drain()
+                if not (throttled or server_error) or attempt >= self.retry.max_attempts:
+                    raise
+                if server_error and not self.idempotent(api):
+                    logger.warning(f"{api} failed with a server error and is not retried, "
+                                   f"it may have been applied: {str(e)}")
+                    raise
+                delay = self.retry.delay(attempt)
+                metrics.record_retry(api, "throttled" if throttled else "server_error")
+                logger.warning(f"{api} attempt {attempt} failed ({'throttled' if throttled else 'server error'}), "
+                               f"retrying in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return resp
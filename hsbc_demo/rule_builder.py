@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Rule Builder
+
+Compact builders for rule engine rules and a content-keyed cache of their
+encoded form. Building a Rule object graph and calling encode_to_string()
+is done once per distinct rule content; generating many similar rules
+(e.g. one header-stripping rule per path prefix and header) reuses the
+cached encodings.
+
+Usage:
+    rule_string = strip_response_header("/stripheader/", "server", desc="...")
+"""
+import json
+import functools
+
+from cdn_rule_engine_sdk.rule_engine.Rule import Condition, Action, Rule
+from cdn_rule_engine_sdk.rule_engine.Const import Const
+
+
+def path_prefix_condition(prefixes, ignore_case: bool = True) -> dict:
+    """Condition tree matching request paths that start with any of prefixes"""
+    if isinstance(prefixes, str):
+        prefixes = [prefixes]
+    return {
+        "IsGroup": True,
+        "Connective": Const.ConnectiveAnd,
+        "ConditionGroups": [
+            {
+                "IsGroup": True,
+                "Connective": Const.ConnectiveAnd,
+                "ConditionGroups": [
+                    {
+                        "IsGroup": False,
+                        "Connective": Const.ConnectiveAnd,
+                        "Condition": {
+                            "Object": Const.ConditionHTTPPath,
+                            "Operator": Const.OperatorPrefixMatch,
+                            "IgnoreCase": ignore_case,
+                            "Value": list(prefixes)
+                        }
+                    }
+                ]
+            }
+        ]
+    }
+
+
+def response_header_action(operation: str, header_name: str, values=None) -> dict:
+    """Action modifying a response header (operation e.g. Const.Delete)"""
+    parameters = [
+        {"Name": "action", "Values": [operation]},
+        {"Name": "header_name", "Values": [header_name]}
+    ]
+    if values is not None:
+        parameters.append({"Name": "header_value", "Values": list(values)})
+    return {
+        "Action": Const.ActionResponseHeader,
+        "Groups": [
+            {
+                "Dimension": Const.ActionResponseHeader,
+                "GroupParameters": [{"Parameters": parameters}]
+            }
+        ]
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def _encode(desc: str, condition_json: str, actions_json: str) -> str:
+    rule = Rule()
+    rule.desc = desc
+    rule.if_block.condition = Condition(json.loads(condition_json))
+    for action in json.loads(actions_json):
+        rule.if_block.actions.append(Action(action))
+    return rule.encode_to_string()
+
+
+def encode_rule(condition: dict, actions: list, desc: str = "") -> str:
+    """Encoded rule string, built once per distinct (desc, condition, actions)"""
+    return _encode(desc,
+                   json.dumps(condition, sort_keys=True, separators=(",", ":")),
+                   json.dumps(actions, sort_keys=True, separators=(",", ":")))
+
+
+def strip_response_header_spec(prefix: str, header: str, ignore_case: bool = True) -> tuple:
+    """(condition, actions) of a rule deleting `header` from responses under `prefix`"""
+    return path_prefix_condition(prefix, ignore_case), [response_header_action(Const.Delete, header)]
+
+
+@functools.lru_cache(maxsize=4096)
+def strip_response_header(prefix: str, header: str, desc: str = "", ignore_case: bool = True) -> str:
+    """Encoded rule deleting response header `header` for paths under `prefix`"""
+    condition, actions = strip_response_header_spec(prefix, header, ignore_case)
+    return encode_rule(condition, actions, desc)
+
+
+def cache_info() -> dict:
+    """Hit/miss statistics of the encoding caches"""
+    return {"encode": _encode.cache_info(), "strip_response_header": strip_response_header.cache_info()}
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Offline Rule Engine Evaluator
+
+Compiles rule engine Condition trees and Actions (the dicts produced by
+rule_builder, as sent by create_rule_engine) into plain Python callables,
+so a rule change can be replayed against synthetic or recorded traffic
+before it is released:
+    - leaf conditions become precompiled matchers: case-folded prefix
+      regexes (or a prefix trie for very large prefix lists), frozensets
+      for equality, compiled regexes
+    - single-child groups are flattened and AND/OR groups short-circuit
+    - response header actions become functions over a headers dict
+
+A request is a dict with "path", "method", "host", "query" and "headers"
+(lower-cased header names). Only "path" is needed for path rules.
+
+Usage:
+    rule = compile_rule(*strip_response_header_spec("/stripheader/", "server"))
+    hits = rule.count_matches(paths)
+    python rule_evaluator.py --prefix /stripheader/ [--paths paths.txt]
+"""
+import re
+import time
+import random
+import argparse
+
+from cdn_rule_engine_sdk.rule_engine.Const import Const
+
+# Above this many prefixes a trie beats one alternation regex
+TRIE_THRESHOLD = 256
+
+# Condition Object -> request field; only names this SDK release defines are used
+_OBJECT_FIELDS = {
+    name: field for name, field in (
+        ("ConditionHTTPPath", "path"),
+        ("ConditionHTTPMethod", "method"),
+        ("ConditionHTTPHost", "host"),
+        ("ConditionHTTPQuery", "query"),
+    ) if hasattr(Const, name)
+}
+OBJECT_FIELDS = {getattr(Const, name): field for name, field in _OBJECT_FIELDS.items()}
+
+
+class PrefixTrie:
+    """Character trie answering "does text start with any stored prefix" """
+
+    _END = object()
+
+    def __init__(self, prefixes):
+        self._root = {}
+        for prefix in prefixes:
+            node = self._root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[self._END] = True
+
+    def match(self, text: str) -> bool:
+        node = self._root
+        if self._END in node:
+            return True
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+def _prefix_matcher(values, ignore_case):
+    if not values:  # An empty alternation would match every text
+        return lambda text: False
+    if len(values) > TRIE_THRESHOLD:
+        trie = PrefixTrie([v.casefold() for v in values] if ignore_case else values)
+        return (lambda text: trie.match(text.casefold())) if ignore_case else trie.match
+    pattern = re.compile("|".join(re.escape(v) for v in values), re.IGNORECASE if ignore_case else 0)
+    match = pattern.match
+    return lambda text: match(text) is not None
+
+
+def _suffix_matcher(values, ignore_case):
+    if ignore_case:
+        suffixes = tuple(v.casefold() for v in values)
+        return lambda text: text.casefold().endswith(suffixes)
+    suffixes = tuple(values)
+    return lambda text: text.endswith(suffixes)
+
+
+def _equal_matcher(values, ignore_case):
+    if ignore_case:
+        wanted = frozenset(v.casefold() for v in values)
+        return lambda text: text.casefold() in wanted
+    wanted = frozenset(values)
+    return wanted.__contains__
+
+
+def _contain_matcher(values, ignore_case):
+    if not values:  # An empty alternation would match every text
+        return lambda text: False
+    pattern = re.compile("|".join(re.escape(v) for v in values), re.IGNORECASE if ignore_case else 0)
+    search = pattern.search
+    return lambda text: search(text) is not None
+
+
+def _regex_matcher(values, ignore_case):
+    if not values:  # An empty alternation would match every text
+        return lambda text: False
+    pattern = re.compile("|".join(f"(?:{v})" for v in values), re.IGNORECASE if ignore_case else 0)
+    search = pattern.search
+    return lambda text: search(text) is not None
+
+
+_OPERATORS = {
+    name: factory for name, factory in (
+        ("OperatorPrefixMatch", _prefix_matcher),
+        ("OperatorSuffixMatch", _suffix_matcher),
+        ("OperatorEqual", _equal_matcher),
+        ("OperatorContain", _contain_matcher),
+        ("OperatorRegexMatch", _regex_matcher),
+    ) if hasattr(Const, name)
+}
+OPERATORS = {getattr(Const, name): factory for name, factory in _OPERATORS.items()}
+NEGATED_OPERATORS = {getattr(Const, negated): getattr(Const, positive) for negated, positive in (
+    ("OperatorNotEqual", "OperatorEqual"),
+    ("OperatorNotContain", "OperatorContain"),
+    ("OperatorNotPrefixMatch", "OperatorPrefixMatch"),
+) if hasattr(Const, negated) and hasattr(Const, positive)}
+
+
+def compile_condition(node: dict):
+    """Compile a Condition tree into a callable request -> bool"""
+    if not node.get("IsGroup"):
+        leaf = node.get("Condition", node)
+        field = OBJECT_FIELDS.get(leaf["Object"])
+        if field is None:
+            raise ValueError(f"Unsupported condition object: {leaf['Object']}")
+        operator = leaf["Operator"]
+        negate = operator in NEGATED_OPERATORS
+        factory = OPERATORS.get(NEGATED_OPERATORS.get(operator, operator))
+        if factory is None:
+            raise ValueError(f"Unsupported condition operator: {operator}")
+        test = factory(list(leaf.get("Value") or []), bool(leaf.get("IgnoreCase")))
+        if negate:
+            return lambda request: not test(request.get(field) or "")
+        return lambda request: test(request.get(field) or "")
+
+    children = [compile_condition(child) for child in node.get("ConditionGroups") or []]
+    if not children:
+        return lambda request: True
+    if len(children) == 1:
+        return children[0]
+    if node.get("Connective") == Const.ConnectiveAnd:
+        return lambda request: all(child(request) for child in children)
+    return lambda request: any(child(request) for child in children)
+
+
+def path_matcher(condition: dict):
+    """Fast path for conditions that only test the request path
+
+    Output:
+        - Callable path -> bool, or None if the condition uses other fields
+    """
+    if not condition.get("IsGroup"):
+        leaf = condition.get("Condition", condition)
+        if OBJECT_FIELDS.get(leaf.get("Object")) != "path" or leaf.get("Operator") not in OPERATORS:
+            return None
+        return OPERATORS[leaf["Operator"]](list(leaf.get("Value") or []), bool(leaf.get("IgnoreCase")))
+    children = condition.get("ConditionGroups") or []
+    if len(children) == 1:
+        return path_matcher(children[0])
+    return None
+
+
+def compile_action(action: dict):
+    """Compile an Action into a callable headers dict -> headers dict"""
+    steps = []
+    for group in action.get("Groups") or []:
+        for group_parameters in group.get("GroupParameters") or []:
+            params = {p["Name"]: p.get("Values") or [] for p in group_parameters.get("Parameters") or []}
+            operation = (params.get("action") or [None])[0]
+            names = [name.lower() for name in params.get("header_name") or []]
+            value = ", ".join(params.get("header_value") or [])
+            steps.append((operation, names, value))
+
+    def apply(headers: dict) -> dict:
+        headers = dict(headers)
+        for operation, names, value in steps:
+            for name in names:
+                if operation == Const.Delete:
+                    headers.pop(name, None)
+                elif operation == getattr(Const, "Set", "set"):
+                    headers[name] = value
+                elif operation == getattr(Const, "Add", "add"):
+                    headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        return headers
+
+    return apply
+
+
+class CompiledRule:
+    def __init__(self, condition: dict, actions: list):
+        """Compile a rule for offline evaluation
+
+        Input:
+            - condition: Condition tree dict (as passed to rule_engine Condition)
+            - actions: List of Action dicts
+        """
+        self.match = compile_condition(condition)
+        self.match_path = path_matcher(condition)
+        self._actions = [compile_action(action) for action in actions]
+
+    def apply(self, request: dict, response_headers: dict) -> dict:
+        """Response headers after the rule ran for this request"""
+        if not self.match(request):
+            return response_headers
+        for action in self._actions:
+            response_headers = action(response_headers)
+        return response_headers
+
+    def count_matches(self, requests) -> int:
+        """Count matching requests; accepts request dicts or bare paths"""
+        iterator = iter(requests)
+        first = next(iterator, None)
+        if first is None:
+            return 0
+        if isinstance(first, str):
+            if self.match_path is None:
+                raise ValueError("Rule tests more than the path; pass request dicts")
+            return self.match_path(first) + sum(map(self.match_path, iterator))
+        return self.match(first) + sum(map(self.match, iterator))
+
+
+def compile_rule(condition: dict, actions: list) -> CompiledRule:
+    return CompiledRule(condition, actions)
+
+
+def synthetic_paths(count: int, hit_ratio: float = 0.1, seed: int = 7) -> list:
+    """Random request paths, a share of them under /StripHeader/ in mixed case"""
+    rng = random.Random(seed)
+    roots = ["/static/", "/api/v1/", "/images/", "/hugefile/", "/"]
+    return [
+        (rng.choice(["/stripheader/", "/StripHeader/", "/STRIPHEADER/"]) if rng.random() < hit_ratio
+         else rng.choice(roots)) + f"item{rng.randrange(100000)}.html"
+        for _ in range(count)
+    ]
+
+
+if __name__ == '__main__':
+    from rule_builder import strip_response_header_spec
+
+    parser = argparse.ArgumentParser(description="Replay request paths against a header-stripping rule")
+    parser.add_argument("--prefix", default="/stripheader/", help="Rule path prefix")
+    parser.add_argument("--header", default="server", help="Response header the rule deletes")
+    parser.add_argument("--case-sensitive", action="store_true", help="Disable IgnoreCase")
+    parser.add_argument("--paths", help="File with one request path per line (default: synthetic)")
+    parser.add_argument("--count", type=int, default=2_000_000, help="Synthetic request count")
+    args = parser.parse_args()
+
+    rule = compile_rule(*strip_response_header_spec(args.prefix, args.header, not args.case_sensitive))
+    if args.paths:
+        with open(args.paths) as f:
+            paths = [line.rstrip("\n") for line in f]
+    else:
+        paths = synthetic_paths(args.count)
+
+    started = time.perf_counter()
+    hits = rule.count_matches(paths)
+    elapsed = time.perf_counter() - started
+    print(f"{hits}/{len(paths)} requests matched ({hits / max(1, len(paths)):.2%}); "
+          f"{len(paths) / elapsed / 1e6:.2f}M requests/s")
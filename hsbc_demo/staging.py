@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Change Staging
+
+Every release_template starts a global propagation, so a config change
+that edits a template five times should release it once, not five
+times. ChangeSet collects pending modifications per TemplateId and, at
+commit, sends one merged update and one release per template:
+
+    with demo.stage_changes() as changes:            # transaction
+        changes.update("cipher", tpl, {"Title": "a"})
+        changes.update("cipher", tpl, {"HTTPS": {...}})
+    # -> one UpdateCipherTemplate + one ReleaseTemplate
+
+    changes = demo.stage_changes(window=5.0)          # window
+    ...                                               # commits 5s after the first staged edit
+
+Edits are merged the way the Update APIs apply them: each top-level field
+replaces the previous value, so the merged update leaves the template in
+the same state as the individual updates would have. Staged values are
+frozen (hsbc_demo_json.freeze), later changes to the caller's dicts do
+not leak in. A template whose update fails is not released.
+
+In window mode the commit runs on a daemon timer thread. Edits still
+staged when the interpreter exits are committed by an atexit hook
+(sequentially, as no new threads can start by then), and an exception of
+a timer commit is logged and kept in last_error instead of being lost
+with the thread.
+"""
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from hsbc_demo_json import FrozenDict, freeze
+
+logger = logging.getLogger(__name__)
+
+
+class _Staged:
+    __slots__ = ("kind", "changes", "edits", "release")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.changes = FrozenDict()
+        self.edits = 0
+        self.release = False
+
+
+class ChangeSet:
+    def __init__(self, demo, window: float = None, max_workers: int = 4, waiter=None, on_commit=None):
+        """Collect template changes until commit()
+
+        Input:
+            - demo: HSBCDemo used for the update and release calls
+            - window: Optional seconds after the first staged change at which
+              the set commits itself (from a timer thread)
+            - max_workers: Templates updated and released concurrently
+            - waiter: Optional propagation.PropagationWaiter; commit() then
+              returns once every released template is active
+            - on_commit: Optional fn(report) called after each commit
+        """
+        self._demo = demo
+        self._window = window
+        self._max_workers = max_workers
+        self._waiter = waiter
+        self._on_commit = on_commit
+        self._staged = {}
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._timer = None
+        self.last_report = None
+        self.last_error = None
+
+    def _stage(self, kind: str, template_id: str) -> _Staged:
+        """Pending entry of a template (under the lock), starting the window timer if needed"""
+        staged = self._staged.get(template_id)
+        if staged is None:
+            staged = self._staged[template_id] = _Staged(kind)
+        elif kind is not None and staged.kind is not None and staged.kind != kind:
+            raise ValueError(f"Template {template_id} staged as {staged.kind}, not {kind}")
+        elif staged.kind is None:
+            staged.kind = kind
+        if self._window is not None and self._timer is None:
+            self._timer = threading.Timer(self._window, self._commit_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+            atexit.register(self._commit_at_exit)
+        return staged
+
+    def _stop_timer(self) -> None:
+        """Cancel the window timer and its atexit hook (under the lock)"""
+        if self._timer is not None:
+            if self._timer is not threading.current_thread():
+                self._timer.cancel()
+            self._timer = None
+            atexit.unregister(self._commit_at_exit)
+
+    def _commit_from_timer(self) -> None:
+        try:
+            self.commit()
+        except Exception as e:
+            self.last_error = e
+            logger.exception(f"Window commit of staged template changes failed: {str(e)}")
+
+    def _commit_at_exit(self) -> None:
+        with self._lock:
+            count = len(self._staged)
+        if count:
+            logger.warning(f"Committing {count} staged templates at exit, before their window ended")
+            self._commit(sequential=True)
+
+    def update(self, kind: str, template_id: str, changes: dict) -> None:
+        """Stage fields to update (and release) on a template
+
+        Input:
+            - kind: Template kind, one of TEMPLATE_KINDS
+            - template_id: String containing policy template ID
+            - changes: Fields to update, as for HSBCDemo.update_template
+        """
+        if not template_id:
+            raise ValueError("Template ID cannot be empty")
+        frozen = freeze({key: value for key, value in changes.items() if key != "TemplateId"})
+        with self._lock:
+            staged = self._stage(kind, template_id)
+            staged.changes = FrozenDict({**staged.changes, **frozen})
+            staged.edits += 1
+            staged.release = True
+
+    def release(self, template_id: str) -> None:
+        """Stage a release without changes (e.g. of a freshly created template)"""
+        if not template_id:
+            raise ValueError("Template ID cannot be empty")
+        with self._lock:
+            self._stage(None, template_id).release = True
+
+    @property
+    def pending(self) -> dict:
+        """{template_id: {"Kind", "Changes", "Edits"}} of everything staged"""
+        with self._lock:
+            return {template_id: {"Kind": staged.kind, "Changes": staged.changes, "Edits": staged.edits}
+                    for template_id, staged in self._staged.items()}
+
+    def discard(self) -> None:
+        """Drop every staged change"""
+        with self._lock:
+            self._staged = {}
+            self._stop_timer()
+
+    def _apply(self, item) -> dict:
+        template_id, staged = item
+        row = {"Kind": staged.kind, "Edits": staged.edits, "Updated": None, "Released": False, "Active": None}
+        if staged.changes:
+            row["Updated"] = self._demo.update_template(staged.kind, template_id, dict(staged.changes))
+            if not row["Updated"]:
+                logger.error(f"Not releasing {template_id}: its staged update failed")
+                return row
+        row["Released"] = self._demo.release_policy(template_id)
+        if row["Released"] and self._waiter is not None:
+            try:
+                self._waiter.wait_template(template_id).result()
+                row["Active"] = True
+            except Exception as e:
+                logger.error(f"Release of {template_id} did not become active: {str(e)}")
+                row["Active"] = False
+        return row
+
+    def commit(self) -> dict:
+        """Send one merged update and one release per staged template
+
+        Output:
+            - {template_id: {"Kind", "Edits", "Updated", "Released", "Active"}};
+              "Updated" is None for release-only entries, "Active" is None
+              without a waiter
+        """
+        return self._commit()
+
+    def _commit(self, sequential: bool = False) -> dict:
+        with self._commit_lock:
+            with self._lock:
+                staged, self._staged = self._staged, {}
+                self._stop_timer()
+            if not staged:
+                return {}
+
+            started = time.perf_counter()
+            if sequential:
+                report = {template_id: self._apply((template_id, item)) for template_id, item in staged.items()}
+            else:
+                with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="changeset") as pool:
+                    report = dict(zip(staged, pool.map(self._apply, staged.items())))
+            edits = sum(row["Edits"] for row in report.values())
+            released = sum(1 for row in report.values() if row["Released"])
+            logger.info(f"Committed {edits} staged edits of {len(report)} templates with {released} releases "
+                        f"in {time.perf_counter() - started:.2f}s")
+            self.last_report = report
+        if self._on_commit is not None:
+            self._on_commit(report)
+        return report
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            with self._lock:
+                count = len(self._staged)
+            logger.warning(f"Discarding {count} staged templates after {exc_type.__name__}")
+            self.discard()
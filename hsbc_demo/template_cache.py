@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Content-Addressed Template Cache
+
+Maps a normalized template body to the TemplateId of a template already
+created with that content, so repeat provisioning of an identical policy
+reuses it instead of creating (and releasing) a duplicate. Keys are a
+SHA-256 of the body with naming and server-managed fields removed, so two
+policies differing only in Title or Message share one template. Entries
+persist in SQLite with LRU/TTL eviction, and a hit is validated against
+the server before it is trusted: the template must still exist and hold
+the same content (it may have been edited by another process or in the
+console). Keys are scoped by the client identity (account and endpoint),
+so a cache file shared by several accounts never hands one account a
+TemplateId of another.
+"""
+import json
+import hashlib
+import logging
+
+from cache_store import SqliteLRUStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "hsbc_template_cache.db"
+
+# Fields that do not change what a template does
+IGNORED_FIELDS = frozenset(("Title", "Message", "CreateTime", "UpdateTime", "TemplateId", "Status", "HasDraft"))
+
+
+def content_key(kind: str, body: dict, scope: str = "") -> str:
+    """Content hash of a template body, independent of its naming fields
+
+    Input:
+        - kind: Template kind
+        - body: Template body
+        - scope: Client identity (HSBCDemo.identity) the key belongs to
+    """
+    normalized = {key: value for key, value in body.items() if key not in IGNORED_FIELDS}
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return f"{scope}/{kind}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+class TemplateCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 10000,
+                 ttl: float = 7 * 86400, validate: bool = True, skip_released: bool = False):
+        """Open the persistent template cache
+
+        Input:
+            - path: SQLite file shared across runs (":memory:" for per-process)
+            - max_entries: LRU bound on cached templates
+            - ttl: Seconds before an entry must be recreated
+            - validate: Confirm a hit still exists on the server with the same
+              content before reuse
+            - skip_released: Let release_policy skip templates this client
+              already released, once the server confirms they are released
+              without a pending draft; off by default, since the flag does not
+              see edits made in the console or by other clients
+        """
+        self._store = SqliteLRUStore(path, max_entries=max_entries, ttl=ttl)
+        self.validate = validate
+        self.skip_released = skip_released
+
+    def lookup(self, kind: str, body: dict, scope: str = "") -> str:
+        """Return the cached TemplateId for this content in a client identity's scope, or None"""
+        return self._store.get(content_key(kind, body, scope))
+
+    def store(self, kind: str, body: dict, template_id: str, scope: str = "") -> None:
+        """Remember that template_id holds this content in a client identity's scope"""
+        self._store.put(content_key(kind, body, scope), template_id, tag=template_id)
+
+    def matches(self, kind: str, body: dict, described: dict) -> bool:
+        """Check whether a described template still holds the content of body
+
+        Only the fields of body are compared; server-added fields are ignored.
+        """
+        return content_key(kind, {key: described.get(key) for key in body}) == content_key(kind, body)
+
+    def is_released(self, template_id: str, scope: str = "") -> bool:
+        """Check whether this process last saw the template released with its current content
+
+        Only edits made through HSBCDemo clear the flag, so callers confirm it
+        with the server before skipping a release (see skip_released).
+        """
+        return bool(template_id) and self._store.get(f"{scope}/released:{template_id}") is not None
+
+    def mark_released(self, template_id: str, scope: str = "") -> None:
+        self._store.put(f"{scope}/released:{template_id}", True, tag=template_id)
+
+    def invalidate(self, template_id: str) -> None:
+        """Forget every entry of a template (after update or delete)"""
+        if template_id and self._store.delete_tag(template_id):
+            logger.debug(f"Template cache invalidated: {template_id}")
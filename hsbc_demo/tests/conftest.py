@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures: an HSBCDemo wired to the in-process fake CDN API
+
+The demo modules import each other as top-level modules, so the package
+directory is put on sys.path. Neither the Byteplus SDK nor requests is
+needed for these tests.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_cdn import FakeCDNBackend, FakeCDNService  # noqa: E402
+from hsbc_demo import HSBCDemo  # noqa: E402
+from resilience import Resilience, RetryPolicy, CircuitBreaker  # noqa: E402
+
+
+def fast_resilience(max_attempts: int = 4, failure_threshold: int = 50) -> Resilience:
+    """Resilience without rate limits or retry sleeps worth waiting for"""
+    return Resilience(default_rate=10000, retry=RetryPolicy(max_attempts, base_delay=0.001, max_delay=0.001),
+                      breaker=CircuitBreaker(failure_threshold, reset_timeout=60))
+
+
+@pytest.fixture
+def backend():
+    return FakeCDNBackend(seed=1)
+
+
+@pytest.fixture
+def demo(backend):
+    return HSBCDemo(fast_resilience(), svc=FakeCDNService(backend))
+
+
+@pytest.fixture
+def released(demo):
+    """{"id_rule", "id_delivery", "id_cipher"} of released templates to bind domains to"""
+    ids = {
+        "id_rule": demo.create_template("rule_engine", {"Title": "tpl_rule", "Rule": {"Condition": {}}}),
+        "id_delivery": demo.create_delivery_policy("tpl_delivery"),
+        "id_cipher": demo.create_cipher_policy("tpl_cipher"),
+    }
+    for template_id in ids.values():
+        assert demo.release_policy(template_id)
+    return ids
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Access control impact: rule verdicts and parallel log replay"""
+import json
+
+from access_impact import AccessRules, analyze
+from access_log import split_ranges
+
+POLICY = {
+    "AreaAccessRule": {"Switch": True, "RuleType": "deny", "Area": "CN;RU"},
+    "MethodDeniedRule": {"Switch": True, "Methods": "delete,put"},
+    "UaAccessRule": {"Switch": True, "RuleType": "deny", "UaList": "*curl*,sqlmap*", "AllowEmpty": False},
+}
+
+
+def test_area_rule_allow_and_deny_lists():
+    deny = AccessRules(POLICY)
+    assert deny.area_blocks("cn") and not deny.area_blocks("GB")
+    allow = AccessRules({"AreaAccessRule": {"Switch": True, "RuleType": "allow", "Area": "GB"}})
+    assert allow.area_blocks("CN") and not allow.area_blocks("gb")
+    assert not deny.area_blocks("") and not allow.area_blocks("")
+    assert not AccessRules({"AreaAccessRule": {"Switch": False, "Area": "GB"}}).area_blocks("CN")
+
+
+def test_method_and_ua_rules():
+    rules = AccessRules(POLICY)
+    assert rules.method_blocks("DELETE") and not rules.method_blocks("GET")
+    assert rules.ua_blocks("CURL/8.0") and rules.ua_blocks("sqlmap/1.7")
+    assert not rules.ua_blocks("Mozilla/5.0 sqlmap")
+    assert rules.ua_blocks("") and rules.ua_blocks("-")
+
+    allow = AccessRules({"UaAccessRule": {"Switch": True, "RuleType": "allow", "UaList": "Mozilla*",
+                                          "IgnoreCase": False}})
+    assert not allow.ua_blocks("Mozilla/5.0") and allow.ua_blocks("mozilla/5.0")
+    assert not allow.ua_blocks("")
+
+
+def _log(tmp_path, lines=400):
+    rows = [
+        {"time": 1, "url": "/a", "method": "GET", "country": "GB", "ua": "Mozilla/5.0", "bytes": 10},
+        {"time": 1, "url": "/a", "method": "DELETE", "country": "CN", "ua": "curl/8", "bytes": 10},
+        {"time": 1, "url": "/a", "method": "GET", "country": "", "ua": "Mozilla/5.0", "bytes": 10},
+        {"time": 1, "url": "/a", "method": "PUT", "country": "GB", "ua": "Mozilla/5.0", "bytes": 10},
+    ]
+    log = tmp_path / "access.jsonl"
+    log.write_text("\n".join(json.dumps(rows[i % len(rows)]) for i in range(lines)) + "\n")
+    return str(log)
+
+
+def test_analyze_counts_overlapping_blocks(tmp_path):
+    report = analyze(_log(tmp_path), {"current": {}, "proposed": POLICY}, workers=1, chunk_lines=7)
+    assert report["current"]["Blocked"] == 0
+    proposed = report["proposed"]
+    assert (proposed["Requests"], proposed["Blocked"], proposed["UnknownCountry"]) == (400, 200, 100)
+    assert proposed["BlockedBytes"] == 2000
+    assert proposed["AreaAccessRule"]["Requests"] == 100
+    assert proposed["MethodDeniedRule"]["Requests"] == 200
+    assert proposed["UaAccessRule"]["Requests"] == 100
+
+
+def test_parallel_replay_matches_single_worker(tmp_path):
+    log = _log(tmp_path, lines=40_000)  # Ranges are at least 1 MiB
+    assert len(split_ranges(log, 3)) == 3
+    policies = {"proposed": POLICY}
+    parallel = analyze(log, policies, workers=3, chunk_lines=1000)
+    assert parallel == analyze(log, policies, workers=1)
+    assert parallel["proposed"]["Requests"] == 40_000
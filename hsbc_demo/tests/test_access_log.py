@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Access log parsing and cache rule classification"""
+import json
+
+import pytest
+
+from access_log import parse_combined, parse_jsonl, iter_chunks
+from cache_simulator import CacheSimulator
+
+
+def test_jsonl_time_formats_match_combined():
+    clf = parse_combined('1.2.3.4 - - [10/Oct/2024:13:55:36 +0800] "GET /a.js HTTP/1.1" 200 10')
+    for value in ("10/Oct/2024:13:55:36 +0800", "2024-10-10T13:55:36+08:00", "2024-10-10T05:55:36Z",
+                  clf[0]):
+        assert parse_jsonl(json.dumps({"time": value, "url": "/a.js"}))[0] == clf[0]
+
+
+@pytest.mark.parametrize("row", [
+    {"url": "/no-time"},
+    {"time": "yesterday", "url": "/a"},
+    {"time": 1, "url": "/a", "status": "OK"},
+    {"time": 1, "url": "/a", "bytes": "lots"},
+    {"time": 1, "url": None},
+])
+def test_malformed_jsonl_rows_are_dropped(row):
+    assert parse_jsonl(json.dumps(row)) is None
+
+
+def test_malformed_jsonl_rows_are_skipped_in_chunks(tmp_path):
+    log = tmp_path / "access.jsonl"
+    log.write_text("\n".join(json.dumps(row) for row in (
+        {"time": 1, "url": "/a", "bytes": "-"}, {"url": "/b"}, {"time": "2024-01-01T00:00:00", "url": "/c"})))
+    chunks = list(iter_chunks(str(log)))
+    assert chunks[0]["path"] == ["/a", "/c"]
+    assert chunks[0]["bytes"] == [0, 0]
+
+
+def test_vectorized_classify_matches_scalar_with_long_urls():
+    pytest.importorskip("numpy")
+    long_path = "/static/" + "x" * 8192 + ".js"
+    paths = ["/", "/index.html", "/img/a.PNG", "/api/v1/x", "/hugefile/a.bin", long_path, "/noext", "/a.b/c"]
+    vectorized = CacheSimulator(vectorized=True)
+    scalar = CacheSimulator(vectorized=False)
+    assert vectorized.vectorized
+    assert vectorized.classify(paths) == scalar.classify(paths)
+    assert vectorized._path_width < 100
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""asyncio client over the fake CDN API"""
+import asyncio
+
+import pytest
+
+from async_hsbc_demo import AsyncHSBCDemo
+from fake_cdn import FakeCDNBackend, FakeCDNService
+from hsbc_demo import HSBCDemo
+
+from conftest import fast_resilience
+
+
+def test_timed_out_iteration_closes_cleanly():
+    backend = FakeCDNBackend(latency=0.3)
+    demo = HSBCDemo(fast_resilience(), svc=FakeCDNService(backend))
+
+    async def _iterate():
+        async with AsyncHSBCDemo(demo, max_concurrency=2, timeout=0.05) as client:
+            iterator = client.iter_cdn_domains(prefetch=False)
+            with pytest.raises(asyncio.TimeoutError):
+                async for _ in iterator:
+                    pass
+            await iterator.aclose()
+
+    asyncio.run(_iterate())
+
+
+def test_concurrent_calls_and_iteration(demo, backend):
+    async def _run():
+        async with AsyncHSBCDemo(demo, max_concurrency=4) as client:
+            ids = await asyncio.gather(*(client.create_cipher_policy(f"async-{n}") for n in range(8)))
+            templates = [row async for row in client.iter_templates(page_size=3)]
+        return ids, templates
+
+    ids, templates = asyncio.run(_run())
+    assert None not in ids and len(set(ids)) == 8
+    assert sorted(row["TemplateId"] for row in templates) == sorted(ids)
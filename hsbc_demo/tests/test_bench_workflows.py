@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""The workflow benchmark counts failed calls as failures"""
+import argparse
+
+import pytest
+
+pytest.importorskip("cdn_rule_engine_sdk")
+
+from bench_workflows import run_benchmarks  # noqa: E402
+
+
+def _args(**overrides) -> argparse.Namespace:
+    values = {"iterations": 4, "concurrency": 2, "latency": 0.0, "latency_jitter": 0.0,
+              "error_rate": 0.0, "qps": None, "client_rate": 10000.0}
+    return argparse.Namespace(**{**values, **overrides})
+
+
+def test_healthy_backend_has_no_failures():
+    rows = {row["step"]: row for row in run_benchmarks(_args())}
+    assert {step: row["failed"] for step, row in rows.items() if row["failed"]} == {}
+
+
+def test_failing_updates_and_deletes_are_counted():
+    rows = {row["step"]: row for row in run_benchmarks(_args(error_rate=1.0))}
+    for step in ("update_cipher_template", "delete_policy"):
+        assert rows[step]["failed"] == rows[step]["ops"]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Cache rule simulation: rule order, TTLs, cache keys and the key LRU"""
+import json
+
+import pytest
+
+from cache_simulator import CacheSimulator, NO_RULE, query_key, simulate
+
+POLICY = {
+    "Cache": [
+        {"Condition": {"ConditionRule": [{"Object": "directory", "Operator": "match", "Value": "/api"}]},
+         "CacheAction": {"Action": "nocache", "Ttl": 0}},
+        {"Condition": {"ConditionRule": [{"Object": "filetype", "Operator": "match", "Value": "js;css"}]},
+         "CacheAction": {"Action": "cache", "Ttl": 60}},
+    ],
+    "CacheKey": [
+        {"Condition": {"ConditionRule": [{"Object": "filetype", "Operator": "match", "Value": "js"}]},
+         "CacheKeyAction": {"CacheKeyComponents": [{"Object": "queryString", "Action": "exclude",
+                                                    "Subobject": "*"}]}},
+    ],
+}
+
+
+def _feed(simulator, requests):
+    """requests: (time, method, path, query) tuples on one host"""
+    simulator.feed({
+        "time": [r[0] for r in requests], "method": [r[1] for r in requests], "host": ["h"] * len(requests),
+        "path": [r[2] for r in requests], "query": [r[3] for r in requests], "bytes": [100] * len(requests),
+    })
+    return {row["Rule"]: row for row in simulator.report()["Rules"]}
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_first_matching_rule_wins(vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    simulator = CacheSimulator(POLICY, vectorized=vectorized)
+    assert simulator.classify(["/api/a.js", "/static/a.js", "/a.png"]) == [0, 1, 2]
+
+
+def test_ttl_decides_hits_and_refetches():
+    simulator = CacheSimulator(POLICY)
+    rows = _feed(simulator, [(0, "GET", "/a.css", ""), (30, "GET", "/a.css", ""), (59, "HEAD", "/a.css", ""),
+                             (90, "GET", "/a.css", ""), (100, "GET", "/a.css", "")])
+    row = rows[simulator.rules[1].name]
+    assert (row["Requests"], row["OriginRequests"]) == (5, 2)
+    assert row["HitRatio"] == pytest.approx(0.6)
+
+
+def test_uncacheable_requests_always_reach_origin():
+    simulator = CacheSimulator(POLICY)
+    rows = _feed(simulator, [(0, "GET", "/api/a.js", ""), (1, "GET", "/api/a.js", ""),
+                             (2, "POST", "/a.css", ""), (3, "POST", "/a.css", ""),
+                             (4, "GET", "/a.png", ""), (5, "GET", "/a.png", "")])
+    assert rows[simulator.rules[0].name]["OriginRequests"] == 2
+    assert rows[simulator.rules[1].name]["OriginRequests"] == 2
+    assert rows[NO_RULE]["OriginRequests"] == 2
+    assert simulator.report()["HitRatio"] == 0.0
+
+
+def test_cache_key_drops_excluded_query():
+    simulator = CacheSimulator(POLICY)
+    rows = _feed(simulator, [(0, "GET", "/a.js", "v=1"), (1, "GET", "/a.js", "v=2"),
+                             (2, "GET", "/a.css", "v=1"), (3, "GET", "/a.css", "v=2")])
+    assert rows[simulator.rules[1].name]["OriginRequests"] == 3
+
+
+def test_query_key_include_and_exclude():
+    assert query_key("b=2&a=1&c=3", "include", "a;b") == "a=1&b=2"
+    assert query_key("b=2&A=1&c=3", "exclude", "a", ignore_case=True) == "b=2&c=3"
+    assert query_key("a=1", "exclude", "*") == ""
+
+
+def test_evicted_keys_are_refetched():
+    simulator = CacheSimulator(POLICY, max_keys=2)
+    rows = _feed(simulator, [(0, "GET", "/1.css", ""), (1, "GET", "/2.css", ""), (2, "GET", "/3.css", ""),
+                             (3, "GET", "/1.css", ""), (4, "GET", "/3.css", "")])
+    assert rows[simulator.rules[1].name]["OriginRequests"] == 4
+    assert len(simulator._fetched) == 2
+
+
+def test_simulate_streams_a_log_in_chunks(tmp_path):
+    log = tmp_path / "access.jsonl"
+    log.write_text("\n".join(json.dumps({"time": t, "url": "/a.css", "bytes": 100}) for t in range(10)))
+    report = simulate(str(log), POLICY, chunk_lines=3)
+    assert report["Requests"] == 10
+    assert report["OriginRequests"] == 1
+    assert report["ByteHitRatio"] == pytest.approx(0.9)
+    assert report["CacheableShare"] == 1.0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Per-account reuse, key rotation, leasing and eviction of pooled clients"""
+import time
+
+import pytest
+
+from client_pool import CDNClientPool
+from fake_cdn import FakeCDNService
+
+
+def test_leased_client_is_never_evicted():
+    pool = CDNClientPool(idle_timeout=0.0, factory=FakeCDNService)
+    held = pool.get("ak-long-lived", "sk")
+    assert pool.evict_idle(time.monotonic() + 3600) == 0
+    assert pool.get("ak-long-lived", "sk") is held
+
+    pool.release("ak-long-lived")
+    pool.release("ak-long-lived")
+    assert pool.evict_idle(time.monotonic() + 1) == 1
+    assert len(pool) == 0
+
+
+def test_lease_context_releases():
+    pool = CDNClientPool(idle_timeout=0.0, factory=FakeCDNService)
+    with pool.lease("ak-short", "sk") as svc:
+        assert pool.evict_idle(time.monotonic() + 1) == 0
+    assert pool.evict_idle(time.monotonic() + 1) == 1
+    assert svc is not None
+
+
+def test_release_without_lease_fails():
+    pool = CDNClientPool(factory=FakeCDNService)
+    with pytest.raises(ValueError):
+        pool.release("ak-unknown")
+
+
+class _RecordingService(FakeCDNService):
+    """FakeCDNService that remembers its credentials and close()"""
+
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+        self.session = self
+        self.closed = False
+
+    def set_ak(self, ak):
+        self.ak = ak
+
+    def set_sk(self, sk):
+        self.keys.append(sk)
+
+    def close(self):
+        self.closed = True
+
+
+def test_one_client_per_access_key():
+    pool = CDNClientPool(factory=_RecordingService)
+    first = pool.get("ak-account-1", "sk")
+    second = pool.get("ak-account-2", "sk")
+    assert first is not second
+    assert (first.ak, second.ak) == ("ak-account-1", "ak-account-2")
+    assert pool.get("ak-account-1", "sk") is first
+    assert len(pool) == 2
+
+
+def test_secret_key_rotation_keeps_the_client():
+    pool = CDNClientPool(factory=_RecordingService)
+    svc = pool.get("ak-rotating", "sk-old")
+    assert pool.get("ak-rotating", "sk-new") is svc
+    assert svc.keys == ["sk-old", "sk-new"]
+    assert not svc.closed
+    assert len(pool) == 1
+
+
+@pytest.mark.parametrize("ak, sk", [("", "sk"), ("ak", ""), (None, "sk")])
+def test_missing_credentials_are_rejected(ak, sk):
+    pool = CDNClientPool(factory=_RecordingService)
+    with pytest.raises(ValueError):
+        pool.get(ak, sk)
+    assert len(pool) == 0
+
+
+def test_close_shuts_down_leased_clients():
+    pool = CDNClientPool(factory=_RecordingService)
+    leased = pool.get("ak-leased", "sk")
+    with pool.lease("ak-released", "sk") as released:
+        pass
+    pool.close()
+    assert leased.closed and released.closed
+    assert len(pool) == 0
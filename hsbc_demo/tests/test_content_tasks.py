@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Bulk refresh submission and batched status tracking against the fake CDN API"""
+from content_tasks import ContentTasks
+
+
+def test_refresh_is_deduplicated_and_batched(demo, backend):
+    urls = [f"http://a.example.com/img/{number}.png" for number in range(250)]
+    report = ContentTasks(demo).refresh(urls + ["HTTP://A.example.com:80//img/0.png"])
+    assert report["Urls"] == 250
+    assert sorted(len(task_urls) for task_urls in report["Tasks"].values()) == [50, 100, 100]
+    assert backend.calls["SubmitRefreshTask"] == 3
+    assert backend.calls["DescribeContentQuota"] == 1
+
+
+def test_track_queries_each_task_until_done(demo, backend):
+    content = ContentTasks(demo, limits={"refresh_file": 1})
+    urls = [f"http://a.example.com/{number}.html" for number in range(41)]
+    report = content.refresh(urls)
+    assert len(report["Tasks"]) == len(urls)
+
+    states = content.track(report["Tasks"], poll_interval=0.01, timeout=5)
+    assert {state["Status"] for state in states.values()} == {"complete"}
+    assert all(state["Urls"] == {"complete": 1} for state in states.values())
+    assert backend.calls["DescribeContentTasks"] == len(urls)
+    assert content.calls == 1 + len(urls) + len(urls)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Concurrent bulk domain onboarding"""
+
+
+def test_rows_follow_input_order_with_per_domain_errors(demo, backend, released):
+    domains = [f"d{number}.example.com" for number in range(20)]
+    specs = [{"domain": domain, **released} for domain in domains]
+    specs.insert(5, {"domain": "d3.example.com", **released})  # Duplicate of an earlier spec
+
+    rows = demo.create_domains(specs, max_workers=4)
+    assert [row["Domain"] for row in rows] == [spec["domain"] for spec in specs]
+    failed = [row for row in rows if not row["Success"]]
+    assert len(failed) == 1 and failed[0]["Domain"] == "d3.example.com" and failed[0]["Error"]
+    assert all(row["Latency"] >= 0 for row in rows)
+    assert sorted(backend.domains) == sorted(domains)
+
+
+def test_unknown_template_fails_only_its_domain(demo, backend, released):
+    specs = [{"domain": "ok.example.com", **released},
+             {"domain": "bad.example.com", **released, "id_cipher": "tpl-missing"}]
+    rows = demo.create_domains(specs)
+    assert [row["Success"] for row in rows] == [True, False]
+    assert list(backend.domains) == ["ok.example.com"]
+
+
+def test_no_specs_is_a_noop(demo, backend):
+    assert demo.create_domains([]) == []
+    assert backend.calls == {}
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Read-through describe cache"""
+import pytest
+
+from describe_cache import DescribeCache
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    cache = DescribeCache(path=str(tmp_path / "describe.db") if request.param == "disk" else None)
+    yield cache
+    cache.close()
+
+
+def test_loads_once_then_hits(cache):
+    loads = []
+    for _ in range(3):
+        result = cache.get_or_load("cipher", "tpl-1", lambda: loads.append(1) or {"Title": "a"})
+    assert result == {"Title": "a"} and len(loads) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_result_loaded_across_an_invalidation_is_not_cached(cache):
+    def _load_then_update_elsewhere():
+        result = {"Title": "before update"}
+        cache.invalidate("tpl-1")  # e.g. update_template on another thread
+        return result
+
+    assert cache.get_or_load("cipher", "tpl-1", _load_then_update_elsewhere) == {"Title": "before update"}
+    assert cache.get("cipher", "tpl-1") is None
+    assert cache.get_or_load("cipher", "tpl-1", lambda: {"Title": "after update"}) == {"Title": "after update"}
+    assert cache.get("cipher", "tpl-1") == {"Title": "after update"}
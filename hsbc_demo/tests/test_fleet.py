@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Fleet sharding and worker processes against per-worker fake CDN APIs"""
+import os
+import signal
+import multiprocessing
+
+from fleet import FleetExecutor, expand_matrix, shard_items
+
+ACCOUNTS = {name: {"AccessKey": f"ak-{name}", "SecretKey": f"sk-{name}"} for name in ("a", "b", "c")}
+
+
+def _items(account: str, count: int, operation: str = "list_cdn_domains") -> list:
+    return [{"Account": account, "Operation": operation, "Args": {}} for _ in range(count)]
+
+
+def test_shards_keep_accounts_together_and_balance_items():
+    items = _items("a", 5) + _items("b", 3) + _items("c", 2) + _items("a", 1)
+    shards = shard_items(items, 2)
+    accounts = [{item["Account"] for _, item in shard} for shard in shards]
+    assert accounts == [{"a"}, {"b", "c"}]
+    assert sorted(index for shard in shards for index, _ in shard) == list(range(len(items)))
+    assert len(shard_items(items, 8)) == 3
+
+
+def test_expand_matrix_substitutes_domains():
+    items = expand_matrix({"Accounts": ["a"], "Domains": ["x.example.com", "y.example.com"],
+                           "Operations": [{"Operation": "provision", "Args": {"domain": "{domain}"}}]})
+    assert [item["Args"]["domain"] for item in items] == ["x.example.com", "y.example.com"]
+
+
+def test_run_merges_results_in_input_order():
+    items = _items("a", 3) + _items("b", 2) + _items("c", 1, operation="stage_changes")
+    report = FleetExecutor(ACCOUNTS, processes=2, threads=2, fake_latency=0.0).run(items)
+    assert [row["Index"] for row in report["Results"]] == list(range(len(items)))
+    assert report["Failed"] == 0 and report["Succeeded"] == len(items)
+    # An unpicklable result arrives as its repr instead of being lost with the row
+    assert report["Results"][-1]["Result"].startswith("<staging.ChangeSet")
+    assert sum(shard["Items"] for shard in report["Shards"]) == len(items)
+
+
+def test_killed_worker_reports_its_remaining_items():
+    def _kill_workers(row):
+        for child in multiprocessing.active_children():
+            os.kill(child.pid, signal.SIGKILL)
+
+    items = _items("a", 6)
+    report = FleetExecutor(ACCOUNTS, processes=1, threads=1, fake_latency=0.3).run(items, on_result=_kill_workers)
+    errors = [row["Error"] for row in report["Results"]]
+    assert errors[0] is None
+    assert errors.count("Worker process died") >= len(items) - 2
+    assert report["Shards"][0]["Duration"] is None
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""HyperLogLog error bounds, merging and hash stability"""
+import os
+import sys
+import math
+import subprocess
+
+import pytest
+
+from hll import HyperLogLog
+
+
+def _keys(start, stop):
+    return (f"h/dir/{i}.js?v={i % 7}" for i in range(start, stop))
+
+
+@pytest.mark.parametrize("p", [10, 12, 14])
+@pytest.mark.parametrize("n", [1_000, 20_000, 100_000])
+def test_estimate_within_error_bound(p, n):
+    sketch = HyperLogLog(p)
+    sketch.update(_keys(0, n))
+    # Four standard errors: a deterministic hash keeps this from ever flaking
+    bound = 4 * 1.04 / math.sqrt(1 << p)
+    assert abs(sketch.count() - n) <= bound * n
+
+
+def test_small_cardinalities_are_nearly_exact():
+    for n in (1, 10, 100):
+        sketch = HyperLogLog()
+        sketch.update(_keys(0, n))
+        assert abs(sketch.count() - n) <= max(1, n // 100)
+    assert HyperLogLog().count() == 0
+
+
+def test_duplicates_do_not_count():
+    sketch = HyperLogLog(12)
+    sketch.update(_keys(0, 5_000))
+    before = sketch.count()
+    sketch.update(_keys(0, 5_000))
+    sketch.add("h/dir/0.js?v=0")
+    assert sketch.count() == before
+
+
+def test_merge_equals_sketch_of_union():
+    left, right, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    left.update(_keys(0, 30_000))
+    right.update(_keys(20_000, 50_000))
+    union.update(_keys(0, 50_000))
+    assert left.merge(right).registers == union.registers
+    assert len(left) == union.count()
+
+
+def test_precision_is_validated():
+    for p in (3, 19):
+        with pytest.raises(ValueError):
+            HyperLogLog(p)
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(11))
+
+
+def test_registers_are_stable_across_processes():
+    code = ("import sys; from hll import HyperLogLog; s = HyperLogLog(8); "
+            "s.update(str(i) for i in range(5000)); sys.stdout.write(s.registers.hex())")
+    local = HyperLogLog(8)
+    local.update(str(i) for i in range(5000))
+    env = dict(os.environ, PYTHONHASHSEED="12345")
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout == local.registers.hex()
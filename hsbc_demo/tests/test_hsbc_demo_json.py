@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Pre-parsed delivery policy template and copy-on-write overlays"""
+import copy
+import json
+import pickle
+
+import pytest
+
+from hsbc_demo_json import FrozenDict, delivery_policy_template, freeze, json_delivery_policy, overlay
+
+
+def test_template_is_parsed_once_and_frozen():
+    assert json.loads(json.dumps(delivery_policy_template)) == json.loads(json_delivery_policy)
+    with pytest.raises(TypeError):
+        delivery_policy_template["Title"] = "changed"
+    with pytest.raises(TypeError):
+        delivery_policy_template["AreaAccessRule"].update({"Switch": False})
+    assert isinstance(delivery_policy_template["Cache"], tuple)
+    assert copy.deepcopy(delivery_policy_template) is delivery_policy_template
+
+
+def test_overlay_merges_nested_fields_and_shares_the_rest():
+    variant = overlay(delivery_policy_template, {"Title": "a", "AreaAccessRule": {"Switch": False}})
+    assert variant["Title"] == "a"
+    assert variant["AreaAccessRule"]["Switch"] is False
+    assert variant["AreaAccessRule"]["Area"] is delivery_policy_template["AreaAccessRule"]["Area"]
+    assert variant["Cache"] is delivery_policy_template["Cache"]
+    assert delivery_policy_template["AreaAccessRule"]["Switch"] is True
+    assert "Title" not in delivery_policy_template
+
+
+def test_frozen_values_survive_pickling_and_the_sdk_encoder():
+    frozen = freeze({"a": [{"b": 1}]})
+    assert frozen == {"a": ({"b": 1},)}
+    restored = pickle.loads(pickle.dumps(frozen))
+    assert isinstance(restored, FrozenDict) and restored == frozen
+    assert json.loads(json.dumps(frozen)) == {"a": [{"b": 1}]}
+
+
+def test_delivery_policies_do_not_leak_into_each_other(demo, backend):
+    first = demo.create_delivery_policy("first", {"AreaAccessRule": {"Switch": False}})
+    second = demo.create_delivery_policy("second")
+    assert backend.templates[first]["AreaAccessRule"]["Switch"] is False
+    assert backend.templates[second]["AreaAccessRule"]["Switch"] is True
+    assert backend.templates[second]["Title"] == "second"
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Inventory index loading and incremental refresh against the fake API"""
+import pytest
+
+from fake_cdn import FakeAPIError, FakeCDNService
+from hsbc_demo import HSBCDemo
+from inventory import InventoryIndex
+
+from conftest import fast_resilience
+
+DOMAINS = [f"d{i}.example.com" for i in range(5)]
+
+
+@pytest.fixture
+def onboarded(demo, released):
+    rows = demo.create_domains([{"domain": domain, **released} for domain in DOMAINS])
+    assert all(row["Success"] for row in rows)
+    return released
+
+
+@pytest.fixture
+def indexed(backend):
+    """HSBCDemo keeping an InventoryIndex with a small page size up to date"""
+    inventory = InventoryIndex(page_size=2)
+    return HSBCDemo(fast_resilience(), svc=FakeCDNService(backend), inventory=inventory), inventory
+
+
+def _fail(backend, failing_action):
+    handle = backend.handle
+
+    def flaky(action, body):
+        if action == failing_action:
+            raise FakeAPIError("InvalidParameter", "Injected by test", 400)
+        return handle(action, body)
+
+    backend.handle = flaky
+
+
+def test_load_indexes_every_binding(backend, onboarded, indexed):
+    demo, inventory = indexed
+    assert inventory.load(demo)
+    assert backend.calls["DescribeTemplateDomains"] == 3  # 5 domains, 2 per page
+    assert len(inventory) == len(DOMAINS)
+    for template_id in onboarded.values():
+        assert inventory.domains_for_template(template_id) == frozenset(DOMAINS)
+    assert inventory.domain_for_cname(backend.domains["d1.example.com"]["Cname"]) == "d1.example.com"
+    assert inventory.domains_with_status("online") == frozenset(DOMAINS)
+    assert inventory.domains_for_template("tpl-unknown") == frozenset()
+
+
+def test_refresh_refetches_only_new_and_changed_domains(demo, backend, onboarded, indexed):
+    indexed_demo, inventory = indexed
+    assert inventory.load(indexed_demo)
+
+    assert demo.create_domain("new.example.com", **onboarded)
+    new_cipher = demo.create_cipher_policy("tpl_cipher_2")
+    assert demo.release_policy(new_cipher)
+    assert demo.update_template_domain("d0.example.com", onboarded["id_rule"], onboarded["id_delivery"], new_cipher)
+    backend.domains["d0.example.com"]["UpdateTime"] += 1  # Same second as the load otherwise
+    del backend.domains["d4.example.com"]
+    backend.domains["d3.example.com"]["Status"] = "offline"
+
+    calls = backend.calls["DescribeTemplateDomains"]
+    changes = inventory.refresh(indexed_demo)
+    assert changes == {"Added": ["new.example.com"], "Changed": ["d0.example.com"], "Removed": ["d4.example.com"]}
+    assert backend.calls["DescribeTemplateDomains"] == calls + 1  # One batch for both domains
+    assert inventory.domains_for_template(new_cipher) == {"d0.example.com"}
+    assert inventory.domains_for_template(onboarded["id_cipher"]) == {"d1.example.com", "d2.example.com",
+                                                                      "d3.example.com", "new.example.com"}
+    assert "d4.example.com" not in inventory
+    assert inventory.domains_with_status("offline") == {"d3.example.com"}
+
+
+def test_own_changes_are_reindexed(backend, onboarded, indexed):
+    demo, inventory = indexed
+    assert inventory.load(demo)
+    new_cipher = demo.create_cipher_policy("tpl_cipher_2")
+    assert demo.release_policy(new_cipher)
+    assert demo.update_template_domain("d2.example.com", onboarded["id_rule"], onboarded["id_delivery"], new_cipher)
+    assert demo.create_domain("own.example.com", **onboarded)
+    assert inventory.domains_for_template(new_cipher) == {"d2.example.com"}
+    assert "own.example.com" in inventory.domains_for_template(onboarded["id_cipher"])
+
+
+def test_failed_listing_leaves_index_untouched(backend, onboarded, indexed):
+    demo, inventory = indexed
+    assert inventory.load(demo)
+    del backend.domains["d4.example.com"]
+    _fail(backend, "ListCdnDomains")
+    assert inventory.refresh(demo) is None
+    assert "d4.example.com" in inventory
+
+    _fail(backend, "DescribeTemplateDomains")
+    assert not inventory.load(demo)
+    assert len(inventory) == len(DOMAINS)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Streaming, paginated domain listing"""
+import itertools
+
+import pytest
+
+
+def _add_domains(backend, count: int, status: str = "online"):
+    for number in range(count):
+        domain = f"d{number:03d}.example.com"
+        backend.domains[domain] = {"Domain": domain, "Cname": f"{domain}.cdn", "Status": status, "Waf": "off"}
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+@pytest.mark.parametrize("count", [0, 7, 10, 25])
+def test_every_domain_once_with_minimal_pages(demo, backend, count, prefetch):
+    _add_domains(backend, count)
+    domains = [row["Domain"] for row in demo.iter_cdn_domains(page_size=10, prefetch=prefetch)]
+    assert domains == sorted(backend.domains)
+    # Total stops the listing after the last full page
+    assert backend.calls["ListCdnDomains"] == max(1, -(-count // 10))
+
+
+def test_consumer_stopping_early_fetches_at_most_one_page_ahead(demo, backend):
+    _add_domains(backend, 50)
+    first = list(itertools.islice(demo.iter_cdn_domains(page_size=10, prefetch=True), 5))
+    assert len(first) == 5
+    assert backend.calls["ListCdnDomains"] <= 2
+
+
+def test_filters_are_sent_with_every_page(demo, backend):
+    _add_domains(backend, 15)
+    backend.domains["d000.example.com"]["Status"] = "offline"
+    rows = list(demo.iter_cdn_domains(page_size=5, filters={"Status": "online"}))
+    assert len(rows) == 14 and all(row["Status"] == "online" for row in rows)
+
+
+def test_failed_page_ends_the_listing(demo, backend):
+    _add_domains(backend, 30)
+    backend.error_rate = 1.0
+    assert list(demo.iter_cdn_domains(page_size=10, prefetch=False)) == []
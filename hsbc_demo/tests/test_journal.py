@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Resuming the provisioning workflow from its journal"""
+import pytest
+
+from fake_cdn import FakeAPIError, FakeCDNService
+from hsbc_demo import HSBCDemo, build_provisioning_workflow
+from journal import Journal
+from workflow import DagExecutor, STATUS_SUCCEEDED, require
+
+from conftest import fast_resilience
+
+DOMAIN = "resume.example.com"
+
+
+def _fail_add_domain_once(backend):
+    handle = backend.handle
+    failed = []
+
+    def flaky(action, body):
+        if action == "AddTemplateDomain" and not failed:
+            failed.append(action)
+            raise FakeAPIError("InvalidParameter", "Injected by test", 400)
+        return handle(action, body)
+
+    backend.handle = flaky
+
+
+def _needs_rule_sdk():
+    # create_rule_engine builds its rule with the rule engine SDK
+    pytest.importorskip("cdn_rule_engine_sdk")
+
+
+def test_rerun_resumes_mutating_steps_only(demo, backend, tmp_path):
+    _needs_rule_sdk()
+    _fail_add_domain_once(backend)
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    try:
+        first = build_provisioning_workflow(demo, DOMAIN, journal=journal).run()
+        assert first["create_domain"]["Status"] != STATUS_SUCCEEDED
+        recorded = journal.completed(f"provision:{demo.identity}:{DOMAIN}")
+        assert "create_cipher" in recorded and "release_cipher" in recorded
+        assert not any(step.startswith(("describe_", "list_")) for step in recorded)
+
+        calls = dict(backend.calls)
+        second = build_provisioning_workflow(demo, DOMAIN, journal=journal).run()
+        assert all(row["Status"] == STATUS_SUCCEEDED for row in second.values())
+        for action in ("CreateCipherTemplate", "CreateServiceTemplate", "CreateRuleEngineTemplate",
+                       "ReleaseTemplate"):
+            assert backend.calls[action] == calls[action]
+        # Read-only steps ran again instead of replaying journaled results
+        assert backend.calls["DescribeCipherTemplate"] == calls["DescribeCipherTemplate"] + 1
+        assert second["describe_cipher"]["Duration"] > 0
+    finally:
+        journal.close()
+
+
+def test_other_backend_does_not_resume(demo, backend, tmp_path):
+    _needs_rule_sdk()
+    _fail_add_domain_once(backend)
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path)
+    try:
+        build_provisioning_workflow(demo, DOMAIN, journal=journal).run()
+    finally:
+        journal.close()
+
+    other = HSBCDemo(fast_resilience(), svc=FakeCDNService())
+    assert other.identity != demo.identity
+    journal = Journal(path)
+    try:
+        results = build_provisioning_workflow(other, DOMAIN, journal=journal).run()
+    finally:
+        journal.close()
+    assert all(row["Status"] == STATUS_SUCCEEDED for row in results.values())
+    assert other._svc.backend.calls["CreateCipherTemplate"] == 1
+
+
+def _onboarding(demo, journal, run_id, rule_id):
+    """Provisioning graph without rule engine templates (no SDK needed)"""
+    dag = DagExecutor(journal=journal, run_id=run_id)
+    dag.add_step("create_delivery", lambda _: require(demo.create_delivery_policy("tpl_delivery"), "create"))
+    dag.add_step("create_cipher", lambda _: require(demo.create_cipher_policy("tpl_cipher"), "create"))
+    dag.add_step("release_delivery", lambda r: require(demo.release_policy(r["create_delivery"]), "release"),
+                 depends_on=["create_delivery"])
+    dag.add_step("release_cipher", lambda r: require(demo.release_policy(r["create_cipher"]), "release"),
+                 depends_on=["create_cipher"])
+    dag.add_step("describe_cipher", lambda r: require(demo.describe_cipher_policy(r["create_cipher"]), "describe"),
+                 depends_on=["create_cipher", "release_cipher"], journaled=False)
+    dag.add_step("create_domain",
+                 lambda r: require(demo.create_domain(DOMAIN, rule_id, r["create_delivery"], r["create_cipher"]),
+                                   "create_domain"),
+                 depends_on=["create_delivery", "create_cipher", "release_delivery", "describe_cipher"])
+    return dag
+
+
+def test_resume_after_crash_replays_the_journal_on_disk(demo, backend, released, tmp_path):
+    _fail_add_domain_once(backend)
+    path = str(tmp_path / "journal.jsonl")
+    run_id = f"onboard:{demo.identity}:{DOMAIN}"
+    first = _onboarding(demo, Journal(path), run_id, released["id_rule"]).run()
+    assert first["create_domain"]["Status"] != STATUS_SUCCEEDED
+    # The process dies while writing its next record
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"Run":"' + run_id + '","Step":"crea')
+
+    journal = Journal(path)
+    try:
+        assert set(journal.completed(run_id)) == {"create_delivery", "create_cipher", "release_delivery",
+                                                  "release_cipher"}
+        calls = dict(backend.calls)
+        second = _onboarding(demo, journal, run_id, released["id_rule"]).run()
+        assert all(row["Status"] == STATUS_SUCCEEDED for row in second.values())
+        assert second["create_cipher"]["Result"] == first["create_cipher"]["Result"]
+        for action in ("CreateCipherTemplate", "CreateServiceTemplate", "ReleaseTemplate"):
+            assert backend.calls[action] == calls[action]
+        assert backend.calls["DescribeCipherTemplate"] == calls["DescribeCipherTemplate"] + 1
+        assert backend.domains[DOMAIN]
+    finally:
+        journal.close()
+
+    journal = Journal(path)
+    try:
+        assert journal.completed(run_id) == {}
+    finally:
+        journal.close()
+
+
+def test_unserializable_result_is_not_journaled(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    try:
+        assert journal.record("run", "ok", "tpl-1")
+        assert not journal.record("run", "opaque", object())
+        assert journal.completed("run") == {"ok": "tpl-1"}
+    finally:
+        journal.close()
+
+
+def test_compact_keeps_only_open_runs(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path))
+    try:
+        journal.record("done", "step", 1)
+        journal.close_run("done")
+        journal.record("open", "step", 2)
+        journal.compact()
+        journal.record("open", "next", 3)
+    finally:
+        journal.close()
+    assert "done" not in path.read_text()
+    journal = Journal(str(path))
+    try:
+        assert journal.completed("open") == {"step": 2, "next": 3}
+        assert journal.completed("done") == {}
+    finally:
+        journal.close()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Queued logging setup and teardown"""
+import os
+import sys
+import subprocess
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_reconfiguring_exits_cleanly(tmp_path):
+    script = (
+        "import logging\n"
+        "from log_config import configure_logging\n"
+        f"configure_logging(log_file={str(tmp_path / 'first.log')!r}, console=False)\n"
+        f"configure_logging(log_file={str(tmp_path / 'second.log')!r}, console=False)\n"
+        "logging.getLogger('test').warning('after reconfigure')\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=HERE, capture_output=True, text=True)
+    assert proc.returncode == 0
+    assert proc.stderr == ""
+    # The record is flushed by the atexit stop of the current listener
+    assert "after reconfigure" in (tmp_path / "second.log").read_text()
+    assert (tmp_path / "first.log").read_text() == ""
+
+
+def test_reconfiguring_closes_replaced_handlers(tmp_path):
+    script = (
+        "from log_config import configure_logging\n"
+        f"first = configure_logging(log_file={str(tmp_path / 'first.log')!r}, console=False)\n"
+        f"configure_logging(log_file={str(tmp_path / 'second.log')!r}, console=False)\n"
+        "assert [handler.stream for handler in first.handlers] == [None]\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=HERE, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Batched propagation waits against the fake API's delayed activation"""
+from concurrent.futures import CancelledError, wait
+
+import pytest
+
+import propagation
+from propagation import PropagationWaiter
+
+TEMPLATES = 20
+
+
+def _waiter(demo, **kwargs):
+    options = dict(max_batch=TEMPLATES, max_rps=1000, initial_delay=0.02, max_delay=0.1, timeout=5.0)
+    options.update(kwargs)
+    return PropagationWaiter(demo, **options)
+
+
+def _released(demo, count=TEMPLATES):
+    template_ids = [demo.create_cipher_policy(f"propagation-{number}") for number in range(count)]
+    assert all(demo.release_policy(template_id) for template_id in template_ids)
+    return template_ids
+
+
+def test_releases_resolve_with_batched_checks(demo, backend, monkeypatch):
+    # Without backoff jitter all waits stay on one schedule
+    monkeypatch.setattr(propagation.random, "uniform", lambda low, high: high)
+    backend.propagation_delay, backend.propagation_jitter = 0.2, 0.2
+    template_ids = _released(demo)
+    assert any(backend.templates[t]["Status"] == "releasing" for t in template_ids)
+
+    with _waiter(demo) as waiter:
+        batches = []
+        check = waiter._check
+        monkeypatch.setattr(waiter, "_check", lambda kind, keys: batches.append(len(keys)) or check(kind, keys))
+        futures = [waiter.wait_template(template_id) for template_id in template_ids]
+        done, not_done = wait(futures, timeout=10)
+        assert not not_done
+        assert all(future.result()["Status"] == "released" for future in futures)
+        assert waiter.pending == 0
+    # Every status call covered all templates still pending
+    assert batches[0] == TEMPLATES
+    assert batches == sorted(batches, reverse=True)
+    assert waiter.requests == len(batches) < TEMPLATES
+    assert backend.calls["DescribeTemplates"] == waiter.requests
+
+
+def test_domain_resolves_once_online(demo, backend, released):
+    backend.propagation_delay = 0.15
+    assert demo.create_domain("waiting.example.com", **released)
+    assert backend.domains["waiting.example.com"]["Status"] == "configuring"
+    with _waiter(demo) as waiter:
+        row = waiter.wait_domain("waiting.example.com").result(timeout=10)
+    assert row["Domain"] == "waiting.example.com" and row["Status"] == "online"
+
+
+def test_small_batches_split_the_checks(demo, backend):
+    template_ids = _released(demo, 5)
+    with _waiter(demo, max_batch=2) as waiter:
+        futures = [waiter.wait_template(template_id) for template_id in template_ids]
+        assert not wait(futures, timeout=10).not_done
+        assert waiter.requests == 3
+
+
+def test_unreleased_template_times_out(demo, backend):
+    draft = demo.create_cipher_policy("never-released")
+    with _waiter(demo) as waiter:
+        future = waiter.wait_template(draft, timeout=0.2)
+        missing = waiter.wait_template("tpl-missing", timeout=0.2)
+        with pytest.raises(TimeoutError, match="draft"):
+            future.result(timeout=10)
+        with pytest.raises(TimeoutError, match="not found"):
+            missing.result(timeout=10)
+
+
+def test_waits_are_shared_and_cancelled_on_close(demo, backend):
+    draft = demo.create_cipher_policy("never-released")
+    waiter = _waiter(demo)
+    future = waiter.wait_template(draft)
+    assert waiter.wait_template(draft) is future
+    assert waiter.pending == 1
+    with pytest.raises(ValueError):
+        waiter.wait("certificate", "cert-1")
+    waiter.close()
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        waiter.wait_template(draft)
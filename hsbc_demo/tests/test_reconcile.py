@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Desired-state reconciliation against the fake CDN API"""
+import json
+
+import pytest
+
+from fake_cdn import FakeAPIError
+from reconcile import Reconciler, load_desired_state
+
+MUTATING_PREFIXES = ("Create", "Update", "Release", "Delete", "Add")
+
+DESIRED_STATE = {
+    "Templates": [
+        {"Kind": "service", "Title": "tpl_delivery", "Base": "delivery_policy", "Body": {"Message": "reconciled"}},
+        {"Kind": "cipher", "Title": "tpl_cipher", "Body": {"Quic": {"Switch": True}}},
+        {"Kind": "rule_engine", "Title": "tpl_rule", "Body": {"Rule": {"Condition": {}, "Actions": []}}},
+    ],
+    "Domains": [
+        {"Domain": "a.example.com", "ServiceTemplate": "tpl_delivery",
+         "CipherTemplate": "tpl_cipher", "RuleTemplate": "tpl_rule"},
+    ],
+}
+
+
+def _mutations(backend) -> int:
+    return sum(count for action, count in backend.calls.items() if action.startswith(MUTATING_PREFIXES))
+
+
+@pytest.fixture
+def desired(tmp_path):
+    path = tmp_path / "desired_state.json"
+    path.write_text(json.dumps(DESIRED_STATE))
+    return load_desired_state(str(path))
+
+
+def test_rerun_makes_no_mutating_calls(demo, backend, desired):
+    results = Reconciler(demo).reconcile(desired)
+    assert results and all(row["Success"] for row in results), results
+    mutations = _mutations(backend)
+
+    assert Reconciler(demo).reconcile(desired) == []
+    assert Reconciler(demo).reconcile(desired, verify=True) == []
+    assert _mutations(backend) == mutations
+
+
+def test_drift_is_updated_and_released_once(demo, backend, desired):
+    Reconciler(demo).reconcile(desired)
+    template_id = next(tid for tid, tpl in backend.templates.items() if tpl["Title"] == "tpl_cipher")
+    backend.templates[template_id]["Quic"] = {"Switch": False}  # Edited outside the reconciler
+    calls = dict(backend.calls)
+
+    ops = [row["Op"] for row in Reconciler(demo).reconcile(desired, verify=True)]
+    assert ops == ["update", "release"]
+    assert backend.calls["UpdateCipherTemplate"] == calls.get("UpdateCipherTemplate", 0) + 1
+    assert backend.calls["ReleaseTemplate"] == calls["ReleaseTemplate"] + 1
+
+
+def test_new_domain_binds_existing_templates(demo, backend, tmp_path):
+    path = tmp_path / "desired_state.json"
+    path.write_text(json.dumps(DESIRED_STATE))
+    Reconciler(demo).reconcile(load_desired_state(str(path)))
+
+    extended = {**DESIRED_STATE, "Domains": DESIRED_STATE["Domains"] + [
+        {"Domain": "b.example.com", "ServiceTemplate": "tpl_delivery",
+         "CipherTemplate": "tpl_cipher", "RuleTemplate": "tpl_rule"}]}
+    path.write_text(json.dumps(extended))
+    results = Reconciler(demo).reconcile(load_desired_state(str(path)))
+    assert results == [{"Op": "add_domain", "Target": "b.example.com", "Success": True, "Error": None}]
+    bindings = {domain: row["CipherTemplateId"] for domain, row in backend.domains.items()}
+    assert bindings["b.example.com"] == bindings["a.example.com"]
+
+
+def test_failed_delete_is_reported(demo, backend, desired, tmp_path):
+    Reconciler(demo).reconcile(desired)
+    path = tmp_path / "pruned.json"
+    path.write_text(json.dumps({"Templates": DESIRED_STATE["Templates"][:2], "Prune": True}))
+    pruned = load_desired_state(str(path))
+
+    def _fail_deletes(action, body, handle=backend.handle):
+        if action == "DeleteTemplate":
+            raise FakeAPIError("OperationDenied", "Template is bound to a domain", 400)
+        return handle(action, body)
+
+    backend.handle = _fail_deletes
+    results = Reconciler(demo).reconcile(pruned)
+    assert [(row["Op"], row["Success"]) for row in results] == [("delete", False)]
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Retry and circuit breaking of SDK calls against the fake CDN API"""
+import pytest
+
+from fake_cdn import FakeAPIError, FakeCDNService
+from hsbc_demo import HSBCDemo
+from resilience import Resilience, is_server_error, is_throttling_error
+
+from conftest import fast_resilience
+
+
+def _fail_first(backend, action: str, failures: int, code: str = "InternalError", status: int = 500):
+    """Make the next `failures` calls of an action raise an error response"""
+    handle = backend.handle
+    remaining = [failures]
+
+    def flaky(name, body):
+        if name == action and remaining[0] > 0:
+            remaining[0] -= 1
+            raise FakeAPIError(code, "Injected by test", status)
+        return handle(name, body)
+
+    backend.handle = flaky
+
+
+def test_server_errors_are_retried(demo, backend):
+    template_id = demo.create_cipher_policy("retried")
+    _fail_first(backend, "ReleaseTemplate", 2)
+    assert demo.release_policy(template_id) is True
+    assert backend.calls["ReleaseTemplate"] == 1
+
+
+def test_creates_are_not_retried_after_server_errors(demo, backend):
+    _fail_first(backend, "CreateCipherTemplate", 1)
+    assert demo.create_cipher_policy("maybe-created") is None
+    assert demo.create_cipher_policy("created") is not None
+    assert backend.calls["CreateCipherTemplate"] == 1
+
+
+def test_creates_are_retried_after_throttling(demo, backend):
+    _fail_first(backend, "CreateCipherTemplate", 2, code="Throttling", status=429)
+    assert demo.create_cipher_policy("throttled") is not None
+    assert len(backend.templates) == 1
+
+
+def test_throttling_is_retried(demo, backend):
+    _fail_first(backend, "ListCdnDomains", 1, code="Throttling", status=429)
+    assert list(demo.iter_cdn_domains(prefetch=False)) == []
+
+
+def test_client_errors_are_not_retried(demo, backend):
+    _fail_first(backend, "ReleaseTemplate", 1, code="InvalidParameter", status=400)
+    template_id = demo.create_cipher_policy("not-retried")
+    assert demo.release_policy(template_id) is False
+    assert backend.templates[template_id]["Status"] == "draft"
+
+
+def test_retries_give_up_after_max_attempts(demo, backend):
+    template_id = demo.create_cipher_policy("exhausted")
+    _fail_first(backend, "ReleaseTemplate", 10)
+    assert demo.release_policy(template_id) is False
+    assert backend.templates[template_id]["Status"] == "draft"
+
+
+@pytest.mark.parametrize("error, throttled, server_error", [
+    (Exception('{"ResponseMetadata": {"Error": {"Code": "Throttling.User", "Message": "slow down"}}}'), True, False),
+    (Exception('{"ResponseMetadata": {"Error": {"Code": "InternalError", "Message": "oops"}}}'), False, True),
+    (Exception('{"ResponseMetadata": {"Error": {"Code": "InvalidParameter", '
+               '"Message": "Template tpl-429-503 of 5040 bytes not found"}}}'), False, False),
+    (Exception("<html><title>502 Bad Gateway</title></html>"), False, True),
+    (Exception("Domain cdn-504.example.com has 429 rules"), False, False),
+    (FakeAPIError("Unknown", "gateway", 503), False, True),
+], ids=["throttling-code", "server-code", "digits-in-message", "gateway-page", "digits-in-text", "status"])
+def test_errors_are_classified_by_code_and_status(error, throttled, server_error):
+    assert is_throttling_error(error) is throttled
+    assert is_server_error(error) is server_error
+
+
+def test_breaker_opens_on_repeated_server_errors(backend):
+    resilience = fast_resilience(max_attempts=1, failure_threshold=3)
+    demo = HSBCDemo(resilience, svc=FakeCDNService(backend))
+    backend.error_rate = 1.0
+    for _ in range(3):
+        assert demo.create_cipher_policy("down") is None
+    assert resilience.breaker.state == "open"
+
+    backend.error_rate = 0.0
+    calls = dict(backend.calls)
+    assert demo.create_cipher_policy("skipped") is None
+    assert backend.calls == calls
+
+
+def test_rate_limits_are_opt_in():
+    resilience = Resilience(rate_limits={"release_template": 5})
+    assert resilience.bucket("describe_templates") is None
+    assert resilience.bucket("release_template").rate == 5
+    assert Resilience(default_rate=2).bucket("describe_templates").rate == 2
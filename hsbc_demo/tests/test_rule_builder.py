@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Rule builder output and encoding cache reuse"""
+import pytest
+
+rule_builder = pytest.importorskip("rule_builder", exc_type=ImportError)
+Const = rule_builder.Const
+
+
+def _leaf(condition):
+    return condition["ConditionGroups"][0]["ConditionGroups"][0]["Condition"]
+
+
+def test_path_prefix_condition_accepts_a_single_prefix():
+    leaf = _leaf(rule_builder.path_prefix_condition("/stripheader/", ignore_case=False))
+    assert leaf["Object"] == Const.ConditionHTTPPath
+    assert leaf["Operator"] == Const.OperatorPrefixMatch
+    assert leaf["Value"] == ["/stripheader/"]
+    assert leaf["IgnoreCase"] is False
+
+    leaf = _leaf(rule_builder.path_prefix_condition(("/a/", "/b/")))
+    assert leaf["Value"] == ["/a/", "/b/"]
+
+
+def test_response_header_action_parameters():
+    action = rule_builder.response_header_action(Const.Set, "x-frame-options", ("DENY",))
+    parameters = action["Groups"][0]["GroupParameters"][0]["Parameters"]
+    assert parameters == [
+        {"Name": "action", "Values": [Const.Set]},
+        {"Name": "header_name", "Values": ["x-frame-options"]},
+        {"Name": "header_value", "Values": ["DENY"]},
+    ]
+    parameters = rule_builder.response_header_action(Const.Delete, "server")["Groups"][0]["GroupParameters"][0]
+    assert [p["Name"] for p in parameters["Parameters"]] == ["action", "header_name"]
+
+
+def test_equal_content_is_encoded_once():
+    condition, actions = rule_builder.strip_response_header_spec("/cache-test/", "server")
+    reordered = {key: condition[key] for key in reversed(list(condition))}
+    before = rule_builder.cache_info()["encode"]
+
+    first = rule_builder.encode_rule(condition, actions, desc="cache test")
+    second = rule_builder.encode_rule(reordered, actions, desc="cache test")
+    after = rule_builder.cache_info()["encode"]
+    assert first == second
+    assert after.misses == before.misses + 1
+    assert after.hits == before.hits + 1
+
+    other = rule_builder.encode_rule(condition, actions, desc="other desc")
+    assert other != first
+
+
+def test_strip_response_header_matches_its_spec():
+    condition, actions = rule_builder.strip_response_header_spec("/spec-test/", "via")
+    encoded = rule_builder.strip_response_header("/spec-test/", "via", desc="d")
+    assert encoded == rule_builder.encode_rule(condition, actions, desc="d")
+    assert rule_builder.strip_response_header("/spec-test/", "via", desc="d") is encoded
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Offline rule evaluation edge cases"""
+import pytest
+
+rule_evaluator = pytest.importorskip("rule_evaluator", exc_type=ImportError)
+
+
+@pytest.mark.parametrize("factory", [
+    rule_evaluator._prefix_matcher, rule_evaluator._suffix_matcher, rule_evaluator._equal_matcher,
+    rule_evaluator._contain_matcher, rule_evaluator._regex_matcher,
+])
+@pytest.mark.parametrize("ignore_case", [False, True])
+def test_empty_values_match_nothing(factory, ignore_case):
+    test = factory([], ignore_case)
+    assert not test("/stripheader/a.html")
+    assert not test("")
+
+
+def test_prefix_matcher_still_matches():
+    test = rule_evaluator._prefix_matcher(["/stripheader/"], True)
+    assert test("/StripHeader/a.html")
+    assert not test("/static/a.html")
+
+
+def _path_leaf(operator_name, values, ignore_case=False):
+    Const = rule_evaluator.Const
+    if not hasattr(Const, operator_name):
+        pytest.skip(f"SDK has no Const.{operator_name}")
+    return {"IsGroup": False, "Condition": {
+        "Object": Const.ConditionHTTPPath, "Operator": getattr(Const, operator_name),
+        "IgnoreCase": ignore_case, "Value": values}}
+
+
+@pytest.mark.parametrize("negated, positive, values, path", [
+    ("OperatorNotEqual", "OperatorEqual", ["/index.html"], "/index.html"),
+    ("OperatorNotEqual", "OperatorEqual", ["/index.html"], "/other.html"),
+    ("OperatorNotContain", "OperatorContain", ["secret"], "/a/secret/b"),
+    ("OperatorNotContain", "OperatorContain", ["secret"], "/a/public/b"),
+    ("OperatorNotPrefixMatch", "OperatorPrefixMatch", ["/stripheader/"], "/stripheader/a.html"),
+    ("OperatorNotPrefixMatch", "OperatorPrefixMatch", ["/stripheader/"], "/static/a.html"),
+])
+def test_negated_operator_inverts_its_positive(negated, positive, values, path):
+    negated_test = rule_evaluator.compile_condition(_path_leaf(negated, values))
+    positive_test = rule_evaluator.compile_condition(_path_leaf(positive, values))
+    assert negated_test({"path": path}) is (not positive_test({"path": path}))
+
+
+def test_negated_operator_honours_ignore_case():
+    test = rule_evaluator.compile_condition(_path_leaf("OperatorNotPrefixMatch", ["/stripheader/"], True))
+    assert not test({"path": "/StripHeader/a.html"})
+    assert test({"path": "/static/a.html"})
+
+
+def test_negated_operator_matches_missing_field():
+    test = rule_evaluator.compile_condition(_path_leaf("OperatorNotContain", ["secret"]))
+    assert test({})
+
+
+def test_negated_rule_counts_request_dicts():
+    rule = rule_evaluator.compile_rule(_path_leaf("OperatorNotPrefixMatch", ["/stripheader/"]), [])
+    assert rule.match_path is None
+    requests = [{"path": p} for p in ("/stripheader/a", "/static/b", "/img/c")]
+    assert rule.count_matches(requests) == 2
+    with pytest.raises(ValueError):
+        rule.count_matches([r["path"] for r in requests])
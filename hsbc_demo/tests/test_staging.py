@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Staged template changes: one update and one release per template"""
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+
+from staging import ChangeSet
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_commit_sends_one_update_and_release_per_template(demo, backend):
+    first, second = demo.create_cipher_policy("a"), demo.create_cipher_policy("b")
+    calls = dict(backend.calls)
+
+    with demo.stage_changes() as changes:
+        changes.update("cipher", first, {"Message": "one"})
+        changes.update("cipher", first, {"Quic": {"Switch": True}})
+        changes.update("cipher", first, {"Message": "two"})
+        changes.update("cipher", second, {"Message": "other"})
+        changes.release(second)
+
+    assert backend.calls["UpdateCipherTemplate"] == calls.get("UpdateCipherTemplate", 0) + 2
+    assert backend.calls["ReleaseTemplate"] == calls.get("ReleaseTemplate", 0) + 2
+    assert backend.templates[first]["Message"] == "two"
+    assert backend.templates[first]["Quic"] == {"Switch": True}
+    assert changes.last_report[first]["Edits"] == 3
+    assert changes.pending == {}
+
+
+def test_failed_update_is_not_released(demo, backend):
+    template_id = demo.create_cipher_policy("a")
+    calls = dict(backend.calls)
+    del backend.templates[template_id]
+
+    changes = demo.stage_changes()
+    changes.update("cipher", template_id, {"Message": "gone"})
+    report = changes.commit()
+    assert not report[template_id]["Updated"]
+    assert not report[template_id]["Released"]
+    assert backend.calls.get("ReleaseTemplate", 0) == calls.get("ReleaseTemplate", 0)
+
+
+def test_exception_discards_staged_changes(demo, backend):
+    template_id = demo.create_cipher_policy("a")
+    calls = dict(backend.calls)
+    with pytest.raises(RuntimeError):
+        with demo.stage_changes() as changes:
+            changes.update("cipher", template_id, {"Message": "never sent"})
+            raise RuntimeError("abort")
+    assert backend.calls == calls
+
+
+def test_window_commits_from_the_timer(demo, backend):
+    template_id = demo.create_cipher_policy("a")
+    changes = demo.stage_changes(window=0.05)
+    changes.update("cipher", template_id, {"Message": "windowed"})
+    deadline = time.monotonic() + 5
+    while changes.last_report is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert changes.last_report[template_id]["Released"] is True
+    assert backend.templates[template_id]["Message"] == "windowed"
+
+
+def test_timer_commit_errors_are_kept():
+    class _BrokenDemo:
+        def update_template(self, kind, template_id, changes):
+            raise RuntimeError("update exploded")
+
+    changes = ChangeSet(_BrokenDemo(), window=0.01)
+    changes.update("cipher", "tpl-1", {"Message": "x"})
+    deadline = time.monotonic() + 5
+    while changes.last_error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert str(changes.last_error) == "update exploded"
+
+
+def test_pending_window_is_committed_at_exit():
+    script = (
+        "import atexit\n"
+        "from fake_cdn import FakeCDNBackend, FakeCDNService\n"
+        "from hsbc_demo import HSBCDemo\n"
+        "backend = FakeCDNBackend()\n"
+        "demo = HSBCDemo(svc=FakeCDNService(backend))\n"
+        "template_id = demo.create_cipher_policy('a')\n"
+        "atexit.register(lambda: print(backend.calls.get('UpdateCipherTemplate'), "
+        "backend.calls.get('ReleaseTemplate'), backend.templates[template_id]['Message']))\n"
+        "changes = demo.stage_changes(window=60)\n"
+        "changes.update('cipher', template_id, {'Message': 'at exit'})\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=HERE, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split() == ["1", "1", "at", "exit"]
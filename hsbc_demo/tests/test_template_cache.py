@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed template reuse"""
+from describe_cache import DescribeCache
+from fake_cdn import FakeCDNService
+from hsbc_demo import HSBCDemo
+from template_cache import TemplateCache
+
+from conftest import fast_resilience
+
+
+def _demo(backend):
+    return HSBCDemo(fast_resilience(), svc=FakeCDNService(backend), template_cache=TemplateCache(":memory:"),
+                    describe_cache=DescribeCache())
+
+
+def test_identical_content_reuses_template(backend):
+    demo = _demo(backend)
+    first = demo.create_cipher_policy("a")
+    assert demo.create_cipher_policy("b") == first
+    assert backend.calls["CreateCipherTemplate"] == 1
+
+
+def test_template_edited_elsewhere_is_not_reused(backend):
+    demo = _demo(backend)
+    first = demo.create_cipher_policy("a")
+    demo.describe_cipher_policy(first)  # Warm the describe cache with the original content
+    backend.templates[first]["Quic"] = {"Switch": True}  # Edited by another process
+
+    second = demo.create_cipher_policy("b")
+    assert second != first
+    assert backend.calls["CreateCipherTemplate"] == 2
+    assert demo.create_cipher_policy("c") == second
+
+
+def test_deleted_template_is_not_reused(backend):
+    demo = _demo(backend)
+    first = demo.create_cipher_policy("a")
+    del backend.templates[first]
+    assert demo.create_cipher_policy("b") not in (None, first)
+
+
+def test_shared_cache_is_scoped_to_the_account(backend):
+    cache = TemplateCache(":memory:")
+    first = HSBCDemo(fast_resilience(), svc=FakeCDNService(backend), template_cache=cache)
+    other_account = HSBCDemo(fast_resilience(), svc=FakeCDNService(backend), template_cache=cache)
+    assert first.identity != other_account.identity
+    assert other_account.create_cipher_policy("b") != first.create_cipher_policy("a")
+    assert backend.calls["CreateCipherTemplate"] == 2
+
+
+def test_release_is_not_skipped_by_default(backend):
+    demo = _demo(backend)
+    template_id = demo.create_cipher_policy("a")
+    assert demo.release_policy(template_id)
+
+    console = HSBCDemo(fast_resilience(), svc=FakeCDNService(backend))  # Edit from another client
+    assert console.update_cipher_template(template_id)
+    assert demo.release_policy(template_id)
+    assert backend.calls["ReleaseTemplate"] == 2
+    assert backend.templates[template_id]["HasDraft"] is False
+
+
+def test_opt_in_release_skip_is_confirmed_by_the_server(backend):
+    demo = HSBCDemo(fast_resilience(), svc=FakeCDNService(backend),
+                    template_cache=TemplateCache(":memory:", skip_released=True))
+    template_id = demo.create_cipher_policy("a")
+    assert demo.release_policy(template_id)
+    assert demo.release_policy(template_id)
+    assert backend.calls["ReleaseTemplate"] == 1
+
+    backend.templates[template_id]["Status"] = "draft"  # Changed outside this client
+    assert demo.release_policy(template_id)
+    assert backend.calls["ReleaseTemplate"] == 2
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Dependency-aware workflow execution"""
+import threading
+
+import pytest
+
+from workflow import DagExecutor, StepFailed, require, STATUS_FAILED, STATUS_SKIPPED, STATUS_SUCCEEDED
+
+
+def test_steps_get_their_dependency_results():
+    dag = DagExecutor()
+    dag.add_step("a", lambda inputs: 1)
+    dag.add_step("b", lambda inputs: 2)
+    dag.add_step("sum", lambda inputs: inputs["a"] + inputs["b"], depends_on=("a", "b"))
+    results = dag.run()
+    assert results["sum"]["Result"] == 3
+    assert {row["Status"] for row in results.values()} == {STATUS_SUCCEEDED}
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    dag = DagExecutor(max_workers=3)
+    for name in ("a", "b", "c"):
+        dag.add_step(name, lambda inputs: barrier.wait())
+    assert {row["Status"] for row in dag.run().values()} == {STATUS_SUCCEEDED}
+
+
+def test_failure_skips_only_downstream_steps():
+    dag = DagExecutor()
+    dag.add_step("create", lambda inputs: require(None, "create returned nothing"))
+    dag.add_step("release", lambda inputs: True, depends_on=("create",))
+    dag.add_step("bind", lambda inputs: True, depends_on=("release",))
+    dag.add_step("unrelated", lambda inputs: "ok")
+    results = dag.run()
+    assert results["create"]["Status"] == STATUS_FAILED
+    assert results["create"]["Error"] == "create returned nothing"
+    assert results["release"]["Status"] == results["bind"]["Status"] == STATUS_SKIPPED
+    assert results["unrelated"]["Status"] == STATUS_SUCCEEDED
+
+
+def test_invalid_graphs_are_rejected_before_running():
+    ran = []
+    dag = DagExecutor()
+    dag.add_step("a", lambda inputs: ran.append("a"), depends_on=("b",))
+    dag.add_step("b", lambda inputs: ran.append("b"), depends_on=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        dag.run()
+
+    dag = DagExecutor()
+    dag.add_step("a", lambda inputs: ran.append("a"), depends_on=("missing",))
+    with pytest.raises(ValueError, match="unknown step"):
+        dag.run()
+    with pytest.raises(ValueError, match="Duplicate"):
+        dag.add_step("a", lambda inputs: None)
+    assert ran == []
+
+
+def test_require_raises_step_failed():
+    assert require("tpl-1", "unused") == "tpl-1"
+    with pytest.raises(StepFailed):
+        require(False, "failed")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+HSBC Demo Workflow Executor
+
+Runs provisioning steps as a small dependency graph (DAG). Steps whose
+dependencies are satisfied run concurrently on a thread pool, so the wall
+time of a workflow is set by its critical path instead of the sum of all
+steps. When a step fails, every step downstream of it is skipped.
+
+With a Journal, every succeeded step is checkpointed (except read-only
+steps added with journaled=False), and a rerun of the same run_id replays
+those results instead of executing the steps again.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class StepFailed(Exception):
+    """Raised by a step to mark it failed (e.g. an SDK call returned None)"""
+
+
+def require(value, error_msg: str):
+    """Return value unchanged, raising StepFailed if it is falsy
+
+    Input:
+        - value: Result of an HSBCDemo call (template ID, bool, ...)
+        - error_msg: Message for the StepFailed exception
+
+    Output:
+        - value if it is truthy
+    """
+    if not value:
+        raise StepFailed(error_msg)
+    return value
+
+
+class DagExecutor:
+    def __init__(self, max_workers: int = 4, journal=None, run_id: str = None):
+        """Create an empty workflow graph
+
+        Input:
+            - max_workers: Upper bound on concurrently running steps
+            - journal: Optional journal.Journal checkpointing succeeded steps
+            - run_id: Identity of this run in the journal (required with journal)
+        """
+        if journal is not None and not run_id:
+            raise ValueError("A journaled workflow needs a run_id")
+        self._max_workers = max_workers
+        self._journal = journal
+        self._run_id = run_id
+        self._steps = {}
+
+    def add_step(self, name: str, func, depends_on=(), journaled: bool = True) -> None:
+        """Register a step in the graph
+
+        Input:
+            - name: Unique step name
+            - func: Callable taking one dict argument that maps each
+              dependency name to its result; raising marks the step failed
+            - depends_on: Names of the steps that must succeed first
+            - journaled: Checkpoint the result; pass False for read-only
+              steps (describe_*, list_*), which are cheap and safe to rerun
+              and whose results would be stale on resume
+        """
+        if name in self._steps:
+            raise ValueError(f"Duplicate workflow step: {name}")
+        self._steps[name] = (func, tuple(depends_on), journaled)
+
+    def _validate(self) -> None:
+        """Reject unknown dependencies and cycles before anything runs"""
+        for name, (_, deps, _) in self._steps.items():
+            for dep in deps:
+                if dep not in self._steps:
+                    raise ValueError(f"Step {name} depends on unknown step {dep}")
+
+        visiting, done = set(), set()
+
+        def _visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self._steps[name][1]:
+                _visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self._steps:
+            _visit(name, [])
+
+    def run(self) -> dict:
+        """Execute the graph
+
+        Output:
+            - Dict mapping step name to a result row with keys
+              Status (succeeded/failed/skipped), Result, Error and Duration
+        """
+        self._validate()
+        dependents = {name: [] for name in self._steps}
+        waiting_on = {}
+        for name, (_, deps, _) in self._steps.items():
+            waiting_on[name] = set(deps)
+            for dep in deps:
+                dependents[dep].append(name)
+
+        results = {}
+        running = {}
+        started = time.perf_counter()
+
+        if self._journal is not None:
+            for name, value in self._journal.completed(self._run_id).items():
+                if name not in self._steps or not self._steps[name][2]:
+                    continue
+                results[name] = {"Status": STATUS_SUCCEEDED, "Result": value, "Error": None, "Duration": 0.0}
+                logger.info(f"Workflow step resumed from journal: {name}")
+                for child in dependents[name]:
+                    waiting_on[child].discard(name)
+
+        def _skip_downstream(name, reason):
+            for child in dependents[name]:
+                if child in results:
+                    continue
+                results[child] = {"Status": STATUS_SKIPPED, "Result": None,
+                                  "Error": reason, "Duration": None}
+                logger.warning(f"Workflow step skipped: {child} ({reason})")
+                _skip_downstream(child, reason)
+
+        def _run_step(name, func, inputs):
+            step_started = time.perf_counter()
+            return func(inputs), time.perf_counter() - step_started
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="workflow") as pool:
+            def _submit_ready():
+                for name, deps in waiting_on.items():
+                    if deps or name in results or name in running.values():
+                        continue
+                    func, dep_names, _ = self._steps[name]
+                    inputs = {dep: results[dep]["Result"] for dep in dep_names}
+                    logger.info(f"Workflow step started: {name}")
+                    running[pool.submit(_run_step, name, func, inputs)] = name
+
+            _submit_ready()
+            while running:
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        value, duration = future.result()
+                    except Exception as e:
+                        results[name] = {"Status": STATUS_FAILED, "Result": None,
+                                         "Error": str(e), "Duration": None}
+                        logger.error(f"Workflow step failed: {name}: {str(e)}")
+                        _skip_downstream(name, f"upstream step {name} failed")
+                        continue
+                    results[name] = {"Status": STATUS_SUCCEEDED, "Result": value,
+                                     "Error": None, "Duration": duration}
+                    if self._journal is not None and self._steps[name][2]:
+                        self._journal.record(self._run_id, name, value)
+                    logger.info(f"Workflow step succeeded: {name} ({duration:.2f}s)")
+                    for child in dependents[name]:
+                        waiting_on[child].discard(name)
+                _submit_ready()
+
+        elapsed = time.perf_counter() - started
+        failed = [name for name, row in results.items() if row["Status"] != STATUS_SUCCEEDED]
+        if self._journal is not None and not failed:
+            self._journal.close_run(self._run_id)
+        logger.info(f"Workflow finished in {elapsed:.2f}s: "
+                    f"{len(results) - len(failed)}/{len(results)} steps succeeded")
+        return results